@@ -1,86 +1,54 @@
-from random import sample
-from typing import List
-
-import pandas as pd
+import numpy as np
 import streamlit as st
 
-
-# Functions ===================================================================
-@st.cache_data
-def get_data():
-    qna_csv = st.secrets["QNA_CSV"]
-    df = pd.read_csv(qna_csv)
-    df.dropna(inplace=True, axis=0, subset=["Question", "Answer"])
-    df["Choices"] = (
-        df["Choices"].str.split(";").apply(lambda x: [item.strip() for item in x])
-    )
-    df["Tags"] = df["Tags"].str.split(";").apply(lambda x: [item.strip() for item in x])
-    return df
+from pset import metrics
+from pset.audio import fanfare_html
+from pset.bank import BankSnapshot
+from pset.builder import build_problem_set
+from pset.debug import begin_run, debug_panel
+from pset.resources import get_adaptive_weights, get_bank, get_scheduler, get_search_index
+from pset.search import search_positions
+from pset.setcode import generate_set, new_seed, new_spec
+from pset.srs import due_positions
+from pset.state import session_id
 
 
-@st.cache_data
-def get_tag_list(df: pd.DataFrame) -> List[str]:
+# Functions ===================================================================
+@metrics.timed("get_data")
+def get_data() -> BankSnapshot:
     """
-    Returns a list of unique tags from the given DataFrame.
+    Returns the current snapshot of the shared question bank, with the
+    search index brought up to date with it.
 
-    Args:
-        df (pd.DataFrame): The DataFrame containing the tags.
+    The bank is loaded once per process and picks up new and edited questions
+    incrementally in the background (see `pset.resources.get_bank`).
 
     Returns:
-        List[str]: A list of unique tags.
+        BankSnapshot: The question rows and their tag index.
     """
-    tags = [tag for tags in df["Tags"] for tag in tags]
-    return list(set(tags))
+    snapshot = get_bank().snapshot
+    get_search_index().sync(snapshot)
+    return snapshot
 
 
 def load_fanfare(n):
-    import base64
-
-    if n > 9000:
-        fanfare_file = open("assets/fanfare_9999.mp3", "rb")
-    elif n > 75:
-        fanfare_file = open("assets/fanfare_100.mp3", "rb")
-    elif n > 50:
-        fanfare_file = open("assets/fanfare_75.mp3", "rb")
-    elif n > 25:
-        fanfare_file = open("assets/fanfare_50.mp3", "rb")
-    elif n > 10:
-        fanfare_file = open("assets/fanfare_25.mp3", "rb")
-    else:
-        fanfare_file = open("assets/fanfare_5.mp3", "rb")
-    fanfare_html = f'\n<audio autoplay class="stAudio">\n<source src="data:audio/ogg;base64,{(base64.b64encode(fanfare_file.read()).decode())}" type="audio/mp3">\nYour browser does not support the audio element.\n</audio>'
-    return fanfare_html
-
-
-def generate_50_set(df, tags):
-    filtered_df = df[
-        df["Tags"].apply(lambda x: any(item in x for item in selected_tags))
-    ].copy()
-    filtered_df.sort_values(by="ID").reset_index(inplace=True, drop=True)
-    filtered_df = filtered_df.sample(n=50, replace=False).sort_values(by="ID")
-    filtered_df.reset_index(inplace=True, drop=True)
-    for index, row in filtered_df.iterrows():
-        # Create Question Number
-        filtered_df.loc[index, "QNum"] = f"Q-{index + 1}"
-    filtered_df["Correct"] = False
-    filtered_df["Done"] = False
-    filtered_df = filtered_df[
-        ["ID", "QNum", "Correct", "Done", "Question", "Choices", "Answer", "Tags"]
-    ]
-    return filtered_df.copy()
+    return fanfare_html(n)
 
 
 # Setup =======================================================================
 st.set_page_config(page_title="Problem Set Generator", page_icon="🔁")
 st.title("The Generator")
+begin_run()
 
 if "auth" not in st.session_state:
     st.session_state["auth"] = False
 if "access" not in st.session_state:
     st.session_state["access"] = False
 
-df = get_data()
-tags = get_tag_list(df)
+bank = get_data()
+tag_index = bank.tags
+tags = tag_index.tags()
+tag_counts = tag_index.counts()
 
 
 # Main ========================================================================
@@ -94,39 +62,70 @@ else:
     st.success("&ensp;**Generator enabled.**", icon="🟢")
 
 with st.expander("**Problem Set Generator** ⚙", expanded=True):
-    selected_tags = st.multiselect("Select Tags", tags, default=["CHE"])
+    selected_tags = st.multiselect(
+        "Select Tags",
+        tags,
+        default=["CHE"],
+        format_func=lambda tag: f"{tag} ({tag_counts[tag]})",
+    )
+    tcol1, tcol2 = st.columns([1, 2])
+    with tcol1:
+        tag_match = st.radio("Match", ["Any tag", "All tags"], horizontal=True)
+    with tcol2:
+        excluded_tags = st.multiselect(
+            "Exclude Tags",
+            tags,
+            format_func=lambda tag: f"{tag} ({tag_counts[tag]})",
+        )
+    search = st.text_input(
+        "Search questions",
+        placeholder='e.g. McCabe-Thiele, "heat exchanger"',
+        help="Only questions matching every word or quoted phrase, best match first. "
+        "Leave the tags empty to search the whole bank.",
+    ).strip()
     st.session_state["selected_tags"] = selected_tags.copy()
-    filtered_df = df[
-        df["Tags"].apply(lambda x: any(item in x for item in selected_tags))
-    ].copy()
-    filtered_df.sort_values(by="ID").reset_index(inplace=True, drop=True)
-
-    if len(filtered_df) == 0:
+    with metrics.timer("tag_filter"):
+        if search and not selected_tags:
+            positions = np.setdiff1d(bank.positions(), tag_index.any_of(excluded_tags))
+        elif tag_match == "All tags":
+            positions = tag_index.query(all_of=selected_tags, none_of=excluded_tags)
+        else:
+            positions = tag_index.query(any_of=selected_tags, none_of=excluded_tags)
+    if search:
+        with metrics.timer("search"):
+            positions = search_positions(get_search_index().ids(search), bank.id_pos, positions)
+
+    due_today = st.checkbox(
+        "**Due today**",
+        help="Only questions scheduled for review today, most overdue first.",
+    )
+    if due_today:
+        positions = due_positions(get_scheduler().due(session_id()), bank.id_pos, positions)
+
+    if len(positions) == 0 and due_today:
+        st.info("&emsp;**No questions due today** for the selected tags.", icon="ℹ️")
+    elif len(positions) == 0 and search:
+        st.error("**No questions match the search.**", icon="❗")
+    elif len(positions) == 0:
         st.error("**No questions found!** Please select some tags.", icon="❗")
         # st.button("Generate Problem Set", disabled=True)
     else:
-        if len(filtered_df) > 1:
+        if len(positions) > 1:
             num_questions = st.slider(
                 "Number of questions to generate:",
                 min_value=1,
-                max_value=len(filtered_df),
-                value=len(filtered_df),
+                max_value=len(positions),
+                value=len(positions),
             )
-            filtered_df = filtered_df.sample(n=num_questions, replace=False)
         else:
+            num_questions = 1
             st.info("&emsp;**Only _:red[one]_ question found.**", icon="ℹ️")
 
-        filtered_df.reset_index(inplace=True, drop=True)
-        for index, row in filtered_df.iterrows():
-            # Create Question Number
-            filtered_df.loc[index, "QNum"] = f"Q-{index + 1}"
-            filtered_df["Choices"][index] = sample(row["Choices"], k=4)
-
-        filtered_df["Correct"] = False
-        filtered_df["Done"] = False
-        filtered_df = filtered_df[
-            ["ID", "QNum", "Correct", "Done", "Question", "Choices", "Answer", "Tags"]
-        ]
+        adaptive = st.checkbox(
+            "**Adaptive sampling**",
+            help="Favour questions and tags you have missed before.",
+            disabled=due_today,
+        )
 
         # st.divider()
         generate = st.button(
@@ -134,53 +133,41 @@ with st.expander("**Problem Set Generator** ⚙", expanded=True):
         )
 
         if generate:
-            st.session_state["problem_set"] = filtered_df.copy()
+            with metrics.timer("assemble_set"):
+                if due_today:
+                    # Review the most overdue questions, in shuffled order.
+                    st.session_state["problem_set"] = build_problem_set(
+                        bank.table, positions[:num_questions]
+                    )
+                elif adaptive:
+                    weights = get_adaptive_weights(bank.version, bank)
+                    st.session_state["problem_set"] = build_problem_set(
+                        bank.table, positions, size=num_questions, weights=weights
+                    )
+                elif search:
+                    # The best matches, in shuffled order.
+                    st.session_state["problem_set"] = build_problem_set(
+                        bank.table, positions[:num_questions]
+                    )
+                else:
+                    # Seeded, so the set can be regenerated from its spec alone.
+                    any_of = selected_tags if tag_match == "Any tag" else []
+                    all_of = selected_tags if tag_match == "All tags" else []
+                    spec = new_spec(
+                        bank, any_of, all_of, excluded_tags, num_questions, new_seed()
+                    )
+                    st.session_state["problem_set"] = generate_set(bank, spec)
+            st.session_state["index"] = 0
             st.balloons()
             st.toast(
-                f"**:blue[{str(len(filtered_df)).zfill(1)} Questions] generated.**  \nProblem Set ready!",
+                f"**:blue[{str(num_questions).zfill(1)} Questions] generated.**  \nProblem Set ready!",
                 icon="🎉",
             )
 
-# st.divider()
-
-# st.subheader("Quick Configs")
-
-# acol1, acol2, _fill1 = st.columns(3)
-# with acol1:
-#     set_pcp = st.button("Generate **50 PCP Problems**", key="pcp")
-#     set_gen = st.button("Generate **50 GEN Problems**", key="gen")
-
-# with acol2:
-#     set_che = st.button("Generate **50 CHE Problems**", key="che")
-#     set_mix = st.button("Generate **50 MIX Problems**", key="mix")
-
-# if set_pcp:
-#     set_tags = ["PCP"]
-#     st.session_state["problem_set"] = generate_50_set(df, set_tags)
-#     st.balloons()
-#     st.toast("**:blue[50 Questions] generated.**  \nProblem Set ready!", icon="🎉")
-# elif set_gen:
-#     set_tags = ["GEN"]
-#     st.session_state["problem_set"] = generate_50_set(df, set_tags)
-#     st.balloons()
-#     st.toast("**:blue[50 Questions] generated.**  \nProblem Set ready!", icon="🎉")
-# elif set_che:
-#     set_tags = ["CHE"]
-#     st.session_state["problem_set"] = generate_50_set(df, set_tags)
-#     st.balloons()
-#     st.toast("**:blue[50 Questions] generated.**  \nProblem Set ready!", icon="🎉")
-# elif set_mix:
-#     set_tags = ["PCP", "GEN", "CHE"]
-#     st.session_state["problem_set"] = generate_50_set(df, set_tags)
-#     st.balloons()
-#     st.toast("**:blue[50 Questions] generated.**  \nProblem Set ready!", icon="🎉")
-
-# st.session_state["problem_set"]
-
 # Sidebar settings
 with st.sidebar:
     st.warning(
-        "ALL PROGRESS IS LOST when you close the tab or press F5 on the page!",
+        "Progress is saved with the **Quiz** page's URL. Bookmark it to come back to your problem set later.",
         icon="⚠️",
     )
     with st.expander("Other Settings ⚙", expanded=True):
@@ -211,7 +198,7 @@ with st.sidebar:
 if audio_on:
     try:
         if generate:
-            st.session_state["fanfare"] = load_fanfare(len(filtered_df))
+            st.session_state["fanfare"] = load_fanfare(num_questions)
         else:
             st.session_state["fanfare"] = load_fanfare(1)
     except NameError:
@@ -239,3 +226,5 @@ st.markdown(
     """,
     unsafe_allow_html=True,
 )
+
+debug_panel()
@@ -1,40 +1,39 @@
+import time
+
 import pandas as pd
 import streamlit as st
 
-from App import load_fanfare
+from pset import metrics
+from pset.attempts import Attempt
+from pset.audio import fanfare_html
+from pset.debug import begin_run, debug_panel
+from pset.resources import get_attempt_log, get_render_cache, get_scheduler
+from pset.state import restore_problem_set, save_problem_set, session_id
 
 st.set_page_config(page_title="Quiz :: Problem Set Generator", page_icon="📝")
+begin_run()
 
-if "problem_set" not in st.session_state:
+pset = restore_problem_set()
+if pset is None:
     st.error("**No problem set found!** Please generate a problem set first.", icon="❗")
     st.stop()
 
-pset = st.session_state["problem_set"]
-
 if "index" not in st.session_state:
     st.session_state["index"] = 0
 
 def set_question(setmode):
     if setmode == "next":
-        if st.session_state["index"] < (len(pset) - 1):
-            st.session_state["index"] = pset.index[pset["QNum"] == question].tolist()[0] + 1
-        else:
-            st.session_state["index"] = 0
+        st.session_state["index"] = (st.session_state["index"] + 1) % len(pset)
     elif setmode == "prev":
-        if st.session_state["index"] > 0:
-            st.session_state["index"] = pset.index[pset["QNum"] == question].tolist()[0] - 1
-        else:
-            st.session_state["index"] = (len(pset) - 1)
+        st.session_state["index"] = (st.session_state["index"] - 1) % len(pset)
     else:
-        st.session_state["index"] = pset.index[pset["QNum"] == setmode].tolist()[0]
+        st.session_state["index"] = pset.position(setmode)
 
 
-st.progress(value=(sum(pset["Done"])) / len(pset), text=f"**Progress:&ensp;:blue[{sum(pset['Done'])}] / {len(pset)}**")
+st.progress(value=pset.num_done / len(pset), text=f"**Progress:&ensp;:blue[{pset.num_done}] / {len(pset)}**")
 
 nav1, _fill1, nav2, _fill2, nav3 = st.columns([1, 1, 3, 1, 1])
 
-question = pset.iloc[st.session_state["index"]]["QNum"]
-
 # Create navigation buttons
 
 
@@ -48,15 +47,25 @@ with nav3:
         set_question("next")
 
 with nav2:
-    question = st.selectbox("Question", pset["QNum"].values, index=st.session_state["index"])
+    question = st.selectbox("Question", pset.qnums, index=st.session_state["index"])
     set_question(question)
 
-correct_answer = pset.loc[pset["QNum"] == question, "Answer"].values[0].strip()
+pos = st.session_state["index"]
+save_problem_set(pset, pos)
+
+# Start the answer timer when a question is first shown.
+if st.session_state.get("shown") != (id(pset), pos):
+    st.session_state["shown"] = (id(pset), pos)
+    st.session_state["shown_at"] = time.monotonic()
+
+with metrics.timer("quiz_lookup"):
+    question_text = get_render_cache().render(pset.questions[pos])
+    choices = pset.choices[pos]
 
 with st.form("Question Form"):
 
     st.subheader(question.replace("Q-", "Question #"))
-    st.markdown(pset.loc[pset["QNum"] == question, "Question"].values[0])
+    st.markdown(question_text.body, unsafe_allow_html=question_text.html)
     # st.markdown(
     #     f"""
     #     <details><summary style='font-size: 1.2em'>Reveal Answer</summary>
@@ -64,23 +73,31 @@ with st.form("Question Form"):
 
     #     <div style='font-size: 1.25em;'><b>
         
-    #     ##### :green[{pset.loc[pset["QNum"] == question, "Answer"].values[0]}]
+    #     ##### :green[{pset.answers[pos]}]
     #     </b></div>
     #     </details>
     #     """,
     #     unsafe_allow_html=True
     # )
 
-    answer = st.radio("**Select Answer**:", pset.loc[pset["QNum"] == question, "Choices"].values[0])
-    done_status = pset.loc[pset["QNum"] == question, "Done"].values[0]
+    answer = st.radio("**Select Answer**:", choices)
+    done_status = bool(pset.done[pos])
 
     if st.form_submit_button("Submit Answer", disabled=done_status):
-        if answer == correct_answer:
-            pset.loc[pset["QNum"] == question, "Correct"] = True
-        else:
-            pset.loc[pset["QNum"] == question, "Correct"] = False
-        pset.loc[pset["QNum"] == question, "Done"] = True
-        st.session_state["problem_set"] = pset.copy()
+        with metrics.timer("quiz_submit"):
+            is_correct = pset.record(pos, answer)
+            latency_ms = int((time.monotonic() - st.session_state["shown_at"]) * 1000)
+            get_attempt_log().log(
+                Attempt(
+                    session=session_id(),
+                    question_id=int(pset.ids[pos]),
+                    choice=answer,
+                    correct=is_correct,
+                    latency_ms=latency_ms,
+                    tags=pset.tags[pos],
+                )
+            )
+            get_scheduler().review(session_id(), int(pset.ids[pos]), is_correct, latency_ms)
 
         set_question("next")
         st.experimental_rerun()
@@ -89,18 +106,20 @@ with st.form("Question Form"):
         st.info("&emsp;**You have already answered this question. Proceed to the next question.**", icon="ℹ️")
 
 
-if pset["Done"].all():
-    if (sum(pset["Correct"]) == len(pset)) and (len(pset) > 50):
-        st.markdown(load_fanfare(9999), unsafe_allow_html=True)
+if pset.all_done():
+    if (pset.num_correct == len(pset)) and (len(pset) > 50):
+        st.markdown(fanfare_html(9999), unsafe_allow_html=True)
     else:
-        st.markdown(st.session_state["fanfare"], unsafe_allow_html=True)
+        st.markdown(st.session_state.get("fanfare", ""), unsafe_allow_html=True)
     st.balloons()
     st.toast("**NICE JOB!**  \nYou completed the problem set!", icon="🎉")
     
 
 with st.sidebar:
     st.info("If it does not navigate properly,  \npress **R** to REFRESH.")
-    st.dataframe(pset[["QNum", "Done"]].rename(columns={"QNum": "Question", "Done": "Done?"}).set_index("Question"), width=150)
+    st.dataframe(pd.DataFrame({"Question": pset.qnums, "Done?": pset.done}).set_index("Question"), width=150)
+
+debug_panel()
 
 
 # pset
\ No newline at end of file
@@ -1,42 +1,34 @@
 import datetime as dt
 
-import altair as alt
-import gspread
-import pandas as pd
 import streamlit as st
 
+from pset import metrics
+from pset.cache import cached
+from pset.debug import begin_run, debug_panel
+from pset.problemset import ProblemSet
+from pset.resources import get_render_cache, get_sheet_writer
+from pset.results import Results, summarize
+from pset.review import card, card_body, join_cards, page_count, paginate
+from pset.state import restore_problem_set, save_problem_set
+
+REVIEW_PAGE_SIZE = 25
+
+
+@cached(max_entries=256, ttl=3600)
+def get_results(fingerprint: str, _pset: ProblemSet) -> Results:
+    # Keyed by the problem set's fingerprint; `_pset` itself is not hashed.
+    return summarize(_pset)
+
+
+@cached(max_entries=256, ttl=3600)
+def generate_runchart(fingerprint: str, _runchartdf):
+    import altair as alt
 
-@st.cache_data
-def generate_plot_data(df):
-    df = df[["ID", "QNum", "Correct", "Streak"]]
-    for row, index in df.iterrows():
-        df.loc[row, "Correct"] = "Correct" if index["Correct"] else "Incorrect"
-        df.loc[row, "QNum"] = index["QNum"].replace("Q-", "")
-    return df
-
-
-@st.cache_data
-def generate_streak_info(results, col: str = "Correct"):
-    data = results[col].to_frame()
-    data["start_of_streak"] = data[col].ne(data[col].shift())
-    data["streak_id"] = data.start_of_streak.cumsum()
-    data["Streak"] = data.groupby("streak_id").cumcount() + 1
-    df = pd.concat([results, data["Streak"]], axis=1)
-    for index, row in df.iterrows():
-        if row[col]:
-            df.loc[index, "Streak"] = row["Streak"]
-        else:
-            df.loc[index, "Streak"] = 0
-    return df
-
-
-@st.cache_data
-def generate_runchart(runchartdf):
     runchart = (
-        alt.Chart(runchartdf)
+        alt.Chart(_runchartdf)
         .mark_point(filled=True, size=400)
         .encode(
-            x=alt.X("QNum", title="Question Number", axis=alt.Axis(labelAngle=0)),
+            x=alt.X("QNum:O", title="Question Number", axis=alt.Axis(labelAngle=0)),
             y=alt.Y("Correct", title=""),
             color=alt.Color(
                 "Correct",
@@ -64,133 +56,105 @@ def generate_runchart(runchartdf):
     return runchart
 
 
-@st.cache_data
-def write_incorrect_questions(incorrect):
-    incorrect_strings = []
-    if st.session_state["auth"]:
-        for index, row in incorrect.iterrows():
-            string = f"""
-<details><summary style='font-size: 1.2em;'>{row["QNum"].replace("Q-", "Question #")}</summary>
-<br>
-
-[#{row["ID"]}]({st.secrets["GSHEETS_URL"]}{row["ID"]+1}) {row["Question"]}
-
-|            |                               |
-| :--------- | :---------------------------- |
-| **Answer** | {row["Answer"]}               |
-| **Tags**   | {',&ensp;'.join(row["Tags"])} |
-<hr>
-</details>
-                """
-            incorrect_strings.append(string)
-    else:
-        for index, row in incorrect.iterrows():
-            string = f"""
-<details><summary style='font-size: 1.2em;'>{row["QNum"].replace("Q-", "Question #")}</summary>
-<br>
-
-{row["Question"]}
-
-|            |                               |
-| :--------- | :---------------------------- |
-| **Answer** | {row["Answer"]}               |
-| **Tags**   | {',&ensp;'.join(row["Tags"])} |
-<hr>
-</details>
-                """
-            incorrect_strings.append(string)
-    return incorrect_strings
+@cached(max_entries=20_000)
+def get_card_body(qid, row_hash, link, _question, _answer, _tags):
+    # One entry per question version (bank ID + row hash), shared by every
+    # session; the text arguments are not hashed.
+    question = get_render_cache().render(_question).body
+    return card_body(qid, question, _answer, _tags, link)
 
 
-@st.cache_resource(show_spinner="Loading...")
-def connect_to_gsheets(worksheet: str):
-    gc = gspread.service_account_from_dict(st.secrets["GSHEETS_CREDS"])
-    sh = gc.open("Board Review")
-    ws = sh.worksheet(worksheet)
-    return ws
+def write_incorrect_questions(pset, positions):
+    incorrect_strings = []
+    # Set by the Generator page, which a restored session may not have run.
+    auth = st.session_state.get("auth", False)
+    for pos in positions:
+        qid = int(pset.ids[pos])
+        link = f"{st.secrets['GSHEETS_URL']}{qid + 1}" if auth else None
+        body = get_card_body(
+            qid,
+            int(pset.hashes[pos]),
+            link,
+            pset.questions[pos],
+            pset.answers[pos],
+            pset.tags[pos],
+        )
+        incorrect_strings.append(card(pset.qnums[pos], body))
+    return incorrect_strings
 
 
 st.set_page_config(page_title="Results :: Problem Set Generator", page_icon="🏆")
+begin_run()
 
-if "problem_set" not in st.session_state:
+pset = restore_problem_set()
+if pset is None:
     st.error("**No problem set found!** Please generate a problem set first.", icon="❗")
     st.stop()
-if not st.session_state["problem_set"]["Done"].all():
+save_problem_set(pset, st.session_state.get("index", 0))
+if not pset.all_done():
     st.error("**Please complete the quiz first!**", icon="❗")
     st.stop()
 
-ws = connect_to_gsheets("PS Data")
-
-results = generate_streak_info(st.session_state["problem_set"].copy(), col="Correct")
-# results
-runchartdf = generate_plot_data(results)
+fingerprint = pset.fingerprint()
+results = get_results(fingerprint, pset)
 
 with st.expander("Result Summary", expanded=True):
     rs1, rs2, rs3 = st.columns(3)
 
     with rs1:
-        st.metric("Score", f"{sum(results['Correct'])} / {len(results)}")
+        st.metric("Score", f"{results.score} / {results.total}")
     with rs2:
-        st.metric(
-            "Accuracy", f"{round(sum(results['Correct']) / len(results) * 100, 2)}%"
-        )
+        st.metric("Accuracy", f"{results.accuracy}%")
     with rs3:
-        # Show metric for highest streak of correct questions from cumulative sum of correct answers column
-        st.metric("Highest Streak", f"{max(results['Streak'])}")
+        # Show metric for highest streak of correct questions
+        st.metric("Highest Streak", f"{results.max_streak}")
 
 
 # Generate altair scatter plot of correct and incorrect items vs question number, change symbol to checkmark or cross
 st.markdown("#### Run Chart")
-runchart = generate_runchart(runchartdf)
+runchart = generate_runchart(fingerprint, results.runchart)
 
 st.altair_chart(runchart, use_container_width=True)
 
 st.divider()
 
 #  Generate list of questions that were answered incorrectly
-st.markdown(f"#### Incorrect Questions: :red[{len(results) - sum(results['Correct'])}]")
-incorrect = results[results["Correct"] == False]
-incorrect = incorrect[["ID", "QNum", "Question", "Answer", "Tags"]]
-incorrect_qid_list = [str(id) for id in incorrect["ID"].tolist()].copy()
-incorrect_qid_list.sort()
-incorrect_qid_list = "; ".join(incorrect_qid_list)
-incorrect_tags_list = "; ".join(
-    list(set([item for sublist in incorrect["Tags"].tolist() for item in sublist]))
-)
-incorrect_strings = write_incorrect_questions(incorrect)
-for q_string in incorrect_strings:
-    st.markdown(q_string, unsafe_allow_html=True)
+st.markdown(f"#### Incorrect Questions: :red[{results.total - results.score}]")
+incorrect_qid_list = "; ".join(results.incorrect_ids)
+incorrect_tags_list = "; ".join(results.incorrect_tags)
+num_pages = page_count(len(results.incorrect), REVIEW_PAGE_SIZE)
+review_page = 1
+if num_pages > 1:
+    review_page = st.number_input(
+        f"Page (of {num_pages})", min_value=1, max_value=num_pages, step=1
+    )
+page_positions = paginate(list(results.incorrect), review_page, REVIEW_PAGE_SIZE)
+with metrics.timer("review_cards"):
+    incorrect_strings = write_incorrect_questions(pset, page_positions)
+st.markdown(join_cards(incorrect_strings), unsafe_allow_html=True)
 
 with st.sidebar:
-    if st.session_state["auth"]:
+    if st.session_state.get("auth", False):
         with st.form("Save Results"):
             duration = st.number_input("Run Duration (secs)", min_value=1, step=1)
-            run_tags = "; ".join(
-                list(
-                    set(
-                        [
-                            item
-                            for sublist in results["Tags"].tolist()
-                            for item in sublist
-                        ]
-                    )
-                )
-            )
+            run_tags = "; ".join(results.run_tags)
 
             result_list = [
                 dt.datetime.now().strftime("%Y-%m-%d"),
-                sum(results["Correct"]),
-                len(results),
+                results.score,
+                results.total,
                 duration,
                 '=(INDIRECT("RC[-3]",FALSE))/INDIRECT("RC[-2]",FALSE)',
                 '=(INDIRECT("RC[-4]",FALSE)+1)/(INDIRECT("RC[-3]",FALSE)+2)',
-                max(results["Streak"]),
+                results.max_streak,
                 run_tags,
                 incorrect_qid_list,
                 incorrect_tags_list,
             ]
 
             if st.form_submit_button("Save Results"):
-                ws.append_rows([result_list], value_input_option="USER_ENTERED")
+                get_sheet_writer().append("PS Data", result_list)
                 st.balloons()
                 st.toast("**Results saved!**", icon="🎉")
+
+debug_panel()
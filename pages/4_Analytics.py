@@ -1,10 +1,53 @@
-import datetime as dt
-
-import altair as alt
-import gspread
-import pandas as pd
 import streamlit as st
 
+from pset.resources import get_analytics_store, get_sheets_client
+
+ANALYTICS_SYNC_SECS = 300
+
+
+# Altair is only imported once there is something to chart.
+def volume_chart(daily):
+    import altair as alt
+
+    return (
+        alt.Chart(daily)
+        .mark_bar()
+        .encode(
+            x=alt.X("Date:T", title="Date"),
+            y=alt.Y("Questions:Q", title="Questions"),
+            color=alt.Color(
+                "Accuracy:Q", scale=alt.Scale(scheme="redyellowgreen", domain=[0, 1])
+            ),
+            tooltip=[
+                "Date:T",
+                "Runs",
+                "Questions",
+                "Correct",
+                alt.Tooltip("Accuracy", format=".0%"),
+            ],
+        )
+        .properties(height=250)
+    )
+
+
+def tag_chart(tag_accuracy):
+    import altair as alt
+
+    return (
+        alt.Chart(tag_accuracy)
+        .mark_line(point=True)
+        .encode(
+            x=alt.X("Date:T", title="Week"),
+            y=alt.Y(
+                "Clean:Q", title="", axis=alt.Axis(format="%"), scale=alt.Scale(domain=[0, 1])
+            ),
+            color="Tag:N",
+            tooltip=["Tag", "Date:T", "Runs", "Missed", alt.Tooltip("Clean", format=".0%")],
+        )
+        .properties(height=250)
+    )
+
+
 st.set_page_config(page_title="Analytics :: Problem Set Generator", page_icon="📊")
 
 if ("auth" not in st.session_state) or (not st.session_state["auth"]):
@@ -12,3 +55,50 @@ if ("auth" not in st.session_state) or (not st.session_state["auth"]):
         "&ensp; **You are unauthorized to see this page.** Please login.", icon="🔒"
     )
     st.stop()
+
+store = get_analytics_store()
+try:
+    store.sync(get_sheets_client().worksheet("PS Data"), ANALYTICS_SYNC_SECS)
+except Exception as e:
+    st.warning(f"Could not fetch new runs from Google Sheets: {e}", icon="⚠️")
+
+if store.daily is None or store.daily.empty:
+    st.info("**No runs saved yet.** Save results from the Results page first.", icon="ℹ️")
+    st.stop()
+
+daily = store.daily_accuracy()
+
+with st.expander("Overview", expanded=True):
+    ov1, ov2, ov3, ov4 = st.columns(4)
+    with ov1:
+        st.metric("Runs", f"{daily['Runs'].sum()}")
+    with ov2:
+        st.metric("Questions", f"{daily['Questions'].sum()}")
+    with ov3:
+        st.metric(
+            "Accuracy",
+            f"{round(daily['Correct'].sum() / daily['Questions'].sum() * 100, 2)}%",
+        )
+    with ov4:
+        st.metric("Hours", f"{round(daily['Duration'].sum() / 3600, 1)}")
+
+st.markdown("#### Daily Volume")
+st.altair_chart(volume_chart(daily), use_container_width=True)
+
+st.markdown("#### Tag Accuracy over Time")
+st.caption("Share of runs per week with no incorrect answer on the tag.")
+tag_accuracy = store.tag_accuracy("W")
+chart_tags = st.multiselect(
+    "Tags",
+    sorted(tag_accuracy["Tag"].unique()),
+    default=sorted(tag_accuracy.groupby("Tag")["Runs"].sum().nlargest(5).index),
+)
+st.altair_chart(
+    tag_chart(tag_accuracy[tag_accuracy["Tag"].isin(chart_tags)]), use_container_width=True
+)
+
+st.markdown("#### Most Missed Questions")
+st.dataframe(
+    store.questions.sort_values(["Misses", "LastMissed"], ascending=False).head(25),
+    use_container_width=True,
+)
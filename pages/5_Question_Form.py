@@ -1,8 +1,13 @@
 import datetime as dt
 
-import gspread
 import streamlit as st
 
+from pset import metrics
+from pset.dedup import similar_questions
+from pset.importer import sheet_row
+from pset.resources import get_bank, get_dedup_index, get_render_cache, get_sheet_writer
+from pset.subjects import SUBJECT_TAGS
+
 st.set_page_config(
     page_title="Question :: Problem Set Generator",
     page_icon="🔢",
@@ -16,70 +21,6 @@ if ("auth" not in st.session_state) or (not st.session_state["auth"]):
     )
     st.stop()
 
-
-@st.cache_resource(show_spinner="Loading...")
-def connect_to_gsheets(worksheet: str):
-    gc = gspread.service_account_from_dict(st.secrets["GSHEETS_CREDS"])
-    sh = gc.open("Board Review")
-    ws = sh.worksheet(worksheet)
-    return ws
-
-
-ws = connect_to_gsheets("QnA")
-
-subject_tags = [
-    "PCP",
-    "CHE",
-    "GEN",
-    "MIX",
-    "ChE Calculations",
-    "Unit Operations",
-    "Leaching",
-    "Liquid-liquid Extraction",
-    "Distillation",
-    "Screening",
-    "Size Reduction",
-    "Sedimentation",
-    "Centrifugation",
-    "Filtration",
-    "Fluidization",
-    "Diffusion/Gas Absorption",
-    "Evaporation",
-    "Crystallization",
-    "Humidification",
-    "Drying",
-    "Momentum Transfer",
-    "Heat Transfer",
-    "Mass Transfer",
-    "Chemical Reaction Engineering",
-    "Pre-Calculus",
-    "Plane and Solid Geometry",
-    "Analytic Geometry",
-    "Differential Calculus",
-    "Integral Calculus",
-    "Differential Equations",
-    "Engineering Data Analysis",
-    "Engineering Economics",
-    "Physics",
-    "Engineering Mechanics",
-    "General Chemistry",
-    "Analytical Chemistry",
-    "Organic Chemistry",
-    "Physical Chemistry",
-    "ChE Thermodynamics",
-    "Industrial Waste Management and Control",
-    "Environmental Engineering",
-    "Materials Science and Engineering",
-    "Solution Thermodynamics",
-    "Biochemical Engineering",
-    "Chemical Process Industries",
-    "Instrumentation and Process Control",
-    "Plant Design",
-    "ChE Laws, Ethics, Contracts",
-    "Engineering Management",
-    "Process Safety",
-]
-
 # Main ========================================================================
 
 # r0c1, _fill0, r0c2 = st.columns([15, 1, 15])
@@ -115,7 +56,9 @@ with st.expander("**Question Input**", expanded=True):
         ).strip()
         st.session_state["question_input"] = question_input
     with r1c2:
-        st.markdown(f"**PREVIEW**:\n\n{question_input}", unsafe_allow_html=True)
+        preview = get_render_cache().render(question_input, persist=False)
+        st.markdown("**PREVIEW**:")
+        st.markdown(preview.body, unsafe_allow_html=True)
 
 with st.expander("**Choices and Answer**", expanded=True):
     r2c1, _fill2, r2c2 = st.columns([15, 1, 15])
@@ -179,10 +122,28 @@ with st.expander("**Choices and Answer**", expanded=True):
             st.write("")
             st.warning("Please enter all choices.", icon="⚠️")
 
+if question_input:
+    with metrics.timer("dedup_check"):
+        bank = get_bank().snapshot
+        dedup_index = get_dedup_index()
+        dedup_index.sync(bank.table)
+        similar = similar_questions(
+            dedup_index, bank, question_input, [choice1, choice2, choice3, choice4]
+        )
+    if similar:
+        st.warning(
+            "**Possible duplicate of:**\n\n"
+            + "\n".join(
+                f"- **#{qid}** ({similarity:.0%} similar): {text[:120]}"
+                for qid, similarity, text in similar[:5]
+            ),
+            icon="⚠️",
+        )
+
 with st.expander("**Tags**", expanded=True):
     question_tags = st.multiselect(
         "Select **TAGS**:",
-        subject_tags,
+        SUBJECT_TAGS,
         key="tags_field",
         default=st.session_state["tags_input"],
     )
@@ -205,7 +166,7 @@ else:
 choices = "; ".join([choice1, choice2, choice3, choice4])
 tags = "; ".join(question_tags)
 
-data = ['=INDIRECT("R[-1]C",FALSE)+1', question_input, choices, correct_answer, tags]
+data = sheet_row(question_input, [choice1, choice2, choice3, choice4], correct_answer, question_tags)
 
 check1, _cfill, check2 = st.columns([25, 7, 10])
 
@@ -242,7 +203,8 @@ with check2:
     st.write("")
     if st.button("Submit Data", type="primary", disabled=unsubmittable):
         st.balloons()
-        ws.append_row(data, value_input_option="USER_ENTERED")
+        get_sheet_writer().append("QnA", data)
+        get_bank().request_refresh()
         st.toast("Question saved!", icon="💾")
         st.session_state["question_input"] = "Hello"
         st.session_state["choice1"] = "Hello"
@@ -0,0 +1,122 @@
+import hashlib
+import os
+
+import streamlit as st
+
+from pset.importer import Validator, import_file, load_checkpoint, read_rejects
+from pset.resources import get_bank, get_dedup_index, get_sheet_writer
+from pset.state import rerun
+
+st.set_page_config(page_title="Import :: Problem Set Generator", page_icon="📥")
+
+# Chunks (of 500 questions) imported per script run.
+IMPORT_CHUNKS_PER_RUN = 4
+
+if ("auth" not in st.session_state) or (not st.session_state["auth"]):
+    st.error(
+        "&ensp; **You are unauthorized to see this page.** Please login.", icon="🔒"
+    )
+    st.stop()
+
+
+def show_rejects(rejects):
+    if rejects:
+        st.dataframe(
+            [
+                {"Record": r.number, "Question": r.question[:80], "Errors": "; ".join(r.errors)}
+                for r in rejects
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+
+
+st.markdown("#### Bulk Import")
+st.caption(
+    "Upload a CSV with `Question`, `Choices`, `Answer` and `Tags` columns, or a JSONL "
+    "file with the same keys. Valid questions are appended to the QnA sheet in "
+    "batches; re-upload the same file to resume an interrupted import. Validating "
+    "checks the whole file at once; for very large files, use `python -m pset import`."
+)
+
+upload = st.file_uploader("Questions file", type=["csv", "jsonl"])
+if upload is None:
+    st.session_state.pop("import_job", None)
+    st.stop()
+
+# Stored by content, so re-uploading a file finds its checkpoint.
+data = upload.getvalue()
+imports_dir = st.secrets.get("IMPORTS_DIR", "imports")
+os.makedirs(imports_dir, exist_ok=True)
+path = os.path.join(
+    imports_dir,
+    hashlib.sha256(data).hexdigest()[:16] + os.path.splitext(upload.name)[1].lower(),
+)
+if not os.path.exists(path):
+    with open(path, "wb") as f:
+        f.write(data)
+
+job = st.session_state.get("import_job")
+if job is not None and job[0] != path:
+    job = st.session_state["import_job"] = None
+
+checkpoint = load_checkpoint(path)
+if checkpoint is not None and job is None:
+    st.info(
+        f"**Resuming:** {checkpoint['records']} records already processed "
+        f"({checkpoint['imported']} imported, {checkpoint['rejected']} rejected).",
+        icon="ℹ️",
+    )
+
+validate_col, import_col, restart_col = st.columns(3)
+with validate_col:
+    validate = st.button("Validate", disabled=job is not None)
+with import_col:
+    run_import = st.button("Import", type="primary", disabled=job is not None)
+with restart_col:
+    restart = st.checkbox("Start over", disabled=checkpoint is None or job is not None)
+
+if run_import:
+    # (path, restart); the import goes on over reruns.
+    job = st.session_state["import_job"] = (path, restart)
+
+if validate or job is not None:
+    progress_bar = st.progress(0.0, text="Reading...")
+
+    def report(progress):
+        progress_bar.progress(
+            progress.fraction,
+            text=f"{progress.records} records: **{progress.imported}** "
+            f"{'imported' if job is not None else 'valid'}, **{progress.rejected}** rejected",
+        )
+
+    validator = Validator.for_bank(get_bank().snapshot, get_dedup_index())
+    if job is not None:
+        restart = job[1]
+        writer = get_sheet_writer()
+        # A few chunks per rerun, so a large file neither blocks the
+        # script for minutes nor holds its records in memory at once.
+        progress, _ = import_file(
+            path,
+            validator,
+            write=lambda rows: writer.extend("QnA", rows),
+            on_progress=report,
+            restart=restart,
+            max_chunks=IMPORT_CHUNKS_PER_RUN,
+        )
+        if not progress.finished:
+            st.session_state["import_job"] = (path, False)
+            rerun()
+        st.session_state["import_job"] = None
+        get_bank().request_refresh()
+        st.success(
+            f"**Queued {progress.imported} questions** for the QnA sheet "
+            f"({writer.pending()} rows still being sent).",
+            icon="💾",
+        )
+        rejects = read_rejects(path)
+    else:
+        progress, rejects = import_file(path, validator, on_progress=report)
+    if rejects:
+        st.warning(f"**{len(rejects)} records rejected.**", icon="⚠️")
+        show_rejects(rejects)
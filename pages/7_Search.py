@@ -0,0 +1,77 @@
+import streamlit as st
+
+from pset import metrics
+from pset.builder import build_problem_set
+from pset.debug import begin_run, debug_panel
+from pset.resources import get_bank, get_search_index
+from pset.search import search_positions
+
+st.set_page_config(page_title="Search :: Problem Set Generator", page_icon="🔎")
+begin_run()
+
+MAX_HITS = 200
+
+bank = get_bank().snapshot
+index = get_search_index()
+index.sync(bank)
+
+st.markdown("#### Search Questions")
+query = st.text_input(
+    "Search",
+    placeholder='e.g. McCabe-Thiele, "heat exchanger", distill',
+    help="Matches questions containing every word or quoted phrase, in the question, "
+    "choices or answer; the last word also matches as a prefix.",
+    label_visibility="collapsed",
+).strip()
+if not query:
+    st.stop()
+
+with metrics.timer("search"):
+    hits = index.search(query, MAX_HITS)
+if not hits:
+    st.info("&emsp;**No questions match the search.**", icon="ℹ️")
+    st.stop()
+
+positions = search_positions([hit.question_id for hit in hits], bank.id_pos)
+if len(positions) == 0:
+    # Every hit was removed from the bank since the index was synced.
+    st.info("&emsp;**No questions match the search.**", icon="ℹ️")
+    st.stop()
+st.caption(f"**{len(hits)}{'+' if len(hits) == MAX_HITS else ''}** matching questions, best first.")
+
+with st.expander("**Problem set from these results** ⚙"):
+    if len(positions) > 1:
+        num_questions = st.slider(
+            "Number of top results to use:",
+            min_value=1,
+            max_value=len(positions),
+            value=min(len(positions), 50),
+        )
+    else:
+        num_questions = 1
+        st.info("&emsp;**Only _:red[one]_ question found.**", icon="ℹ️")
+    if st.button(
+        "Generate!", type="primary", disabled=(not st.session_state.get("access", False))
+    ):
+        with metrics.timer("assemble_set"):
+            st.session_state["problem_set"] = build_problem_set(
+                bank.table, positions[:num_questions]
+            )
+        st.session_state["index"] = 0
+        st.toast(
+            f"**:blue[{num_questions} Questions] generated.**  \n"
+            "Problem Set ready!",
+            icon="🎉",
+        )
+    if not st.session_state.get("access", False):
+        st.caption("Enter the access key on the Generator page to generate problem sets.")
+
+tags = bank.table.column("Tags").take(positions).to_pylist()
+for hit, row_tags in zip((hit for hit in hits if hit.question_id in bank.id_pos), tags):
+    # Snippets may cut math short, so dollar signs are shown as is.
+    st.markdown(
+        f"**#{hit.question_id}** &ensp; `{'` `'.join(row_tags or [])}`  \n"
+        + hit.snippet.replace("$", "\\$")
+    )
+
+debug_panel()
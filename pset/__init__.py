@@ -0,0 +1,5 @@
+"""Core library for the Problem Set Generator.
+
+The Streamlit scripts (``App.py`` and ``pages/``) stay thin and call into the
+modules of this package for anything that touches the question bank.
+"""
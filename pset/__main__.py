@@ -0,0 +1,278 @@
+"""Command line tools for the Problem Set Generator.
+
+Usage:
+    python -m pset compile qna.csv bank.arrow
+    python -m pset reschedule attempts.db
+    python -m pset prerender qna.csv render-cache
+    python -m pset import questions.jsonl --bank qna.csv --creds service-account.json
+    python -m pset dedup qna.csv --output duplicates.csv
+    python -m pset search qna.csv "McCabe-Thiele" --db search.db
+    python -m pset bench --rows 1000 10000 100000 --baseline bench-baseline.json
+"""
+import argparse
+import json
+import sys
+
+
+def cmd_compile(args):
+    from pset.bank import compile_bank
+
+    rows = compile_bank(args.source, args.output)
+    print(f"Compiled {rows} questions into {args.output}")
+
+
+def cmd_reschedule(args):
+    from pset.attempts import AttemptLog
+    from pset.srs import Scheduler
+
+    cards = Scheduler(args.db).reschedule(AttemptLog(args.db).history())
+    print(f"Rescheduled {cards} questions from the attempt log in {args.db}")
+
+
+def cmd_prerender(args):
+    from pset.bank import read_csv
+    from pset.render import RenderCache
+
+    questions = read_csv(args.source)["Question"]
+    rendered = RenderCache(args.cache_dir).warm(questions)
+    print(f"Rendered {rendered} of {len(questions)} questions into {args.cache_dir}")
+
+
+def cmd_import(args):
+    from pset.bank import LiveBank
+    from pset.dedup import DedupIndex
+    from pset.importer import Validator, import_file
+
+    if args.bank:
+        validator = Validator.for_bank(LiveBank.from_source(args.bank).snapshot, DedupIndex())
+    else:
+        validator = Validator()
+
+    writer = None
+    if not args.dry_run:
+        from pset.sheets import SheetsClient, SheetWriter
+
+        with open(args.creds) as f:
+            client = SheetsClient(json.load(f))
+        writer = SheetWriter(client.worksheet, args.journal, batch_size=args.chunk_size).start()
+
+    def report(progress):
+        print(
+            f"\r{progress.fraction:6.1%}  {progress.records} records, "
+            f"{progress.imported} {'valid' if writer is None else 'imported'}, "
+            f"{progress.rejected} rejected",
+            end="",
+            file=sys.stderr,
+        )
+
+    progress, rejects = import_file(
+        args.file,
+        validator,
+        write=None if writer is None else lambda rows: writer.extend("QnA", rows),
+        chunk_size=args.chunk_size,
+        on_progress=report,
+        restart=args.restart,
+    )
+    print(file=sys.stderr)
+    for reject in rejects[: args.show_rejects]:
+        print(f"record {reject.number}: {'; '.join(reject.errors)}")
+    if len(rejects) > args.show_rejects:
+        print(f"... and {len(rejects) - args.show_rejects} more")
+    if writer is None:
+        print(f"{progress.records - progress.rejected} of {progress.records} records are valid")
+        return
+    writer.stop(timeout=args.timeout)
+    print(f"Imported {progress.imported} questions, rejected {progress.rejected}")
+    if writer.pending():
+        print(
+            f"{writer.pending()} rows are still queued in {writer.journal_path}; "
+            "re-run to send them"
+        )
+
+
+def cmd_dedup(args):
+    import csv
+
+    from pset.bank import LiveBank
+    from pset.dedup import DedupIndex, live_mask
+
+    snapshot = LiveBank.from_source(args.source).snapshot
+    index = DedupIndex()
+    index.sync(snapshot.table)
+    pairs = index.pairs(args.threshold, live_mask(snapshot.id_pos, snapshot.table.num_rows))
+    ids = snapshot.table.column("ID").to_pylist()
+    questions = snapshot.table.column("Question")
+    for a, b, similarity in pairs[: args.show]:
+        print(f"{similarity:.0%}  #{ids[a]}  #{ids[b]}  {questions[a].as_py()[:60]!r}")
+    if len(pairs) > args.show:
+        print(f"... and {len(pairs) - args.show} more")
+    print(f"{len(pairs)} near-duplicate pairs among {len(snapshot.id_pos)} questions")
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["ID", "Duplicate ID", "Similarity", "Question", "Duplicate Question"])
+            for a, b, similarity in pairs:
+                writer.writerow(
+                    [ids[a], ids[b], similarity, questions[a].as_py(), questions[b].as_py()]
+                )
+
+
+def cmd_search(args):
+    import time
+
+    from pset.bank import LiveBank
+    from pset.search import SearchIndex
+
+    snapshot = LiveBank.from_source(args.source).snapshot
+    index = SearchIndex(args.db)
+    start = time.perf_counter()
+    changed = index.sync(snapshot)
+    print(f"Indexed {changed} changed questions in {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    hits = index.search(args.query, args.limit)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    for hit in hits:
+        print(f"{hit.score:8.3f}  #{hit.question_id}  {hit.snippet}")
+    print(f"{len(hits)} hits in {elapsed_ms:.1f} ms")
+
+
+def cmd_bench(args):
+    from pset.bench import compare, format_report, load_report, run
+
+    report = run(args.rows, args.students, args.set_size, args.mode)
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved baseline to {args.baseline}")
+        return
+    baseline = load_report(args.baseline) if args.baseline else None
+    if baseline is not None:
+        regressions = compare(report, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline} (threshold x{args.threshold})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pset")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compile_parser = commands.add_parser(
+        "compile", help="Compile the question bank CSV into a memory-mappable file."
+    )
+    compile_parser.add_argument("source", help="Path or URL of the question bank CSV.")
+    compile_parser.add_argument("output", help="Destination of the compiled bank.")
+    compile_parser.set_defaults(func=cmd_compile)
+
+    reschedule_parser = commands.add_parser(
+        "reschedule", help="Rebuild every review schedule from the full attempt log."
+    )
+    reschedule_parser.add_argument("db", help="Path of the attempts database.")
+    reschedule_parser.set_defaults(func=cmd_reschedule)
+
+    prerender_parser = commands.add_parser(
+        "prerender", help="Render every question's Markdown and math into the render cache."
+    )
+    prerender_parser.add_argument("source", help="Path or URL of the question bank CSV.")
+    prerender_parser.add_argument(
+        "cache_dir", nargs="?", default="render-cache", help="The render cache directory."
+    )
+    prerender_parser.set_defaults(func=cmd_prerender)
+
+    import_parser = commands.add_parser(
+        "import", help="Validate and append a CSV or JSONL file of questions to the QnA sheet."
+    )
+    import_parser.add_argument("file", help="The CSV or JSONL file of questions.")
+    import_parser.add_argument(
+        "--bank", help="Path or URL of the question bank CSV, to reject duplicates of it."
+    )
+    import_parser.add_argument("--creds", help="Service account JSON file for Google Sheets.")
+    import_parser.add_argument(
+        "--journal", default="import-journal.jsonl", help="Journal of rows not yet sent."
+    )
+    import_parser.add_argument(
+        "--chunk-size", type=int, default=500, help="Rows written per batch."
+    )
+    import_parser.add_argument(
+        "--dry-run", action="store_true", help="Only validate the file."
+    )
+    import_parser.add_argument(
+        "--restart", action="store_true", help="Ignore the checkpoint of an earlier run."
+    )
+    import_parser.add_argument(
+        "--show-rejects", type=int, default=20, help="Rejected records to list."
+    )
+    import_parser.add_argument(
+        "--timeout", type=float, default=300.0, help="Seconds to wait for Sheets at the end."
+    )
+    import_parser.set_defaults(func=cmd_import)
+
+    dedup_parser = commands.add_parser(
+        "dedup", help="Report the near-duplicate questions in the bank."
+    )
+    dedup_parser.add_argument("source", help="Path or URL of the question bank CSV.")
+    dedup_parser.add_argument(
+        "--threshold", type=float, default=0.7,
+        help="Least estimated similarity (Jaccard) of a reported pair.",
+    )
+    dedup_parser.add_argument("--output", help="Write every pair to this CSV file.")
+    dedup_parser.add_argument("--show", type=int, default=20, help="Pairs to print.")
+    dedup_parser.set_defaults(func=cmd_dedup)
+
+    search_parser = commands.add_parser(
+        "search", help="Update the full-text index of the bank and search it."
+    )
+    search_parser.add_argument("source", help="Path or URL of the question bank CSV.")
+    search_parser.add_argument("query", help="Words and quoted phrases to search for.")
+    search_parser.add_argument(
+        "--db", default="search.db", help="Path of the search index database."
+    )
+    search_parser.add_argument("--limit", type=int, default=20, help="Hits to print.")
+    search_parser.set_defaults(func=cmd_search)
+
+    bench_parser = commands.add_parser(
+        "bench", help="Benchmark the generator, quiz and results pages headlessly."
+    )
+    bench_parser.add_argument(
+        "--rows", type=int, nargs="+", default=[1000, 10000, 100000],
+        help="Synthetic bank sizes to benchmark.",
+    )
+    bench_parser.add_argument(
+        "--students", type=int, default=20, help="Concurrent simulated students."
+    )
+    bench_parser.add_argument(
+        "--set-size", type=int, default=50, help="Questions per problem set."
+    )
+    bench_parser.add_argument(
+        "--mode", choices=["core", "app"], default="core",
+        help="Call the page functions directly, or run the pages with AppTest.",
+    )
+    bench_parser.add_argument("--output", help="Write the report as JSON.")
+    bench_parser.add_argument(
+        "--baseline", help="Baseline report to compare against (or to save with --save-baseline)."
+    )
+    bench_parser.add_argument(
+        "--threshold", type=float, default=1.25,
+        help="Fail when a step is this many times slower than the baseline.",
+    )
+    bench_parser.add_argument(
+        "--save-baseline", action="store_true", help="Save the report as the baseline."
+    )
+    bench_parser.set_defaults(func=cmd_bench)
+
+    args = parser.parse_args(argv)
+    if getattr(args, "save_baseline", False) and not args.baseline:
+        parser.error("--save-baseline requires --baseline")
+    if args.command == "import" and not (args.dry_run or args.creds):
+        parser.error("import requires --creds unless --dry-run")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
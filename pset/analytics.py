@@ -0,0 +1,295 @@
+"""Local analytics over the runs saved to the "PS Data" worksheet.
+
+Each saved run is one summary row: date, score, total, duration, two formula
+columns, highest streak, tags, incorrect IDs and incorrect tags. Rows are
+ingested incrementally (only those after the last ingested sheet row) into
+Parquet segments, and small pre-aggregated rollups are updated from each new
+batch alone, so rendering the Analytics page never scans the whole history.
+
+Summary rows only record which tags a run touched and which tags had misses,
+not how many questions per tag, so per-tag figures are per run: a run
+"misses" a tag when at least one of its incorrect questions carries it.
+"""
+import json
+import os
+import threading
+import time
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+RUN_COLUMNS = [
+    "Date",
+    "Score",
+    "Total",
+    "Duration",
+    "Accuracy",
+    "Laplace",
+    "Streak",
+    "Tags",
+    "Incorrect IDs",
+    "Incorrect Tags",
+]
+
+
+def split_field(value: str) -> List[str]:
+    return [item.strip() for item in str(value).split(";") if item.strip()]
+
+
+def parse_runs(rows: List[List[str]]) -> pd.DataFrame:
+    """
+    Parses raw "PS Data" rows into a typed runs frame.
+
+    Args:
+        rows (List[List[str]]): Sheet values, one list per row, in
+            `RUN_COLUMNS` order (short rows are padded).
+
+    Returns:
+        pd.DataFrame: One row per run, with `Tags`, `Incorrect IDs` and
+            `Incorrect Tags` split into lists.
+    """
+    width = len(RUN_COLUMNS)
+    runs = pd.DataFrame(
+        [(list(row) + [""] * width)[:width] for row in rows], columns=RUN_COLUMNS
+    )
+    runs["Date"] = pd.to_datetime(runs["Date"], errors="coerce").dt.date
+    for col in ["Score", "Total", "Duration", "Streak"]:
+        runs[col] = pd.to_numeric(runs[col], errors="coerce").fillna(0).astype("int64")
+    runs = runs[runs["Date"].notna() & (runs["Total"] > 0)]
+    # The accuracy columns are sheet formulas; recompute them from the counts.
+    runs["Accuracy"] = runs["Score"] / runs["Total"]
+    runs["Laplace"] = (runs["Score"] + 1) / (runs["Total"] + 2)
+    runs["Tags"] = runs["Tags"].map(split_field)
+    runs["Incorrect IDs"] = runs["Incorrect IDs"].map(
+        lambda value: [int(qid) for qid in split_field(value) if qid.isdigit()]
+    )
+    runs["Incorrect Tags"] = runs["Incorrect Tags"].map(split_field)
+    return runs.reset_index(drop=True)
+
+
+def daily_rollup(runs: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns runs, questions, correct answers and seconds spent per day.
+    """
+    daily = runs.groupby("Date").agg(
+        Runs=("Score", "size"),
+        Questions=("Total", "sum"),
+        Correct=("Score", "sum"),
+        Duration=("Duration", "sum"),
+    )
+    return daily
+
+
+def tag_rollup(runs: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns, per day and tag, the runs that touched the tag and the runs
+    that missed at least one question carrying it.
+    """
+    touched = runs[["Date", "Tags"]].explode("Tags").dropna()
+    missed = runs[["Date", "Incorrect Tags"]].explode("Incorrect Tags").dropna()
+    touched = touched.groupby(["Date", "Tags"]).size().rename("Runs")
+    missed = missed.groupby(["Date", "Incorrect Tags"]).size().rename("Missed")
+    missed.index.names = touched.index.names = ["Date", "Tag"]
+    return pd.concat([touched, missed], axis=1).fillna(0).astype("int64")
+
+
+def question_rollup(runs: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns how often, and when last, each question was answered incorrectly.
+    """
+    misses = runs[["Date", "Incorrect IDs"]].explode("Incorrect IDs").dropna()
+    misses = misses.rename(columns={"Incorrect IDs": "ID"})
+    misses["ID"] = misses["ID"].astype("int64")
+    return misses.groupby("ID").agg(
+        Misses=("Date", "size"), LastMissed=("Date", "max")
+    )
+
+
+def merge_counts(old: Optional[pd.DataFrame], new: pd.DataFrame) -> pd.DataFrame:
+    if old is None or old.empty:
+        return new
+    return old.add(new, fill_value=0).astype("int64")
+
+
+class AnalyticsStore:
+    """
+    A directory holding ingested runs as Parquet segments plus rollups.
+
+    Layout:
+        state.json              the next sheet row to ingest, the segment
+                                count and the rollup version
+        runs/part-*.parquet     one segment per ingested batch of runs
+        daily-<version>.parquet     `daily_rollup` over all runs
+        tags-<version>.parquet      `tag_rollup` over all runs
+        questions-<version>.parquet `question_rollup` over all runs
+
+    An ingest writes its segment under a staging name and new versions of
+    the rollups, then atomically replaces `state.json`, which is what
+    commits the batch. Files an interrupted ingest left behind are
+    completed or removed on open, so a crash never counts a run twice.
+
+    Args:
+        path (str): The store directory; created if missing.
+        first_row (int): The first sheet row holding data (below the header).
+    """
+
+    ROLLUPS = ("daily", "tags", "questions")
+
+    def __init__(self, path: str, first_row: int = 2):
+        self.path = path
+        self._lock = threading.RLock()
+        self.last_sync = 0.0
+        os.makedirs(os.path.join(path, "runs"), exist_ok=True)
+        self.state = {"next_row": first_row, "segments": 0, "rollups": 0}
+        if os.path.exists(self._file("state.json")):
+            with open(self._file("state.json")) as f:
+                self.state.update(json.load(f))
+        self._recover()
+        self.daily = self._load(self._rollup("daily", self.state["rollups"]))
+        self.tags = self._load(self._rollup("tags", self.state["rollups"]))
+        self.questions = self._load(self._rollup("questions", self.state["rollups"]))
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @staticmethod
+    def _rollup(name: str, version: int) -> str:
+        return f"{name}-{version:05d}.parquet"
+
+    @staticmethod
+    def _segment(index: int, staged: bool = False) -> str:
+        # Staged segments start with "_", which Parquet dataset reads skip.
+        return f"runs/{'_' if staged else ''}part-{index:05d}.parquet"
+
+    def _recover(self):
+        # Finish renaming a committed segment, and drop the segment and
+        # rollups of an ingest that never committed.
+        for name in os.listdir(self._file("runs")):
+            if name.startswith("_part-"):
+                index = int(name[len("_part-") : -len(".parquet")])
+                staged = self._file(self._segment(index, staged=True))
+                if index < self.state["segments"]:
+                    os.replace(staged, self._file(self._segment(index)))
+                else:
+                    os.remove(staged)
+        self._remove_old_rollups()
+
+    def _remove_old_rollups(self):
+        current = {self._rollup(name, self.state["rollups"]) for name in self.ROLLUPS}
+        for name in os.listdir(self.path):
+            if name.endswith(".parquet") and name not in current:
+                os.remove(self._file(name))
+
+    def _load(self, name: str) -> Optional[pd.DataFrame]:
+        if not os.path.exists(self._file(name)):
+            return None
+        return pd.read_parquet(self._file(name))
+
+    def _save_state(self, state: dict):
+        tmp = self._file("state.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self._file("state.json"))
+
+    def ingest(self, rows: List[List[str]]) -> int:
+        """
+        Appends raw "PS Data" rows to the store and folds them into the
+        rollups.
+
+        Args:
+            rows (List[List[str]]): The sheet rows after the last ingested one.
+
+        Returns:
+            int: The number of runs ingested.
+        """
+        with self._lock:
+            runs = parse_runs(rows)
+            state = dict(self.state, next_row=self.state["next_row"] + len(rows))
+            rollups = (self.daily, self.tags, self.questions)
+            if not runs.empty:
+                pq.write_table(
+                    pa.Table.from_pandas(runs, preserve_index=False),
+                    self._file(self._segment(state["segments"], staged=True)),
+                )
+                new_questions = question_rollup(runs)
+                if self.questions is None or self.questions.empty:
+                    questions = new_questions
+                else:
+                    misses = self.questions["Misses"].add(
+                        new_questions["Misses"], fill_value=0
+                    )
+                    last = pd.concat(
+                        [self.questions["LastMissed"], new_questions["LastMissed"]]
+                    ).groupby(level=0).max()
+                    questions = pd.DataFrame(
+                        {"Misses": misses.astype("int64"), "LastMissed": last}
+                    )
+                rollups = (
+                    merge_counts(self.daily, daily_rollup(runs)),
+                    merge_counts(self.tags, tag_rollup(runs)),
+                    questions,
+                )
+                state["segments"] += 1
+                state["rollups"] += 1
+                for name, df in zip(self.ROLLUPS, rollups):
+                    df.to_parquet(self._file(self._rollup(name, state["rollups"])))
+
+            self._save_state(state)
+            self.state = state
+            self.daily, self.tags, self.questions = rollups
+            if not runs.empty:
+                self._recover()
+            return len(runs)
+
+    def sync(self, worksheet, min_interval: float = 0.0) -> int:
+        """
+        Fetches and ingests the worksheet rows added since the last sync.
+
+        Args:
+            worksheet: The "PS Data" worksheet (anything with `get_values`).
+            min_interval (float): Skip the sync if the last one was less than
+                this many seconds ago.
+
+        Returns:
+            int: The number of runs ingested.
+        """
+        with self._lock:
+            if time.monotonic() - self.last_sync < min_interval:
+                return 0
+            self.last_sync = time.monotonic()
+            last_col = chr(ord("A") + len(RUN_COLUMNS) - 1)
+            rows = worksheet.get_values(f"A{self.state['next_row']}:{last_col}")
+            return self.ingest(rows) if rows else 0
+
+    def runs(self) -> pd.DataFrame:
+        """
+        Returns every ingested run (reads all segments).
+        """
+        if not self.state["segments"]:
+            return parse_runs([])
+        return pq.read_table(self._file("runs")).to_pandas()
+
+    def daily_accuracy(self) -> pd.DataFrame:
+        """
+        Returns the daily rollup with `Date` as a timestamp column and the
+        day's `Accuracy`.
+        """
+        daily = self.daily.reset_index()
+        daily["Date"] = pd.to_datetime(daily["Date"])
+        daily["Accuracy"] = daily["Correct"] / daily["Questions"]
+        return daily
+
+    def tag_accuracy(self, freq: str = "W") -> pd.DataFrame:
+        """
+        Returns, per period and tag, the share of runs without a miss on the
+        tag (`Clean`), along with the `Runs` it is based on.
+        """
+        if self.tags is None or self.tags.empty:
+            return pd.DataFrame(columns=["Date", "Tag", "Runs", "Missed", "Clean"])
+        tags = self.tags.reset_index()
+        tags["Date"] = pd.to_datetime(tags["Date"]).dt.to_period(freq).dt.start_time
+        tags = tags.groupby(["Date", "Tag"], as_index=False)[["Runs", "Missed"]].sum()
+        tags["Clean"] = 1 - tags["Missed"] / tags["Runs"].where(tags["Runs"] > 0)
+        return tags
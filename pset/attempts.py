@@ -0,0 +1,178 @@
+"""Append-only log of every answer submitted in the Quiz page.
+
+One row per attempt (question ID, chosen choice, correctness, time to
+answer, session) in a SQLite database in WAL mode, so the app can append
+while other processes read. Attempts are indexed by question, and each
+question's tags are kept alongside so attempts can be read by tag as well.
+"""
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, NamedTuple, Optional
+
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    session TEXT NOT NULL,
+    question_id INTEGER NOT NULL,
+    choice TEXT NOT NULL,
+    correct INTEGER NOT NULL,
+    latency_ms INTEGER
+);
+CREATE INDEX IF NOT EXISTS attempts_question ON attempts (question_id, ts);
+CREATE INDEX IF NOT EXISTS attempts_session ON attempts (session, ts);
+CREATE TABLE IF NOT EXISTS question_tags (
+    tag TEXT NOT NULL,
+    question_id INTEGER NOT NULL,
+    PRIMARY KEY (tag, question_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS question_tags_question ON question_tags (question_id);
+"""
+
+ATTEMPT_COLUMNS = ["id", "ts", "session", "question_id", "choice", "correct", "latency_ms"]
+
+
+class Attempt(NamedTuple):
+    """
+    One submitted answer.
+
+    Attributes:
+        session (str): The quiz session the answer was given in.
+        question_id (int): The bank ID of the question.
+        choice (str): The chosen choice.
+        correct (bool): Whether the choice was the answer.
+        latency_ms (Optional[int]): Time from showing the question to the
+            submit, in milliseconds.
+        tags (List[str]): The question's tags.
+        ts (Optional[float]): Unix time of the submit; now if None.
+    """
+
+    session: str
+    question_id: int
+    choice: str
+    correct: bool
+    latency_ms: Optional[int] = None
+    tags: List[str] = []
+    ts: Optional[float] = None
+
+
+class AttemptLog:
+    """
+    The attempt log database.
+
+    Args:
+        path (str): The SQLite database file; created if missing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def log(self, attempt: Attempt):
+        """
+        Appends one attempt.
+        """
+        self.log_many([attempt])
+
+    def log_many(self, attempts: Iterable[Attempt]):
+        """
+        Appends attempts in a single transaction.
+        """
+        now = time.time()
+        rows, tagged = [], {}
+        for a in attempts:
+            rows.append(
+                (
+                    a.ts if a.ts is not None else now,
+                    a.session,
+                    int(a.question_id),
+                    a.choice,
+                    int(bool(a.correct)),
+                    a.latency_ms,
+                )
+            )
+            tagged[int(a.question_id)] = a.tags
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO attempts (ts, session, question_id, choice, correct, latency_ms)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            # Keep each question's current tags for reads by tag.
+            self._conn.executemany(
+                "DELETE FROM question_tags WHERE question_id = ?",
+                [(qid,) for qid, tags in tagged.items() if tags],
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO question_tags (tag, question_id) VALUES (?, ?)",
+                [(tag, qid) for qid, tags in tagged.items() for tag in tags],
+            )
+
+    def _frame(self, sql: str, params=()) -> pd.DataFrame:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return pd.DataFrame(rows, columns=ATTEMPT_COLUMNS)
+
+    def by_question(self, question_id: int) -> pd.DataFrame:
+        """
+        Returns every attempt at a question, oldest first.
+        """
+        return self._frame(
+            f"SELECT {', '.join(ATTEMPT_COLUMNS)} FROM attempts"
+            " WHERE question_id = ? ORDER BY ts",
+            (int(question_id),),
+        )
+
+    def by_tag(self, tag: str) -> pd.DataFrame:
+        """
+        Returns every attempt at a question carrying `tag`, oldest first.
+        """
+        columns = ", ".join(f"a.{col}" for col in ATTEMPT_COLUMNS)
+        return self._frame(
+            f"SELECT {columns} FROM question_tags t"
+            " JOIN attempts a ON a.question_id = t.question_id"
+            " WHERE t.tag = ? ORDER BY a.ts",
+            (tag,),
+        )
+
+    def history(self, since: float = 0.0) -> pd.DataFrame:
+        """
+        Returns every attempt made at or after Unix time `since`, oldest first.
+        """
+        return self._frame(
+            f"SELECT {', '.join(ATTEMPT_COLUMNS)} FROM attempts WHERE ts >= ? ORDER BY ts",
+            (since,),
+        )
+
+    def question_stats(self) -> pd.DataFrame:
+        """
+        Returns attempts, misses and the last attempt and miss times (Unix
+        time) per question.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question_id, COUNT(*), SUM(1 - correct), MAX(ts),"
+                " MAX(CASE WHEN correct = 0 THEN ts END)"
+                " FROM attempts GROUP BY question_id"
+            ).fetchall()
+        return pd.DataFrame(
+            rows, columns=["ID", "Attempts", "Misses", "LastAttempt", "LastMissed"]
+        ).set_index("ID")
+
+    def tag_stats(self) -> pd.DataFrame:
+        """
+        Returns attempts and misses per tag.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t.tag, COUNT(*), SUM(1 - a.correct) FROM question_tags t"
+                " JOIN attempts a ON a.question_id = t.question_id GROUP BY t.tag"
+            ).fetchall()
+        return pd.DataFrame(rows, columns=["Tag", "Attempts", "Misses"]).set_index("Tag")
@@ -0,0 +1,40 @@
+"""Fanfare audio served as static files.
+
+The MP3s live in ``static/`` and are served by Streamlit's static file handler
+(``server.enableStaticServing`` in ``.streamlit/config.toml``), which sends
+ETags and honours range requests, so browsers cache them and sessions only
+ever hold a short ``<audio>`` tag pointing at the URL.
+"""
+STATIC_URL = "app/static"
+
+# (minimum problem set size, fanfare file), largest first.
+FANFARES = [
+    (9001, "fanfare_9999.mp3"),
+    (76, "fanfare_100.mp3"),
+    (51, "fanfare_75.mp3"),
+    (26, "fanfare_50.mp3"),
+    (11, "fanfare_25.mp3"),
+    (0, "fanfare_5.mp3"),
+]
+
+
+def fanfare_file(n: int) -> str:
+    """
+    Returns the fanfare file name for a problem set of `n` questions.
+    """
+    return next(name for size, name in FANFARES if n >= size)
+
+
+def fanfare_url(n: int) -> str:
+    """
+    Returns the static URL of the fanfare for a problem set of `n` questions.
+    """
+    return f"{STATIC_URL}/{fanfare_file(n)}"
+
+
+def fanfare_html(n: int) -> str:
+    """
+    Returns an autoplaying `<audio>` tag for the fanfare of a problem set of
+    `n` questions.
+    """
+    return f'\n<audio autoplay class="stAudio">\n<source src="{fanfare_url(n)}" type="audio/mpeg">\nYour browser does not support the audio element.\n</audio>'
@@ -0,0 +1,401 @@
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+import urllib.request
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from pset import metrics
+from pset.tags import TagIndex
+
+logger = logging.getLogger(__name__)
+
+BANK_SCHEMA = pa.schema(
+    [
+        ("ID", pa.int64()),
+        ("Question", pa.string()),
+        ("Choices", pa.list_(pa.string())),
+        ("Answer", pa.string()),
+        ("Tags", pa.list_(pa.string())),
+        ("Hash", pa.uint64()),
+    ]
+)
+BANK_COLUMNS = BANK_SCHEMA.names
+HASHED_COLUMNS = ["Question", "Choices", "Answer", "Tags"]
+
+
+def is_url(source: str) -> bool:
+    return source.startswith(("http://", "https://"))
+
+
+def read_source(source: str) -> bytes:
+    """
+    Reads the raw bytes of a local or remote CSV source.
+    """
+    if is_url(source):
+        with urllib.request.urlopen(source) as response:
+            return response.read()
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def split_items(column: pd.Series) -> pd.Series:
+    """
+    Splits a `"; "`-separated column into lists of stripped strings.
+    """
+    return column.str.split(";").apply(lambda x: [item.strip() for item in x])
+
+
+def parse_csv(data: bytes, split: bool = True) -> pd.DataFrame:
+    """
+    Parses question bank CSV bytes into a DataFrame with `BANK_COLUMNS`.
+
+    Each row gets a `Hash` of its raw `HASHED_COLUMNS`, used to detect edited
+    rows without comparing their contents.
+
+    Args:
+        data (bytes): The CSV contents, including the header line.
+        split (bool): Split `Choices` and `Tags` into lists. Pass False to
+            only hash the rows and defer splitting to the rows that are kept.
+
+    Returns:
+        pd.DataFrame: The parsed bank.
+    """
+    # Read text columns as strings, so numeric answers (and tail chunks with
+    # only numeric answers) parse and hash the same as mixed ones.
+    df = pd.read_csv(io.BytesIO(data), dtype={col: str for col in HASHED_COLUMNS})
+    df.dropna(inplace=True, axis=0, subset=["Question", "Answer"])
+    df["Hash"] = pd.util.hash_pandas_object(df[HASHED_COLUMNS], index=False)
+    if split:
+        df = split_rows(df)
+    return df[BANK_COLUMNS]
+
+
+def split_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Splits the raw `Choices` and `Tags` strings of parsed rows into lists.
+    """
+    df = df.copy()
+    df["Choices"] = split_items(df["Choices"])
+    df["Tags"] = split_items(df["Tags"])
+    return df
+
+
+def read_csv(source: str) -> pd.DataFrame:
+    """
+    Parses the question bank CSV into a DataFrame with list-valued
+    `Choices` and `Tags` columns.
+
+    Args:
+        source (str): Path or URL of the CSV file.
+
+    Returns:
+        pd.DataFrame: The parsed bank with `BANK_COLUMNS` columns.
+    """
+    return parse_csv(read_source(source))
+
+
+class SourceState(NamedTuple):
+    """
+    What was last ingested from a CSV source: its size, the SHA-256 of those
+    bytes and (for local files) the modification time.
+    """
+
+    size: int
+    digest: str
+    mtime_ns: int = 0
+
+    @classmethod
+    def of(cls, source: str, data: bytes) -> "SourceState":
+        mtime_ns = 0 if is_url(source) else os.stat(source).st_mtime_ns
+        return cls(len(data), hashlib.sha256(data).hexdigest(), mtime_ns)
+
+    def metadata(self) -> Dict[bytes, bytes]:
+        return {
+            b"source_size": str(self.size).encode(),
+            b"source_digest": self.digest.encode(),
+            b"source_mtime_ns": str(self.mtime_ns).encode(),
+        }
+
+    @classmethod
+    def from_metadata(cls, metadata: Optional[Dict[bytes, bytes]]) -> "SourceState":
+        metadata = metadata or {}
+        return cls(
+            int(metadata.get(b"source_size", 0)),
+            metadata.get(b"source_digest", b"").decode(),
+            int(metadata.get(b"source_mtime_ns", 0)),
+        )
+
+
+def to_table(df: pd.DataFrame, state: Optional[SourceState] = None) -> pa.Table:
+    table = pa.Table.from_pandas(df, schema=BANK_SCHEMA, preserve_index=False)
+    return table.replace_schema_metadata(state.metadata() if state else None)
+
+
+def compile_bank(source: str, path: str) -> int:
+    """
+    Compiles the question bank CSV into an uncompressed Arrow IPC file that
+    `open_bank` can memory-map.
+
+    The file is written next to `path` and moved into place atomically, so
+    running app processes never see a half-written bank. The size and digest
+    of the source are recorded so `LiveBank` can pick up later edits
+    incrementally.
+
+    Args:
+        source (str): Path or URL of the CSV file.
+        path (str): Destination of the compiled bank.
+
+    Returns:
+        int: The number of questions written.
+    """
+    data = read_source(source)
+    table = to_table(parse_csv(data), SourceState.of(source, data))
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return table.num_rows
+
+
+def open_bank(path: str) -> pa.Table:
+    """
+    Opens a compiled bank without copying it into process memory.
+
+    The returned table's buffers point into a read-only memory map, so every
+    process that opens the same file shares the same page-cache pages.
+
+    Args:
+        path (str): Path of a bank written by `compile_bank`.
+
+    Returns:
+        pa.Table: The bank table.
+    """
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+
+def bank_tag_index(table: pa.Table) -> TagIndex:
+    """
+    Builds the tag index straight from the Arrow `Tags` column, without
+    materializing per-row Python lists.
+    """
+    tags = table.column("Tags").combine_chunks()
+    flat = pc.list_flatten(tags).to_numpy(zero_copy_only=False)
+    rows = pc.list_parent_indices(tags).to_numpy().astype(np.int64)
+    return TagIndex.from_pairs(flat, rows, table.num_rows)
+
+
+class BankSnapshot(NamedTuple):
+    """
+    An immutable, consistent view of the question bank.
+
+    Rows are only ever appended to the bank, so a row position stays valid in
+    every later snapshot. Edited and deleted questions leave their old row in
+    place but drop it from `id_pos` and `tags`, so only live rows can be
+    queried.
+
+    Attributes:
+        version (int): Incremented on every refresh that changed the bank.
+        digest (str): SHA-256 of the source contents the snapshot reflects.
+        table (pa.Table): All rows, including replaced ones.
+        tags (TagIndex): The tag index over the live rows.
+        id_pos (Dict[int, int]): The live row position of each question ID.
+    """
+
+    version: int
+    digest: str
+    table: pa.Table
+    tags: TagIndex
+    id_pos: Dict[int, int]
+
+    def positions(self) -> np.ndarray:
+        """
+        Returns the sorted positions of the live rows.
+        """
+        return np.sort(np.fromiter(self.id_pos.values(), dtype=np.int64))
+
+
+class LiveBank:
+    """
+    The question bank of one process, kept in sync with its CSV source by
+    ingesting only new and edited rows.
+
+    A refresh first checks the source's size, modification time and digest.
+    If a local file only grew, just the appended bytes are parsed. Otherwise
+    the source is re-read and rows are diffed by their `Hash`; only new and
+    edited rows are split, appended to the table and patched into the tag
+    index. Readers keep using their snapshot while a refresh runs.
+
+    Args:
+        source (str): Path or URL of the question bank CSV.
+        table (pa.Table): The initial bank rows.
+        state (SourceState): What `table` was built from.
+    """
+
+    def __init__(self, source: str, table: pa.Table, state: SourceState):
+        self.source = source
+        self._state = state
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._hashes: Dict[int, int] = dict(
+            zip(table.column("ID").to_pylist(), table.column("Hash").to_pylist())
+        )
+        self._publish(
+            0,
+            table,
+            bank_tag_index(table),
+            {qid: pos for pos, qid in enumerate(table.column("ID").to_pylist())},
+        )
+
+    @classmethod
+    def from_source(cls, source: str) -> "LiveBank":
+        """
+        Builds the bank by parsing the whole CSV source.
+        """
+        data = read_source(source)
+        state = SourceState.of(source, data)
+        return cls(source, to_table(parse_csv(data), state), state)
+
+    @classmethod
+    def open(cls, path: str, source: str) -> "LiveBank":
+        """
+        Starts from a compiled bank and tracks `source` from where the
+        compiled file left off.
+        """
+        table = open_bank(path)
+        return cls(source, table, SourceState.from_metadata(table.schema.metadata))
+
+    @property
+    def snapshot(self) -> BankSnapshot:
+        return self._snapshot
+
+    def _publish(self, version, table, tags, id_pos):
+        self._snapshot = BankSnapshot(version, self._state.digest, table, tags, id_pos)
+
+    def refresh(self) -> int:
+        """
+        Ingests new and edited rows from the source.
+
+        Returns:
+            int: The number of rows appended, replaced or removed.
+        """
+        with self._lock, metrics.timer("bank_refresh"):
+            changes = self._read_changes()
+            if changes is None:
+                return 0
+            rows, removed, state = changes
+            self._state = state
+            return self._apply(rows, removed)
+
+    def _read_changes(self) -> Optional[Tuple[pd.DataFrame, list, SourceState]]:
+        state = self._state
+        if not is_url(self.source):
+            stat = os.stat(self.source)
+            if stat.st_size == state.size and stat.st_mtime_ns == state.mtime_ns:
+                return None
+            if stat.st_size > state.size > 0:
+                tail = self._read_tail(stat.st_size)
+                if tail is not None:
+                    return tail
+        data = read_source(self.source)
+        new_state = SourceState.of(self.source, data)
+        if new_state.digest == state.digest:
+            self._state = new_state
+            return None
+        rows = parse_csv(data, split=False)
+        removed = list(set(self._snapshot.id_pos) - set(rows["ID"].tolist()))
+        return rows, removed, new_state
+
+    def _read_tail(self, size: int) -> Optional[Tuple[pd.DataFrame, list, SourceState]]:
+        # The file only grew: if the bytes we already ingested are unchanged,
+        # parse just the appended rows under the original header line.
+        with open(self.source, "rb") as f:
+            data = f.read(size)
+        prefix, tail = data[: self._state.size], data[self._state.size :]
+        if hashlib.sha256(prefix).hexdigest() != self._state.digest:
+            return None
+        if not prefix.endswith(b"\n") and not tail.startswith((b"\n", b"\r")):
+            return None
+        header = prefix.split(b"\n", 1)[0] + b"\n"
+        rows = parse_csv(header + tail.lstrip(b"\r\n"), split=False)
+        return rows, [], SourceState.of(self.source, data)
+
+    def _apply(self, rows: pd.DataFrame, removed: list) -> int:
+        snapshot = self._snapshot
+        changed = [
+            self._hashes.get(qid) != row_hash
+            for qid, row_hash in zip(rows["ID"].tolist(), rows["Hash"].tolist())
+        ]
+        rows = rows[changed]
+        rows = rows.drop_duplicates(subset="ID", keep="last")
+        if rows.empty and not removed:
+            return 0
+
+        replaced = [qid for qid in rows["ID"].tolist() if qid in snapshot.id_pos]
+        stale = [snapshot.id_pos[qid] for qid in replaced + removed]
+        stale_tags = snapshot.table.take(pa.array(stale, pa.int64())).column("Tags").to_pylist()
+
+        rows = split_rows(rows)
+        start = snapshot.table.num_rows
+        table = pa.concat_tables([snapshot.table, to_table(rows).cast(snapshot.table.schema)])
+        new_pos = range(start, start + len(rows))
+
+        id_pos = dict(snapshot.id_pos)
+        for qid in removed:
+            del id_pos[qid]
+            del self._hashes[qid]
+        for pos, qid, row_hash in zip(new_pos, rows["ID"].tolist(), rows["Hash"].tolist()):
+            id_pos[qid] = pos
+            self._hashes[qid] = row_hash
+
+        tags = snapshot.tags.patch(
+            added=zip(new_pos, rows["Tags"].tolist()),
+            removed=zip(stale, stale_tags),
+            size=table.num_rows,
+        )
+        self._publish(snapshot.version + 1, table, tags, id_pos)
+        logger.info(
+            "Question bank v%d: %d new, %d edited, %d removed",
+            snapshot.version + 1,
+            len(rows) - len(replaced),
+            len(replaced),
+            len(removed),
+        )
+        return len(rows) + len(removed)
+
+    def request_refresh(self):
+        """
+        Wakes the auto-refresh thread so it refreshes now.
+        """
+        self._wake.set()
+
+    def start_auto_refresh(self, interval: float) -> threading.Thread:
+        """
+        Refreshes the bank every `interval` seconds (or when requested) on a
+        daemon thread, so sessions never wait on the source.
+        """
+
+        def run():
+            while True:
+                self._wake.wait(interval)
+                self._wake.clear()
+                try:
+                    self.refresh()
+                except Exception:
+                    logger.exception("Question bank refresh failed")
+
+        thread = threading.Thread(target=run, name="bank-refresh", daemon=True)
+        thread.start()
+        return thread
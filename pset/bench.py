@@ -0,0 +1,477 @@
+"""Headless benchmarks of the generator, quiz and results pages.
+
+Two drivers run the same student journey (generate a set, answer every
+question, view the results) against synthetic question banks:
+
+- ``core`` calls the functions each page runs on a rerun, with the attempt
+  log, scheduler and session store in a scratch directory and results saved
+  through a `SheetWriter` to an in-memory worksheet;
+- ``app`` drives `App.py`, `pages/2_Quiz.py` and `pages/3_Results.py`
+  through Streamlit's `AppTest` (Streamlit 1.28 or newer).
+
+The report has per-step latency percentiles, memory per session and the
+answer throughput of N concurrent students, per bank size, and the time a
+fresh interpreter takes to run each page's imports (its cold start).
+Comparing a report with a saved baseline flags steps that got slower than
+a threshold.
+"""
+import ast
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from pset.attempts import Attempt, AttemptLog
+from pset.bank import LiveBank
+from pset.results import summarize
+from pset.review import card, card_body
+from pset.sessions import SessionStore
+from pset.setcode import encode, generate_set, new_spec
+from pset.sheets import SheetWriter
+from pset.srs import Scheduler
+
+TAG_POOL = ["PCP", "CHE", "GEN", "General Chemistry", "Energy Engineering"] + [
+    f"Topic {i:02d}" for i in range(1, 41)
+]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = [
+    "App.py",
+    "pages/2_Quiz.py",
+    "pages/3_Results.py",
+    "pages/4_Analytics.py",
+    "pages/5_Question_Form.py",
+    "pages/6_Bulk_Import.py",
+    "pages/7_Search.py",
+]
+
+# Steps whose p90 is below this many milliseconds are too noisy to compare.
+NOISE_FLOOR_MS = 1.0
+# Page imports run in a fresh interpreter; differences below this are noise.
+STARTUP_NOISE_FLOOR_MS = 50.0
+
+
+def synthetic_csv(rows: int, path: str, seed: int = 0) -> str:
+    """
+    Writes a question bank CSV of `rows` synthetic questions, each with four
+    choices, some inline LaTeX and one to three tags.
+
+    Returns:
+        str: `path`.
+    """
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(["ID", "Question", "Choices", "Answer", "Tags"])
+        for qid in range(1, rows + 1):
+            choices = [str(rng.randint(1, 999)) for _ in range(4)]
+            tags = rng.sample(TAG_POOL, rng.randint(1, 3))
+            question = (
+                f"Question {qid}: a **{rng.choice(['batch', 'flow', 'closed'])}** system at "
+                f"$T = {rng.randint(250, 900)}\\ \\text{{K}}$ holds {rng.randint(1, 99)} mol of "
+                "gas. What is the final value of the requested quantity? " * 2
+            )
+            writer.writerow([qid, question, "; ".join(choices), choices[0], "; ".join(tags)])
+    return path
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """
+    Returns the count and the mean, p50, p90, p99 and max in milliseconds of
+    latencies given in seconds.
+    """
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    if not len(ms):
+        return {"count": 0}
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    return {
+        "count": len(ms),
+        "mean": round(float(ms.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p90": round(float(p90), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(ms.max()), 3),
+    }
+
+
+class Timings:
+    """
+    Thread-safe latency samples per step.
+    """
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, step: str, seconds: float):
+        with self._lock:
+            self.samples.setdefault(step, []).append(seconds)
+
+    @contextmanager
+    def time(self, step: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(step, time.perf_counter() - start)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {step: percentiles(samples) for step, samples in self.samples.items()}
+
+
+class MemoryWorksheet:
+    """
+    Keeps the rows the benchmark appends instead of sending them to Sheets.
+    """
+
+    def __init__(self):
+        self.rows: List[List[Any]] = []
+
+    def append_rows(self, values, value_input_option="RAW"):
+        self.rows.extend(values)
+
+
+class Workspace:
+    """
+    A scratch directory with a synthetic bank and the stores the pages use.
+
+    Args:
+        rows (int): The number of questions in the bank.
+        path (str): The directory to work in.
+    """
+
+    def __init__(self, rows: int, path: str):
+        self.path = path
+        self.csv = synthetic_csv(rows, os.path.join(path, "qna.csv"))
+        self.bank = LiveBank.from_source(self.csv)
+        self.attempts = AttemptLog(os.path.join(path, "attempts.db"))
+        self.scheduler = Scheduler(os.path.join(path, "attempts.db"))
+        self.sessions = SessionStore(os.path.join(path, "sessions.db"))
+        self.worksheet = MemoryWorksheet()
+        self.writer = SheetWriter(
+            lambda name: self.worksheet, os.path.join(path, "journal.jsonl"), flush_interval=0.1
+        ).start()
+
+    def secrets(self) -> Dict[str, Any]:
+        return {
+            "QNA_CSV": self.csv,
+            "ACCESS_KEY": "bench",
+            "PASSWORD": "bench",
+            "GSHEETS_URL": "https://example.invalid/",
+            "ATTEMPTS_DB": os.path.join(self.path, "attempts.db"),
+            "SESSIONS_DB": os.path.join(self.path, "sessions.db"),
+            "SEARCH_DB": os.path.join(self.path, "search.db"),
+            "SHEETS_JOURNAL": os.path.join(self.path, "journal.jsonl"),
+            "ANALYTICS_DIR": os.path.join(self.path, "analytics"),
+        }
+
+    def close(self):
+        self.writer.stop()
+
+
+def run_student(ws: Workspace, timings: Timings, set_size: int, seed: int) -> int:
+    """
+    Runs one student's journey through the page functions.
+
+    Returns:
+        int: The number of questions answered.
+    """
+    rng = random.Random(seed)
+    session = f"{seed:032x}"
+
+    with timings.time("get_data"):
+        snapshot = ws.bank.snapshot
+    with timings.time("generate"):
+        tags = tuple(rng.sample(TAG_POOL[:5], 2))
+        candidates = snapshot.tags.query(any_of=tags)
+        spec = new_spec(snapshot, tags, (), (), min(set_size, len(candidates)), seed)
+        pset = generate_set(snapshot, spec)
+        ws.sessions.save(session, encode(pset, snapshot, explicit=True), 0)
+
+    for pos in range(len(pset)):
+        with timings.time("quiz_rerun"):
+            _ = pset.questions[pos], pset.choices[pos]
+            ws.sessions.save_position(session, pos)
+        with timings.time("submit"):
+            choices = pset.choices[pos]
+            answer = choices[0] if rng.random() < 0.7 else choices[-1]
+            is_correct = pset.record(pos, answer)
+            ws.attempts.log(
+                Attempt(session, int(pset.ids[pos]), answer, is_correct, 10_000, pset.tags[pos])
+            )
+            ws.scheduler.review(session, int(pset.ids[pos]), is_correct, 10_000)
+            ws.sessions.save(session, encode(pset, snapshot, explicit=True), pos)
+
+    with timings.time("results"):
+        results = summarize(pset)
+        cards = [
+            card(
+                pset.qnums[pos],
+                card_body(int(pset.ids[pos]), pset.questions[pos], pset.answers[pos], pset.tags[pos]),
+            )
+            for pos in results.incorrect
+        ]
+        ws.writer.append("PS Data", [results.score, results.total, len(cards)])
+    return len(pset)
+
+
+def run_app_student(ws: Workspace, timings: Timings, set_size: int, seed: int) -> int:
+    """
+    Runs one student's journey through the Streamlit pages with `AppTest`.
+
+    Returns:
+        int: The number of questions answered.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    def page(script):
+        at = AppTest.from_file(os.path.join(ROOT, script), default_timeout=120)
+        for key, value in ws.secrets().items():
+            at.secrets[key] = value
+        return at
+
+    def timed_run(step, at):
+        with timings.time(step):
+            at.run()
+        if at.exception:
+            raise RuntimeError(f"{step} failed: {at.exception[0].value}")
+
+    app = page("App.py")
+    app.session_state["access"] = True
+    timed_run("app_load", app)
+    app.slider[0].set_value(min(set_size, app.slider[0].max))
+    timed_run("app_rerun", app)
+    next(b for b in app.button if b.label == "Generate!").click()
+    timed_run("generate", app)
+    pset = app.session_state["problem_set"]
+
+    quiz = page("pages/2_Quiz.py")
+    quiz.session_state["problem_set"] = pset
+    quiz.session_state["session_id"] = f"{seed:032x}"
+    timed_run("quiz_rerun", quiz)
+    for _ in range(len(pset)):
+        quiz.radio[0].set_value(quiz.radio[0].options[0])
+        next(b for b in quiz.button if b.label == "Submit Answer").click()
+        timed_run("submit", quiz)
+
+    results = page("pages/3_Results.py")
+    results.session_state["problem_set"] = pset
+    results.session_state["auth"] = False
+    timed_run("results", results)
+    return len(pset)
+
+
+def session_memory(ws: Workspace, set_size: int, sessions: int = 200) -> float:
+    """
+    Returns the bytes allocated per session for `sessions` problem sets of
+    `set_size` questions, with their session codes.
+    """
+    snapshot = ws.bank.snapshot
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = []
+        for seed in range(sessions):
+            tags = (TAG_POOL[seed % 5],)
+            size = min(set_size, len(snapshot.tags.positions(tags[0])))
+            pset = generate_set(snapshot, new_spec(snapshot, tags, (), (), size, seed))
+            kept.append((pset, encode(pset, snapshot)))
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return used / sessions
+
+
+def bench(rows: int, students: int, set_size: int, mode: str = "core") -> Dict[str, Any]:
+    """
+    Benchmarks `students` concurrent students on a bank of `rows` questions.
+
+    Returns:
+        Dict[str, Any]: Step latency percentiles (ms), memory per session
+            (bytes) and answers per second.
+    """
+    student = run_app_student if mode == "app" else run_student
+    with tempfile.TemporaryDirectory() as path:
+        if mode == "app":
+            import streamlit as st
+
+            st.cache_resource.clear()
+            st.cache_data.clear()
+        timings = Timings()
+        with timings.time("load_bank"):
+            ws = Workspace(rows, path)
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(students) as pool:
+                answered = sum(
+                    pool.map(lambda seed: student(ws, timings, set_size, seed), range(students))
+                )
+            elapsed = time.perf_counter() - start
+            memory = session_memory(ws, set_size)
+        finally:
+            ws.close()
+    return {
+        "steps": timings.summary(),
+        "memory_per_session_bytes": round(memory),
+        "answers_per_sec": round(answered / elapsed, 1),
+    }
+
+
+def page_imports(script: str) -> str:
+    """
+    Returns the import statements at the top of a page script, before its
+    first other statement: the imports every visit to the page pays for.
+    """
+    with open(os.path.join(ROOT, script), encoding="utf-8") as f:
+        source = f.read()
+    imports = []
+    for node in ast.parse(source).body:
+        if not isinstance(node, (ast.Import, ast.ImportFrom)):
+            break
+        imports.append(ast.get_source_segment(source, node))
+    return "\n".join(imports)
+
+
+def import_cost(script: str, repeat: int = 3, top: int = 5) -> Dict[str, Any]:
+    """
+    Measures the cold import cost of a page in fresh interpreters.
+
+    Returns:
+        Dict[str, Any]: The median wall time of the imports in milliseconds,
+            and the `top` slowest top-level packages the page imports, by
+            cumulative import time (``python -X importtime``) in the last run.
+    """
+    timer = (
+        "import sys, time\n"
+        "print('-- page imports --', file=sys.stderr, flush=True)\n"
+        "_start = time.perf_counter()\n"
+        "{}\n"
+        "print(time.perf_counter() - _start)"
+    ).format(page_imports(script))
+    samples, modules = [], {}
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", timer],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        samples.append(float(proc.stdout.strip().splitlines()[-1]))
+        # Skip what the interpreter imports at startup, before the marker.
+        lines = proc.stderr.split("-- page imports --\n", 1)[-1].splitlines()
+        modules = {}
+        for line in lines:
+            parts = line.split("|")
+            # Top-level packages only: no indentation before the name.
+            if len(parts) == 3 and parts[1].strip().isdigit() and not parts[2].startswith("  "):
+                modules[parts[2].strip()] = int(parts[1]) / 1000
+    slowest = sorted(modules.items(), key=lambda item: -item[1])[:top]
+    return {
+        "import_ms": round(float(np.median(samples)) * 1000, 1),
+        "slowest": {name: round(ms, 1) for name, ms in slowest},
+    }
+
+
+def startup() -> Dict[str, Dict[str, Any]]:
+    """
+    Returns `import_cost` for every page.
+    """
+    return {script: import_cost(script) for script in PAGES}
+
+
+def run(
+    sizes: List[int], students: int, set_size: int, mode: str = "core"
+) -> Dict[str, Any]:
+    """
+    Runs `bench` for each bank size, and measures the import cost of every
+    page (see `startup`).
+    """
+    return {
+        "mode": mode,
+        "students": students,
+        "set_size": set_size,
+        "startup": startup(),
+        "banks": {str(rows): bench(rows, students, set_size, mode) for rows in sizes},
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Lists the regressions of a report against a baseline: step p90 latency or
+    memory per session above ``threshold`` times the baseline, or throughput
+    below the baseline divided by `threshold`, and page import time above
+    ``threshold`` times the baseline.
+    """
+    regressions = []
+    for script, base in baseline.get("startup", {}).items():
+        now = report.get("startup", {}).get(script, {}).get("import_ms")
+        if now is None:
+            continue
+        if now > max(base["import_ms"] * threshold, base["import_ms"] + STARTUP_NOISE_FLOOR_MS):
+            regressions.append(
+                f"{script}: imports {now:.1f} ms > {base['import_ms']:.1f} ms x {threshold}"
+            )
+    for rows, base in baseline.get("banks", {}).items():
+        current = report["banks"].get(rows)
+        if current is None:
+            continue
+        for step, stats in base["steps"].items():
+            now = current["steps"].get(step, {}).get("p90")
+            if now is None or "p90" not in stats:
+                continue
+            if now > max(stats["p90"] * threshold, NOISE_FLOOR_MS):
+                regressions.append(
+                    f"{rows} rows: {step} p90 {now:.2f} ms > {stats['p90']:.2f} ms x {threshold}"
+                )
+        if current["memory_per_session_bytes"] > base["memory_per_session_bytes"] * threshold:
+            regressions.append(
+                f"{rows} rows: memory per session {current['memory_per_session_bytes']} B"
+                f" > {base['memory_per_session_bytes']} B x {threshold}"
+            )
+        if current["answers_per_sec"] < base["answers_per_sec"] / threshold:
+            regressions.append(
+                f"{rows} rows: {current['answers_per_sec']} answers/s"
+                f" < {base['answers_per_sec']} answers/s / {threshold}"
+            )
+    return regressions
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"mode={report['mode']} students={report['students']} set_size={report['set_size']}"]
+    if report.get("startup"):
+        lines.append("\nstartup (cold imports per page)")
+        lines.append(f"  {'page':<26}{'ms':>8}  slowest")
+        for script, cost in report["startup"].items():
+            slowest = ", ".join(f"{name} {ms:.0f}" for name, ms in list(cost["slowest"].items())[:3])
+            lines.append(f"  {script:<26}{cost['import_ms']:>8.1f}  {slowest}")
+    for rows, result in report["banks"].items():
+        lines.append(
+            f"\n{rows} rows: {result['answers_per_sec']} answers/s, "
+            f"{result['memory_per_session_bytes'] / 1024:.1f} KiB per session"
+        )
+        lines.append(f"  {'step':<12}{'count':>7}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+        for step, stats in result["steps"].items():
+            lines.append(
+                f"  {step:<12}{stats['count']:>7}{stats['p50']:>10.2f}{stats['p90']:>10.2f}"
+                f"{stats['p99']:>10.2f}{stats['max']:>10.2f}"
+            )
+    return "\n".join(lines)
+
+
+def load_report(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,79 @@
+from typing import Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from pset.problemset import ProblemSet
+from pset.sampling import weighted_sample
+
+
+def shuffle_perms(lengths: np.ndarray, rng: np.random.Generator, k: int = 4) -> np.ndarray:
+    """
+    Draws an independent random permutation of each row's choices in a single
+    vectorized pass, as one ``(rows, k)`` integer matrix. Rows with fewer
+    than `k` choices get their indices first, padded with zeros, so equal
+    shuffles always give equal rows (as `pset.setcode` decodes them).
+
+    Args:
+        lengths (np.ndarray): The number of choices of each row.
+        rng (np.random.Generator): The random generator to draw from.
+        k (int): The number of choices to keep per row.
+
+    Returns:
+        np.ndarray: Indices into each row's original choice list.
+    """
+    n = len(lengths)
+    perms = np.zeros((n, k), dtype=np.int64)
+    if n == 0:
+        return perms
+    width = int(lengths.max())
+
+    # Random sort keys per cell; padding cells sort last so they are never
+    # picked ahead of a real choice.
+    keys = rng.random((n, width))
+    keys[np.arange(width) >= lengths[:, None]] = np.inf
+    order = np.argsort(keys, axis=1)[:, :k]
+    perms[:, : order.shape[1]] = order
+    perms[np.arange(k) >= lengths[:, None]] = 0
+    return perms
+
+
+def build_problem_set(
+    table: pa.Table,
+    positions: np.ndarray,
+    size: Optional[int] = None,
+    seed: Optional[int] = None,
+    weights: Optional[np.ndarray] = None,
+) -> ProblemSet:
+    """
+    Samples and assembles a problem set from rows of the question bank.
+
+    Question selection and choice shuffles are drawn from one
+    ``np.random.default_rng(seed)`` generator, so a fixed seed reproduces the
+    same set.
+
+    Args:
+        table (pa.Table): The question bank table (`BankSnapshot.table`).
+        positions (np.ndarray): The candidate row positions (e.g. a tag query).
+        size (Optional[int]): The number of questions; all candidates if None.
+        seed (Optional[int]): Seed for the random generator.
+        weights (Optional[np.ndarray]): Per-row sampling weights over the whole
+            bank (see `pset.sampling`); uniform sampling if None.
+
+    Returns:
+        ProblemSet: The problem set, with nothing answered yet.
+    """
+    rng = np.random.default_rng(seed)
+    positions = np.asarray(positions, dtype=np.int64)
+    if size is None or size >= len(positions):
+        picked = rng.permutation(positions)
+    elif weights is not None:
+        picked = weighted_sample(positions, weights[positions], size, rng)
+    else:
+        picked = rng.choice(positions, size=size, replace=False)
+
+    # The set only references rows of the shared bank table; nothing is copied.
+    lengths = pc.list_value_length(table.column("Choices").take(pa.array(picked)))
+    perms = shuffle_perms(lengths.to_numpy(zero_copy_only=False), rng)
+    return ProblemSet(table, picked, perms)
@@ -0,0 +1,145 @@
+"""Bounded, observable in-process caches for per-result page computations.
+
+Unlike ``st.cache_data``, which hashes every argument and keeps entries
+until the process exits unless told otherwise, each cache here has its own
+entry limit (least recently used entries are evicted first) and optional
+time-to-live, is keyed only by cheap fingerprint arguments, and counts its
+hits, misses and evictions. Arguments whose names start with an underscore
+are left out of the key, the same convention as ``st.cache_data``.
+"""
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from pset import metrics
+
+CACHES: Dict[str, "LRUCache"] = {}
+
+
+class LRUCache:
+    """
+    A thread-safe mapping with LRU eviction beyond `max_entries` and expiry
+    `ttl` seconds after an entry is stored.
+
+    Args:
+        name (str): The name the cache's stats are reported under.
+        max_entries (int): The most entries kept.
+        ttl (Optional[float]): Seconds an entry stays valid; forever if None.
+    """
+
+    def __init__(self, name: str, max_entries: int = 128, ttl: Optional[float] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Returns ``(True, value)`` for a live entry, else ``(False, None)``.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            expired = self.ttl is not None and entry is not None
+            if expired and entry[0] + self.ttl < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "Cache": self.name,
+                "Entries": len(self._entries),
+                "Max Entries": self.max_entries,
+                "TTL (s)": self.ttl,
+                "Hits": self.hits,
+                "Misses": self.misses,
+                "Hit Rate": round(self.hits / requests, 3) if requests else 0.0,
+                "Evictions": self.evictions,
+                "Expirations": self.expirations,
+            }
+
+
+def cached(
+    name: Optional[str] = None, max_entries: int = 128, ttl: Optional[float] = None
+) -> Callable:
+    """
+    Decorator caching a function's results in an `LRUCache`, keyed by its
+    arguments whose names do not start with an underscore (which must be
+    hashable). Calls are timed and counted in `pset.metrics` under `name`.
+    Decorating another function under the same name reuses its cache.
+
+    Args:
+        name (Optional[str]): The cache name; the function name if None.
+        max_entries (int): The most results kept.
+        ttl (Optional[float]): Seconds a result stays valid; forever if None.
+    """
+
+    def decorator(func):
+        cache_name = name or func.__name__
+        # Streamlit re-executes page scripts on every rerun, decorating the
+        # function again; keep the cache registered under its name.
+        cache = CACHES.get(cache_name)
+        if cache is None:
+            cache = CACHES[cache_name] = LRUCache(cache_name, max_entries, ttl)
+        cache.max_entries, cache.ttl = max_entries, ttl
+        signature = inspect.signature(func)
+        keyed = [param for param in signature.parameters if not param.startswith("_")]
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(bound.arguments[param] for param in keyed)
+            metrics.REGISTRY.inc(metrics.CACHE_REQUESTS, cache=cache_name)
+            with metrics.timer(cache_name):
+                hit, value = cache.get(key)
+                if not hit:
+                    metrics.REGISTRY.inc(metrics.CACHE_MISSES, cache=cache_name)
+                    value = func(*args, **kwargs)
+                    cache.put(key, value)
+            metrics.REGISTRY.set(metrics.CACHE_ENTRIES, len(cache), cache=cache_name)
+            return value
+
+        wrapper.cache = cache
+        wrapper.clear = cache.clear
+        return wrapper
+
+    return decorator
+
+
+def cache_stats() -> List[Dict[str, Any]]:
+    """
+    Returns the size and hit/miss/eviction counts of every cache.
+    """
+    return [cache.stats() for cache in CACHES.values()]
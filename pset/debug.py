@@ -0,0 +1,51 @@
+"""Per-rerun timing surface shown to authenticated users.
+
+Pages call `begin_run` first thing and `debug_panel` last: the panel lists
+the timed steps of the rerun that just ran, the process-wide step timings,
+the cache hit rates and the Google Sheets call stats.
+"""
+import streamlit as st
+
+from pset import metrics
+from pset.cache import cache_stats
+from pset.resources import get_metrics_server, get_sheets_client
+
+
+def begin_run():
+    """
+    Starts timing a script run, and the metrics server if configured.
+    """
+    metrics.start_run()
+    get_metrics_server()
+
+
+def debug_panel():
+    """
+    Renders the debug panel in the sidebar when the session is
+    authenticated (the `auth` flag set from the Secret Settings).
+    """
+    if not st.session_state.get("auth"):
+        return
+    import pandas as pd
+
+    timings = metrics.run_timings()
+    with st.sidebar.expander("Debug ⏱"):
+        st.caption(f"**This rerun:** {metrics.run_elapsed() * 1000:.1f} ms")
+        if timings:
+            st.dataframe(
+                pd.DataFrame(
+                    [(step, round(seconds * 1000, 2)) for step, seconds in timings],
+                    columns=["Step", "ms"],
+                ),
+                hide_index=True,
+                use_container_width=True,
+            )
+        st.caption("**Process**")
+        st.dataframe(pd.DataFrame(metrics.REGISTRY.steps()), hide_index=True)
+        caches = cache_stats()
+        if caches:
+            st.caption("**Caches**")
+            st.dataframe(pd.DataFrame(caches), hide_index=True)
+        if "GSHEETS_CREDS" in st.secrets:
+            st.caption("**Google Sheets**")
+            st.json(get_sheets_client().stats.as_dict(), expanded=False)
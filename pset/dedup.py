@@ -0,0 +1,347 @@
+"""Near-duplicate question detection with MinHash and LSH.
+
+Each question is reduced to a set of features: the word pairs of its
+normalized text and its normalized choices (as a set, so reordered choices
+match). A MinHash signature of `NUM_PERM` values estimates the Jaccard
+similarity of two feature sets as the share of equal values, and locality
+sensitive hashing splits the signatures into `BANDS` bands: questions that
+share a band are candidates, which are then checked against the threshold.
+
+Finding the questions similar to a new one is a few binary searches per
+band, and the full report over the bank only compares candidate pairs, so
+neither needs pairwise comparison of the whole bank.
+"""
+import re
+import threading
+import zlib
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+# Pairs become likely candidates (sharing a band) from a similarity of about
+# (1 / BANDS) ** (1 / ROWS) ~ 0.42, well below the reporting threshold: a
+# pair at 0.7 shares a band with probability 1 - (1 - 0.7 ** ROWS) ** BANDS,
+# over 99.9%.
+DEFAULT_THRESHOLD = 0.7
+# Documents hashed per vectorized MinHash pass, bounding its memory.
+CHUNK = 4096
+# Rows sharing a band key are all paired up to this many; larger buckets
+# (clusters of duplicates, or boilerplate many questions share) are paired
+# by representative instead (see `_bucket_pairs`).
+MAX_BUCKET = 64
+
+_MAX_HASH = np.uint32(0xFFFFFFFF)
+# Multiply-shift hashing: the high 32 bits of a * x + b (mod 2**64), with
+# odd multipliers, is one cheap permutation per signature value.
+_rng = np.random.default_rng(0x5E7)
+_A = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)
+_WORD = re.compile(r"\w+")
+
+
+def features(question: str, choices: Iterable[str] = ()) -> List[str]:
+    """
+    Returns the set of features of a question: the word pairs (or single
+    word) of its case-folded text and each of its case-folded choices.
+    """
+    words = _WORD.findall(question.casefold())
+    shingles = {" ".join(words[i : i + 2]) for i in range(max(1, len(words) - 1))}
+    shingles.discard("")
+    shingles.update("\x1f" + " ".join(_WORD.findall(c.casefold())) for c in choices)
+    return sorted(shingles)
+
+
+def signatures(feature_sets: Sequence[List[str]]) -> np.ndarray:
+    """
+    Returns the ``(len(feature_sets), NUM_PERM)`` MinHash signatures of
+    feature sets. An empty set gets the all-max signature, which is never
+    compared.
+    """
+    sigs = np.full((len(feature_sets), NUM_PERM), _MAX_HASH, dtype=np.uint32)
+    for start in range(0, len(feature_sets), CHUNK):
+        chunk = feature_sets[start : start + CHUNK]
+        lengths = np.fromiter((len(f) for f in chunk), dtype=np.int64, count=len(chunk))
+        if not lengths.sum():
+            continue
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode()) for f in chunk for s in f), dtype=np.uint64
+        )
+        permuted = ((hashes[None, :] * _A[:, None] + _B[:, None]) >> np.uint64(32)).astype(
+            np.uint32
+        )
+        nonempty = np.flatnonzero(lengths)
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))[nonempty]
+        sigs[start + nonempty] = np.minimum.reduceat(permuted, offsets, axis=1).T
+    return sigs
+
+
+def band_keys(sigs: np.ndarray) -> np.ndarray:
+    """
+    Returns the ``(rows, BANDS)`` LSH key of each band of each signature.
+    """
+    bands = sigs.reshape(len(sigs), BANDS, ROWS).astype(np.uint64)
+    keys = np.zeros(bands.shape[:2], dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for row in range(ROWS):
+            keys = keys * np.uint64(0x100000001B3) ^ bands[:, :, row]
+    return keys
+
+
+class Match(NamedTuple):
+    """
+    A question similar to another one.
+    """
+
+    position: int
+    similarity: float
+
+
+class DedupIndex:
+    """
+    MinHash/LSH index over the rows of the question bank.
+
+    The bank only ever appends rows, so `sync` indexes the rows added since
+    the last call; replaced and deleted rows stay indexed but are skipped
+    unless their position is passed in `live`. Safe to share between
+    threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.sigs = np.empty((0, NUM_PERM), dtype=np.uint32)
+        self.keys = np.empty((0, BANDS), dtype=np.uint64)
+        self._order = np.empty((BANDS, 0), dtype=np.int64)
+        self._sorted = np.empty((BANDS, 0), dtype=np.uint64)
+        self._empty = np.empty(0, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.sigs)
+
+    def add(self, feature_sets: Sequence[List[str]]):
+        """
+        Indexes the next rows, given their feature sets (see `features`).
+        """
+        if not len(feature_sets):
+            return
+        sigs = signatures(feature_sets)
+        keys = band_keys(sigs)
+        empty = np.fromiter((not f for f in feature_sets), dtype=bool, count=len(feature_sets))
+        with self._lock:
+            self.sigs = np.concatenate([self.sigs, sigs])
+            self.keys = np.concatenate([self.keys, keys])
+            self._empty = np.concatenate([self._empty, empty])
+            self._order = np.argsort(self.keys, axis=0, kind="stable").T
+            self._sorted = np.take_along_axis(self.keys, self._order.T, axis=0).T
+
+    def sync(self, table: pa.Table):
+        """
+        Indexes the rows of the bank `table` not indexed yet.
+        """
+        with self._lock:
+            if table.num_rows <= len(self):
+                return
+            new = table.slice(len(self)).select(["Question", "Choices"])
+            self.add(
+                [
+                    features(question or "", choices or [])
+                    for question, choices in zip(
+                        new.column("Question").to_pylist(), new.column("Choices").to_pylist()
+                    )
+                ]
+            )
+
+    def query(
+        self,
+        question: str,
+        choices: Iterable[str] = (),
+        threshold: float = DEFAULT_THRESHOLD,
+        live: Optional[np.ndarray] = None,
+    ) -> List[Match]:
+        """
+        Returns the indexed rows similar to a question, most similar first.
+
+        Args:
+            question (str): The question text.
+            choices (Iterable[str]): Its choices.
+            threshold (float): The least estimated Jaccard similarity.
+            live (Optional[np.ndarray]): Boolean mask of the rows to consider.
+
+        Returns:
+            List[Match]: The similar rows.
+        """
+        feature_set = features(question, choices)
+        if not feature_set or not len(self):
+            return []
+        sig = signatures([feature_set])
+        keys = band_keys(sig)[0]
+        with self._lock:
+            candidates = []
+            for band in range(BANDS):
+                lo = np.searchsorted(self._sorted[band], keys[band], side="left")
+                hi = np.searchsorted(self._sorted[band], keys[band], side="right")
+                candidates.append(self._order[band, lo:hi])
+            candidates = np.unique(np.concatenate(candidates))
+            candidates = candidates[_usable(self._empty, live)[candidates]]
+            similarity = (self.sigs[candidates] == sig).mean(axis=1)
+        keep = similarity >= threshold
+        order = np.argsort(-similarity[keep], kind="stable")
+        return [
+            Match(int(pos), round(float(sim), 3))
+            for pos, sim in zip(candidates[keep][order], similarity[keep][order])
+        ]
+
+    def pairs(
+        self, threshold: float = DEFAULT_THRESHOLD, live: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, int, float]]:
+        """
+        Returns every pair of indexed rows at least `threshold` similar, most
+        similar first. Rows sharing a band key with more than `MAX_BUCKET`
+        others are paired with a representative of their cluster rather than
+        with every other member.
+
+        Args:
+            threshold (float): The least estimated Jaccard similarity.
+            live (Optional[np.ndarray]): Boolean mask of the rows to consider.
+
+        Returns:
+            List[Tuple[int, int, float]]: ``(position, position, similarity)``
+                with the lower position first.
+        """
+        with self._lock:
+            sigs, order, sorted_keys, empty = self.sigs, self._order, self._sorted, self._empty
+        n = len(sigs)
+        usable = _usable(empty, live)
+        codes = []
+        for band in range(BANDS):
+            kept = usable[order[band]]
+            rows, keys = order[band][kept], sorted_keys[band][kept]
+            if len(keys) < 2:
+                continue
+            starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+            sizes = np.diff(np.concatenate((starts, [len(keys)])))
+            run_size = np.repeat(sizes, sizes)
+            band_codes = [
+                _bucket_pairs(rows[start : start + size], sigs, n)
+                for start, size in zip(starts[sizes > MAX_BUCKET], sizes[sizes > MAX_BUCKET])
+            ]
+            small = (run_size > 1) & (run_size <= MAX_BUCKET)
+            rows, keys = rows[small], keys[small]
+            # Pair each row with the next ones in its run of equal keys, one
+            # offset at a time.
+            for offset in range(1, int(run_size[small].max(initial=1))):
+                same = keys[offset:] == keys[:-offset]
+                at = np.flatnonzero(same)
+                if not len(at):
+                    break
+                a, b = rows[at], rows[at + offset]
+                band_codes.append(np.minimum(a, b) * n + np.maximum(a, b))
+            if band_codes:
+                codes.append(_distinct(np.concatenate(band_codes)))
+        codes = _distinct(np.concatenate(codes)) if codes else codes
+        if not len(codes):
+            return []
+        first, second = codes // n, codes % n
+        similarity = np.empty(len(codes))
+        for start in range(0, len(codes), CHUNK):
+            end = start + CHUNK
+            similarity[start:end] = (sigs[first[start:end]] == sigs[second[start:end]]).mean(
+                axis=1
+            )
+        keep = similarity >= threshold
+        ranked = np.argsort(-similarity[keep], kind="stable")
+        return [
+            (int(a), int(b), round(float(sim), 3))
+            for a, b, sim in zip(
+                first[keep][ranked], second[keep][ranked], similarity[keep][ranked]
+            )
+        ]
+
+
+def _distinct(values: np.ndarray) -> np.ndarray:
+    """
+    Returns the sorted distinct values of an array (`np.unique`, by sorting).
+    """
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))]
+
+
+def _bucket_pairs(rows: np.ndarray, sigs: np.ndarray, n: int) -> np.ndarray:
+    """
+    Returns the candidate pair codes (``low * n + high``) of a bucket larger
+    than `MAX_BUCKET`: every row with the first row of identical signature
+    (so a cluster of exact duplicates is reported as a star), and the
+    distinct signatures with each other, or with the first one when there
+    are still too many.
+    """
+    _, first, inverse = np.unique(sigs[rows], axis=0, return_index=True, return_inverse=True)
+    reps = rows[first]
+    same = reps[inverse.ravel()]
+    a, b = same[same != rows], rows[same != rows]
+    if len(reps) <= MAX_BUCKET:
+        i, j = np.triu_indices(len(reps), k=1)
+        a, b = np.concatenate([a, reps[i]]), np.concatenate([b, reps[j]])
+    else:
+        a = np.concatenate([a, np.repeat(reps[:1], len(reps) - 1)])
+        b = np.concatenate([b, reps[1:]])
+    return np.minimum(a, b) * n + np.maximum(a, b)
+
+
+def _usable(empty: np.ndarray, live: Optional[np.ndarray]) -> np.ndarray:
+    # The shared index may be ahead of the caller's snapshot; rows past the
+    # end of its live mask are not live for it.
+    if live is None:
+        return ~empty
+    usable = np.zeros(len(empty), dtype=bool)
+    n = min(len(empty), len(live))
+    usable[:n] = live[:n] & ~empty[:n]
+    return usable
+
+
+def live_mask(id_pos, size: int) -> np.ndarray:
+    """
+    Returns the boolean mask of the live rows of a bank of `size` rows, from
+    its ``{ID: position}`` map.
+    """
+    mask = np.zeros(size, dtype=bool)
+    mask[np.fromiter(id_pos.values(), dtype=np.int64, count=len(id_pos))] = True
+    return mask
+
+
+def similar_questions(
+    index: DedupIndex,
+    snapshot,
+    question: str,
+    choices: Iterable[str] = (),
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List[Tuple[int, float, str]]:
+    """
+    Returns the live questions of a bank snapshot similar to a question.
+
+    Args:
+        index (DedupIndex): The index, synced with the snapshot's table.
+        snapshot (BankSnapshot): The bank.
+        question (str): The question text.
+        choices (Iterable[str]): Its choices.
+        threshold (float): The least estimated Jaccard similarity.
+
+    Returns:
+        List[Tuple[int, float, str]]: The ID, similarity and text of each
+            similar question, most similar first.
+    """
+    live = live_mask(snapshot.id_pos, snapshot.table.num_rows)
+    matches = index.query(question, choices, threshold, live)
+    if not matches:
+        return []
+    rows = snapshot.table.select(["ID", "Question"]).take(
+        pa.array([match.position for match in matches], pa.int64())
+    )
+    return [
+        (qid, match.similarity, text)
+        for match, qid, text in zip(
+            matches, rows.column("ID").to_pylist(), rows.column("Question").to_pylist()
+        )
+    ]
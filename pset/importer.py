@@ -0,0 +1,388 @@
+"""Bulk question import from CSV or JSONL files.
+
+Records are streamed from the file one at a time, validated (a question,
+four distinct choices, an answer among them, known tags, and no duplicate of
+a question in the bank or earlier in the file, nor a near-duplicate of one
+in the bank) and the valid ones are
+written in chunks, e.g. through `SheetWriter.extend`. After every chunk a
+checkpoint next to the file records how far the import got, so an
+interrupted import resumes where it stopped.
+
+CSV files use the question bank's columns (`ID` is ignored; the sheet
+numbers new rows); JSONL records have the same keys, with `Choices` and
+`Tags` as lists or `"; "`-separated strings.
+"""
+import csv
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from pset.subjects import SUBJECT_TAGS
+
+NUM_CHOICES = 4
+# Numbers the new row from the one above it, like rows added with the form.
+ID_FORMULA = '=INDIRECT("R[-1]C",FALSE)+1'
+
+
+def sheet_row(question: str, choices: List[str], answer: str, tags: List[str]) -> List[str]:
+    """
+    Returns the "QnA" worksheet row of a new question.
+    """
+    return [ID_FORMULA, question, "; ".join(choices), answer, "; ".join(tags)]
+
+
+def split_field(value: Any) -> List[str]:
+    """
+    Returns a list field (`Choices`, `Tags`) as stripped, non-empty items,
+    from a list or a `"; "`-separated string.
+    """
+    if value is None:
+        return []
+    items = value if isinstance(value, list) else str(value).split(";")
+    return [str(item).strip() for item in items if str(item).strip()]
+
+
+def question_key(question: str) -> bytes:
+    """
+    Returns the duplicate-detection key of a question: its text with case
+    and whitespace normalized, hashed.
+    """
+    normalized = " ".join(question.casefold().split())
+    return hashlib.blake2b(normalized.encode(), digest_size=8).digest()
+
+
+class Record(NamedTuple):
+    """
+    A validated question from an import file.
+    """
+
+    number: int
+    question: str
+    choices: List[str]
+    answer: str
+    tags: List[str]
+
+    def sheet_row(self) -> List[str]:
+        return sheet_row(self.question, self.choices, self.answer, self.tags)
+
+
+class Rejected(NamedTuple):
+    """
+    A record that failed validation, with the reasons.
+    """
+
+    number: int
+    question: str
+    errors: List[str]
+
+
+class Malformed(NamedTuple):
+    """
+    A line of an import file that is not a record, with the reason.
+    """
+
+    error: str
+
+
+def record_question(raw: Any) -> str:
+    """
+    Returns the question text of a raw record, for reporting.
+    """
+    return str(raw.get("Question") or "") if isinstance(raw, dict) else ""
+
+
+class Validator:
+    """
+    Checks import records and remembers the accepted ones, so duplicates
+    within the file are caught too.
+
+    Args:
+        known_tags (Iterable[str]): The tags a question may have.
+        existing (Iterable[str]): The questions already in the bank.
+        similar (Optional[Callable[[str, List[str]], List[Tuple[int, float, str]]]]):
+            Returns the bank questions similar to a question and its choices
+            (see `pset.dedup.similar_questions`), to reject near-duplicates.
+    """
+
+    def __init__(
+        self,
+        known_tags: Iterable[str] = SUBJECT_TAGS,
+        existing: Iterable[str] = (),
+        similar: Optional[Callable[[str, List[str]], List[Tuple[int, float, str]]]] = None,
+    ):
+        self.known_tags = set(known_tags)
+        self.seen: Dict[bytes, int] = {question_key(text): 0 for text in existing}
+        self.similar = similar
+
+    @classmethod
+    def for_bank(cls, snapshot, index=None) -> "Validator":
+        """
+        Returns a validator that accepts `SUBJECT_TAGS` and the tags in use
+        in the bank `snapshot`, and rejects duplicates of its live questions,
+        and near-duplicates too given its `pset.dedup.DedupIndex`.
+        """
+        questions = snapshot.table.column("Question").take(snapshot.positions())
+        similar = None
+        if index is not None:
+            from pset.dedup import similar_questions
+
+            index.sync(snapshot.table)
+
+            def similar(question, choices):
+                return similar_questions(index, snapshot, question, choices)
+
+        return cls(set(SUBJECT_TAGS) | set(snapshot.tags.tags()), questions.to_pylist(), similar)
+
+    def check(
+        self, number: int, raw: Any, near_duplicates: bool = True
+    ) -> Tuple[Optional[Record], List[str]]:
+        """
+        Validates the record numbered `number` (1-based).
+
+        Args:
+            number (int): The record's number.
+            raw (Any): The record as read from the file.
+            near_duplicates (bool): Look for similar questions in the bank;
+                the slowest check, skipped for records already imported.
+
+        Returns:
+            Tuple[Optional[Record], List[str]]: The record if it is valid, and
+                the reasons it is not.
+        """
+        if isinstance(raw, Malformed):
+            return None, [raw.error]
+        if not isinstance(raw, dict):
+            return None, [f"expected an object, got {type(raw).__name__}"]
+        question = str(raw.get("Question") or "").strip()
+        choices = split_field(raw.get("Choices"))
+        answer = str(raw.get("Answer") or "").strip()
+        tags = split_field(raw.get("Tags"))
+        errors = []
+        if not question:
+            errors.append("missing question")
+        if len(choices) != NUM_CHOICES:
+            errors.append(f"expected {NUM_CHOICES} choices, got {len(choices)}")
+        elif len(set(choices)) != len(choices):
+            errors.append("choices are not distinct")
+        if answer not in choices:
+            errors.append("answer is not one of the choices")
+        if not tags:
+            errors.append("no tags")
+        unknown = [tag for tag in tags if tag not in self.known_tags]
+        if unknown:
+            errors.append(f"unknown tags: {', '.join(unknown)}")
+        if question:
+            first = self.seen.get(question_key(question))
+            if first == 0:
+                errors.append("duplicate of a question in the bank")
+            elif first is not None:
+                errors.append(f"duplicate of record {first}")
+            elif near_duplicates and self.similar is not None:
+                for qid, similarity, _ in self.similar(question, choices)[:1]:
+                    errors.append(f"near-duplicate of question #{qid} ({similarity:.0%} similar)")
+        if errors:
+            return None, errors
+        self.seen[question_key(question)] = number
+        return Record(number, question, choices, answer, tags), []
+
+
+def read_records(path: str) -> Iterator[Tuple[Any, int]]:
+    """
+    Streams the records of a CSV or JSONL (``.jsonl``/``.ndjson``) file.
+    JSONL lines that are not valid JSON are yielded as `Malformed`, so they
+    are rejected like any other invalid record.
+
+    Yields:
+        Tuple[Any, int]: Each record (normally a dict), and the bytes of the
+            file read so far.
+    """
+    read = 0
+
+    def lines(f):
+        nonlocal read
+        for line in f:
+            read += len(line)
+            yield line.decode("utf-8-sig" if read == len(line) else "utf-8")
+
+    with open(path, "rb") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in lines(f):
+                if not line.strip():
+                    continue
+                try:
+                    raw = json.loads(line)
+                except ValueError as e:
+                    raw = Malformed(f"invalid JSON: {e}")
+                yield raw, read
+        else:
+            for row in csv.DictReader(lines(f)):
+                yield row, read
+
+
+class ImportProgress(NamedTuple):
+    """
+    How far an import has got.
+    """
+
+    records: int
+    imported: int
+    rejected: int
+    bytes_read: int
+    total_bytes: int
+
+    @property
+    def fraction(self) -> float:
+        return self.bytes_read / self.total_bytes if self.total_bytes else 1.0
+
+    @property
+    def finished(self) -> bool:
+        return self.bytes_read >= self.total_bytes
+
+
+def checkpoint_path(path: str) -> str:
+    return path + ".import.json"
+
+
+def rejects_path(path: str) -> str:
+    return path + ".rejects.jsonl"
+
+
+def file_fingerprint(path: str) -> str:
+    """
+    Returns a cheap fingerprint of a file (its size and first MiB), so a
+    checkpoint is not applied to a different file.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        digest.update(f.read(1 << 20))
+    return f"{os.path.getsize(path)}:{digest.hexdigest()}"
+
+
+def load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the checkpoint of an import of `path`, if one exists for this
+    version of the file.
+    """
+    try:
+        with open(checkpoint_path(path)) as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if checkpoint.get("file") != file_fingerprint(path):
+        return None
+    return checkpoint
+
+
+def _save_checkpoint(path: str, checkpoint: Dict[str, Any]):
+    target = checkpoint_path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(target)))
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_rejects(path: str) -> List[Rejected]:
+    """
+    Returns the records rejected so far by imports of `path`.
+    """
+    if not os.path.exists(rejects_path(path)):
+        return []
+    with open(rejects_path(path), encoding="utf-8") as f:
+        return [Rejected(**json.loads(line)) for line in f if line.strip()]
+
+
+def import_file(
+    path: str,
+    validator: Validator,
+    write: Optional[Callable[[List[List[str]]], None]] = None,
+    chunk_size: int = 500,
+    on_progress: Optional[Callable[[ImportProgress], None]] = None,
+    restart: bool = False,
+    max_chunks: Optional[int] = None,
+) -> Tuple[ImportProgress, List[Rejected]]:
+    """
+    Validates the records of `path` and writes the valid ones in chunks.
+
+    With a `write` callback, the import is checkpointed after every chunk:
+    running it again resumes after the last chunk written (a crash between
+    writing a chunk and saving the checkpoint re-sends that chunk), and
+    rejected records are appended to a ``.rejects.jsonl`` file next to
+    `path`. Without one, the file is only validated.
+
+    Args:
+        path (str): The CSV or JSONL file.
+        validator (Validator): Checks each record.
+        write (Optional[Callable[[List[List[str]]], None]]): Durably queues a
+            chunk of worksheet rows (see `sheet_row`).
+        chunk_size (int): Valid records per `write` call.
+        on_progress (Optional[Callable[[ImportProgress], None]]): Called after
+            every chunk.
+        restart (bool): Ignore the checkpoint and import from the start.
+        max_chunks (Optional[int]): Stop after writing this many chunks;
+            run the import again to continue it (see
+            `ImportProgress.finished`).
+
+    Returns:
+        Tuple[ImportProgress, List[Rejected]]: The totals of the whole
+            import, and the records rejected in this run.
+    """
+    checkpoint = None if restart or write is None else load_checkpoint(path)
+    if checkpoint is None:
+        checkpoint = {"file": file_fingerprint(path), "records": 0, "imported": 0, "rejected": 0}
+        if write is not None and os.path.exists(rejects_path(path)):
+            os.unlink(rejects_path(path))
+    skip = checkpoint["records"]
+    total_bytes = os.path.getsize(path)
+    records, imported, rejected = skip, checkpoint["imported"], checkpoint["rejected"]
+    chunk: List[Record] = []
+    chunk_rejects: List[Rejected] = []
+    run_rejects: List[Rejected] = []
+    read = 0
+    chunks = 0
+
+    def commit():
+        nonlocal chunk, chunk_rejects, imported, rejected, chunks
+        if write is not None:
+            if chunk:
+                write([record.sheet_row() for record in chunk])
+            if chunk_rejects:
+                with open(rejects_path(path), "a", encoding="utf-8") as f:
+                    for reject in chunk_rejects:
+                        f.write(json.dumps(reject._asdict()) + "\n")
+        imported += len(chunk)
+        rejected += len(chunk_rejects)
+        run_rejects.extend(chunk_rejects)
+        if write is not None:
+            _save_checkpoint(
+                path,
+                dict(checkpoint, records=records, imported=imported, rejected=rejected),
+            )
+        chunk, chunk_rejects = [], []
+        chunks += 1
+        if on_progress is not None:
+            on_progress(ImportProgress(records, imported, rejected, read, total_bytes))
+
+    for number, (raw, read) in enumerate(read_records(path), start=1):
+        if number <= skip:
+            # Already imported; checked only to catch duplicates of it.
+            validator.check(number, raw, near_duplicates=False)
+            continue
+        record, errors = validator.check(number, raw)
+        records = number
+        if record is None:
+            chunk_rejects.append(Rejected(number, record_question(raw), errors))
+        else:
+            chunk.append(record)
+        if len(chunk) >= chunk_size:
+            commit()
+            if max_chunks is not None and chunks >= max_chunks:
+                return ImportProgress(records, imported, rejected, read, total_bytes), run_rejects
+    read = total_bytes
+    commit()
+    return ImportProgress(records, imported, rejected, read, total_bytes), run_rejects
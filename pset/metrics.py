@@ -0,0 +1,220 @@
+"""Timers and counters around the app's hot paths.
+
+Every timed step is observed into a process-wide histogram, exported in the
+Prometheus text format (see `start_server`), and appended to the timings of
+the current script run, which the debug panel shows. Script runs are
+tracked per thread, as Streamlit runs each session's script on its own
+thread.
+"""
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STEP_SECONDS = "pset_step_seconds"
+CACHE_REQUESTS = "pset_cache_requests_total"
+CACHE_MISSES = "pset_cache_misses_total"
+CACHE_ENTRIES = "pset_cache_entries"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    Cumulative latency buckets, sum, count and max of one labelled series.
+    """
+
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        self.max = max(self.max, seconds)
+
+
+class Registry:
+    """
+    Process-wide histograms and counters, keyed by name and labels.
+    """
+
+    def __init__(self):
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(seconds)
+
+    def inc(self, name: str, amount: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self.gauges.setdefault(name, {})[key] = value
+
+    def steps(self) -> List[Dict[str, Any]]:
+        """
+        Returns the count, mean and max milliseconds of every timed step.
+        """
+        with self._lock:
+            series = dict(self.histograms.get(STEP_SECONDS, {}))
+            return [
+                {
+                    "Step": dict(labels)["step"],
+                    "Count": hist.count,
+                    "Mean (ms)": round(hist.sum / hist.count * 1000, 2),
+                    "Max (ms)": round(hist.max * 1000, 2),
+                }
+                for labels, hist in sorted(series.items())
+            ]
+
+    def render(self) -> str:
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for labels, hist in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + (float("inf"),), hist.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(
+                            f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}"
+                        )
+                    lines.append(f"{name}_sum{_format_labels(labels)} {hist.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {hist.count}")
+            for kind, metrics in (("counter", self.counters), ("gauge", self.gauges)):
+                for name, series in sorted(metrics.items()):
+                    lines.append(f"# TYPE {name} {kind}")
+                    for labels, value in sorted(series.items()):
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = Registry()
+_run = threading.local()
+
+
+def start_run():
+    """
+    Starts collecting the step timings of a new script run on this thread.
+    """
+    _run.timings = []
+    _run.started = time.perf_counter()
+
+
+def run_timings() -> List[Tuple[str, float]]:
+    """
+    Returns the ``(step, seconds)`` timings of the current script run.
+    """
+    return list(getattr(_run, "timings", []))
+
+
+def run_elapsed() -> float:
+    """
+    Returns the seconds since the current script run started.
+    """
+    return time.perf_counter() - getattr(_run, "started", time.perf_counter())
+
+
+def observe(step: str, seconds: float):
+    REGISTRY.observe(STEP_SECONDS, seconds, step=step)
+    timings = getattr(_run, "timings", None)
+    if timings is not None:
+        timings.append((step, seconds))
+
+
+@contextmanager
+def timer(step: str):
+    """
+    Times the enclosed block as `step`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(step, time.perf_counter() - start)
+
+
+def timed(step: str) -> Callable:
+    """
+    Decorator that times every call of a function as `step`.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(step):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def start_server(
+    port: int, host: str = "127.0.0.1", registry: Optional[Registry] = None
+) -> "ThreadingHTTPServer":
+    """
+    Serves `registry` (the process-wide registry by default) at
+    ``http://host:port/metrics`` from a daemon thread.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    registry = registry or REGISTRY
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,187 @@
+import hashlib
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+import pyarrow as pa
+
+
+class BankColumn(Sequence):
+    """
+    A read-only, position-indexed view of one bank column over the rows of a
+    problem set. Values are read from the shared bank table on access, so a
+    problem set never holds copies of question text.
+    """
+
+    __slots__ = ("_column", "_rows", "_convert")
+
+    def __init__(
+        self,
+        column: pa.ChunkedArray,
+        rows: np.ndarray,
+        convert: Optional[Callable[[int, object], object]] = None,
+    ):
+        self._column = column
+        self._rows = rows
+        self._convert = convert
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self[i] for i in range(len(self))[pos]]
+        value = self._column[int(self._rows[pos])].as_py()
+        return self._convert(pos, value) if self._convert else value
+
+    def __iter__(self):
+        values = self._column.take(pa.array(self._rows, pa.int64())).to_pylist()
+        if self._convert:
+            return (self._convert(pos, value) for pos, value in enumerate(values))
+        return iter(values)
+
+
+class ProblemSet:
+    """
+    A generated problem set and the user's progress through it.
+
+    The set is a view over the shared, immutable bank table: it holds only
+    the bank row positions of its questions, their choice permutations and
+    the answer arrays, so it costs a few bytes per question per session.
+    `questions`, `choices`, `answers` and `tags` read from the bank on
+    access. Fetching a question, navigating and recording an answer are all
+    O(1) and mutate the set in place; `revision` counts the changes to the
+    recorded answers, so savers can tell when there is progress to persist.
+
+    Args:
+        table (pa.Table): The bank table (`BankSnapshot.table`).
+        rows (Sequence[int]): The bank row position of each question.
+        perms (np.ndarray): The ``(questions, k)`` matrix of indices into each
+            question's original choices, giving its shuffled choices.
+        spec (Optional[SetSpec]): The seeded query the set was generated
+            from, if it can be regenerated (see `pset.setcode`).
+    """
+
+    __slots__ = (
+        "table",
+        "rows",
+        "ids",
+        "hashes",
+        "perms",
+        "spec",
+        "correct",
+        "done",
+        "num_correct",
+        "num_done",
+        "revision",
+        "encoded",
+    )
+
+    def __init__(
+        self,
+        table: pa.Table,
+        rows: Sequence[int],
+        perms: np.ndarray,
+        spec=None,
+    ):
+        self.table = table
+        self.rows = np.asarray(rows, dtype=np.int64)
+        picked = table.select(["ID", "Hash"]).take(pa.array(self.rows, pa.int64()))
+        self.ids = picked.column("ID").to_numpy()
+        self.hashes = picked.column("Hash").to_numpy()
+        self.perms = np.asarray(perms, dtype=np.int8)
+        self.spec = spec
+        n = len(self.rows)
+        self.correct = np.zeros(n, dtype=bool)
+        self.done = np.zeros(n, dtype=bool)
+        self.num_correct = 0
+        self.num_done = 0
+        self.revision = 0
+        # The encoded questions and permutations, cached by `pset.setcode`.
+        self.encoded = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def qnums(self) -> List[str]:
+        return [f"Q-{i}" for i in range(1, len(self) + 1)]
+
+    @property
+    def questions(self) -> BankColumn:
+        return BankColumn(self.table.column("Question"), self.rows)
+
+    @property
+    def choices(self) -> BankColumn:
+        return BankColumn(self.table.column("Choices"), self.rows, self._shuffled)
+
+    @property
+    def answers(self) -> BankColumn:
+        return BankColumn(
+            self.table.column("Answer"), self.rows, lambda pos, answer: answer.strip()
+        )
+
+    @property
+    def tags(self) -> BankColumn:
+        return BankColumn(self.table.column("Tags"), self.rows)
+
+    def _shuffled(self, pos: int, options: List[str]) -> List[str]:
+        return [options[i] for i in self.perms[pos, : len(options)]]
+
+    def position(self, qnum: str) -> int:
+        """
+        Returns the position of the question numbered `qnum` (e.g. `"Q-3"`).
+        """
+        pos = int(qnum[2:]) - 1
+        if not 0 <= pos < len(self):
+            raise KeyError(qnum)
+        return pos
+
+    def record(self, pos: int, answer: str) -> bool:
+        """
+        Records the user's answer to the question at `pos`.
+
+        Args:
+            pos (int): The position of the question.
+            answer (str): The chosen choice.
+
+        Returns:
+            bool: Whether the answer is correct.
+        """
+        is_correct = answer == self.answers[pos]
+        if not self.done[pos]:
+            self.num_done += 1
+            self.num_correct += is_correct
+        elif self.correct[pos] != is_correct:
+            self.num_correct += 1 if is_correct else -1
+        self.correct[pos] = is_correct
+        self.done[pos] = True
+        self.revision += 1
+        return is_correct
+
+    def restore(self, done: np.ndarray, correct: np.ndarray):
+        """
+        Restores previously recorded progress.
+
+        Args:
+            done (np.ndarray): Whether each question was answered.
+            correct (np.ndarray): Whether each answer was correct.
+        """
+        self.done = np.asarray(done, dtype=bool).copy()
+        self.correct = np.asarray(correct, dtype=bool) & self.done
+        self.num_done = int(self.done.sum())
+        self.num_correct = int(self.correct.sum())
+        self.revision += 1
+
+    def all_done(self) -> bool:
+        return self.num_done == len(self)
+
+    def fingerprint(self) -> str:
+        """
+        Returns a short digest of the questions and the answers recorded so
+        far, for use as a cache key instead of hashing the whole set.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.ids.tobytes())
+        digest.update(np.packbits(self.done).tobytes())
+        digest.update(np.packbits(self.correct).tobytes())
+        return digest.hexdigest()
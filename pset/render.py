@@ -0,0 +1,311 @@
+"""Pre-rendered question text, cached on disk by content.
+
+Questions are Markdown with ``$\\LaTeX$`` math, which Streamlit parses and
+typesets with KaTeX in the browser on every render. `RenderCache` renders a
+question once per version instead: the Markdown to sanitized HTML (raw HTML
+is escaped and unsafe links dropped) and the math to MathML, which browsers
+lay out natively. The converter copies some TeX arguments (``\\text{...}``,
+``\\href``) into its output verbatim, so every formula's MathML is parsed and
+rebuilt from an allowlist of MathML elements and attributes. Fragments are
+stored under the hash of the text, so an edited question gets a new entry
+and every page and process shares the rest.
+
+Questions the pipeline cannot render faithfully (Streamlit-only syntax such
+as ``:red[text]``, TeX commands the MathML converter does not know, or no
+converter installed) are served as their original Markdown.
+"""
+import functools
+import hashlib
+import html
+import os
+import re
+import tempfile
+from html.parser import HTMLParser
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from pset import metrics
+from pset.cache import CACHES, LRUCache
+
+# Bump to invalidate every cached fragment when the rendering changes.
+RENDER_VERSION = b"2"
+
+# Code is matched first so that dollar signs inside it are left alone.
+MATH = re.compile(
+    r"(?P<code>```.*?```|`[^`\n]*`)"
+    r"|(?P<escaped>\\\$)"
+    r"|\$\$(?P<display>.+?)\$\$"
+    r"|\$(?P<inline>[^$\n]+?)\$",
+    re.DOTALL,
+)
+STREAMLIT_SYNTAX = re.compile(r":[a-z]+\[|:[\w+-]+:")
+# Private-use characters, which Markdown neither parses nor escapes.
+PLACEHOLDER = "\ue000{}\ue001"
+UNKNOWN_COMMAND = re.compile(r"<mi>\\")
+
+MATHML_NAMESPACE = "http://www.w3.org/1998/Math/MathML"
+MATHML_ELEMENTS = frozenset(
+    "math mrow mi mn mo ms mtext mspace msub msup msubsup mfrac msqrt mroot mstyle "
+    "mtable mtr mtd mover munder munderover mpadded mphantom menclose mmultiscripts "
+    "mprescripts none".split()
+)
+# Presentation attributes only: no links, event handlers or styles.
+MATHML_ATTRIBUTES = frozenset(
+    "xmlns display mathvariant mathsize stretchy fence separator separators form "
+    "lspace rspace minsize maxsize symmetric largeop movablelimits accent accentunder "
+    "linethickness columnalign rowalign columnspacing rowspacing columnlines rowlines "
+    "frame width height depth scriptlevel displaystyle notation open close".split()
+)
+
+
+class Fragment(NamedTuple):
+    """
+    Question text ready for ``st.markdown(body, unsafe_allow_html=html)``.
+    """
+
+    body: str
+    html: bool
+
+
+@functools.lru_cache(maxsize=None)
+def _markdown():
+    from markdown_it import MarkdownIt
+
+    return MarkdownIt("commonmark", {"html": False}).enable(["table", "strikethrough"])
+
+
+class _MathMLSanitizer(HTMLParser):
+    # Rebuilds MathML from allowed elements and attributes; `ok` turns False
+    # on anything else, including end tags that do not close the open element.
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out: List[str] = []
+        self.stack: List[str] = []
+        self.ok = True
+
+    def _open(self, tag, attrs, close):
+        if tag not in MATHML_ELEMENTS:
+            self.ok = False
+            return
+        parts = [tag]
+        for name, value in attrs:
+            if name not in MATHML_ATTRIBUTES or (
+                name == "xmlns" and value != MATHML_NAMESPACE
+            ):
+                self.ok = False
+                return
+            parts.append(f'{name}="{html.escape(value or "", quote=True)}"')
+        self.out.append(f"<{' '.join(parts)}{' /' if close else ''}>")
+        if not close:
+            self.stack.append(tag)
+
+    def handle_starttag(self, tag, attrs):
+        self._open(tag, attrs, False)
+
+    def handle_startendtag(self, tag, attrs):
+        self._open(tag, attrs, True)
+
+    def handle_endtag(self, tag):
+        if not self.stack or self.stack.pop() != tag:
+            self.ok = False
+            return
+        self.out.append(f"</{tag}>")
+
+    def handle_data(self, data):
+        self.out.append(html.escape(data, quote=False))
+
+    def unknown_decl(self, data):
+        self.ok = False
+
+    def handle_comment(self, data):
+        self.ok = False
+
+    def handle_decl(self, decl):
+        self.ok = False
+
+    def handle_pi(self, data):
+        self.ok = False
+
+
+def sanitize_mathml(mathml: str) -> Optional[str]:
+    """
+    Rebuilds converter MathML from allowed elements and attributes, with
+    its text escaped.
+
+    Args:
+        mathml (str): A ``<math>`` element.
+
+    Returns:
+        Optional[str]: The sanitized MathML, or None if it has anything
+            else (such as raw HTML smuggled in through ``\\text{...}``).
+    """
+    parser = _MathMLSanitizer()
+    parser.feed(mathml)
+    parser.close()
+    if not parser.ok or parser.stack or parser.rawdata:
+        return None
+    return "".join(parser.out)
+
+
+def protect_math(text: str) -> Tuple[str, List[Tuple[str, bool]]]:
+    """
+    Replaces the math in `text` with placeholders the Markdown parser leaves
+    alone.
+
+    Returns:
+        Tuple[str, List[Tuple[str, bool]]]: The text, and the TeX source of
+            each placeholder with whether it is display math.
+    """
+    formulas = []
+
+    def replace(match):
+        if match.group("code"):
+            return match.group("code")
+        if match.group("escaped"):
+            return match.group("escaped")
+        if match.group("display") is not None:
+            formulas.append((match.group("display").strip(), True))
+        else:
+            formulas.append((match.group("inline").strip(), False))
+        return PLACEHOLDER.format(len(formulas) - 1)
+
+    return MATH.sub(replace, text), formulas
+
+
+def render_html(text: str) -> Optional[str]:
+    """
+    Renders question Markdown and math to sanitized HTML and MathML.
+
+    Args:
+        text (str): The question text.
+
+    Returns:
+        Optional[str]: The HTML fragment, or None if the text needs
+            Streamlit's own renderer.
+    """
+    if STREAMLIT_SYNTAX.search(text):
+        return None
+    try:
+        from latex2mathml.converter import convert
+    except ImportError:
+        convert = None
+    source, formulas = protect_math(text)
+    if formulas and convert is None:
+        return None
+    mathml = []
+    for tex, display in formulas:
+        try:
+            math = convert(tex, display="block" if display else "inline")
+        except Exception:
+            return None
+        if UNKNOWN_COMMAND.search(math):
+            return None
+        math = sanitize_mathml(math)
+        if math is None:
+            return None
+        mathml.append(math)
+    html = _markdown().render(source)
+    for i, math in enumerate(mathml):
+        html = html.replace(PLACEHOLDER.format(i), math)
+    # A blank line (only ever inside a code block) would end the HTML block
+    # Streamlit passes through, so encode the second newline.
+    return html.replace("\n\n", "\n&#10;")
+
+
+def render_fragment(text: str) -> Fragment:
+    """
+    Returns the rendered fragment of a question (see `render_html`).
+    """
+    with metrics.timer("render"):
+        html = render_html(text)
+    return Fragment(text, False) if html is None else Fragment(html, True)
+
+
+class RenderCache:
+    """
+    Rendered question fragments, kept in memory (least recently used first
+    out) in front of a content-addressed directory of files.
+
+    Args:
+        directory (Optional[str]): Where fragments are stored; memory only if
+            None.
+        max_entries (int): The most fragments kept in memory.
+    """
+
+    def __init__(self, directory: Optional[str], max_entries: int = 4096):
+        self.directory = directory
+        self.memory = CACHES.setdefault("render", LRUCache("render", max_entries))
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.blake2b(RENDER_VERSION + text.encode(), digest_size=20).hexdigest()
+
+    def _path(self, key: str, html: bool) -> str:
+        return os.path.join(self.directory, key[:2], key + (".html" if html else ".md"))
+
+    def _read(self, key: str, text: str) -> Optional[Fragment]:
+        try:
+            with open(self._path(key, True), encoding="utf-8") as f:
+                return Fragment(f.read(), True)
+        except FileNotFoundError:
+            pass
+        # An empty `.md` file records that the text is served as Markdown.
+        if os.path.exists(self._path(key, False)):
+            return Fragment(text, False)
+        return None
+
+    def _write(self, key: str, fragment: Fragment):
+        path = self._path(key, fragment.html)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(fragment.body if fragment.html else "")
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def render(self, text: str, persist: bool = True) -> Fragment:
+        """
+        Returns the fragment of a question, rendering it on first use.
+
+        Args:
+            text (str): The question text.
+            persist (bool): Whether to store a newly rendered fragment on
+                disk; pass False for drafts such as form previews.
+
+        Returns:
+            Fragment: The HTML fragment, or the original Markdown.
+        """
+        key = self.key(text)
+        hit, fragment = self.memory.get(key)
+        if hit:
+            return fragment
+        fragment = self._read(key, text) if self.directory else None
+        if fragment is None:
+            fragment = render_fragment(text)
+            if self.directory and persist:
+                self._write(key, fragment)
+        self.memory.put(key, fragment)
+        return fragment
+
+    def warm(self, texts: Iterable[str]) -> int:
+        """
+        Renders every text not yet on disk.
+
+        Returns:
+            int: The number of texts rendered.
+        """
+        rendered = 0
+        for text in texts:
+            key = self.key(text)
+            if self.directory and self._read(key, text) is not None:
+                continue
+            fragment = render_fragment(text)
+            if self.directory:
+                self._write(key, fragment)
+            rendered += 1
+        return rendered
@@ -0,0 +1,208 @@
+"""Process-wide resources shared by every session and page.
+
+Each getter is a `st.cache_resource`, so the first session to need a resource
+builds it and every later session and page reuses the same object. Getters
+import their modules when first called, so a page only loads what it uses.
+"""
+from typing import TYPE_CHECKING, Optional
+
+import streamlit as st
+
+from pset import metrics
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+    import numpy as np
+
+    from pset.analytics import AnalyticsStore
+    from pset.attempts import AttemptLog
+    from pset.bank import BankSnapshot, LiveBank
+    from pset.dedup import DedupIndex
+    from pset.render import RenderCache
+    from pset.search import SearchIndex
+    from pset.sessions import SessionStore
+    from pset.sheets import SheetsClient, SheetWriter
+    from pset.srs import Scheduler
+
+BANK_REFRESH_SECS = 60
+
+
+@st.cache_resource(show_spinner="Loading questions...")
+def get_bank() -> "LiveBank":
+    """
+    Returns the question bank, kept in sync with `QNA_CSV` in the background.
+
+    Starts from the compiled bank at `QNA_BANK` (see `python -m pset compile`)
+    when it is configured, and parses `QNA_CSV` otherwise. The source is then
+    checked for new and edited rows every `QNA_REFRESH_SECS` seconds.
+
+    Returns:
+        LiveBank: The shared question bank.
+    """
+    from pset.bank import LiveBank
+
+    source = st.secrets["QNA_CSV"]
+    if "QNA_BANK" in st.secrets:
+        bank = LiveBank.open(st.secrets["QNA_BANK"], source)
+    else:
+        bank = LiveBank.from_source(source)
+    bank.start_auto_refresh(st.secrets.get("QNA_REFRESH_SECS", BANK_REFRESH_SECS))
+    return bank
+
+
+@st.cache_resource
+def get_metrics_server() -> "Optional[ThreadingHTTPServer]":
+    """
+    Serves the process metrics in the Prometheus text format on
+    `METRICS_PORT` (bound to `METRICS_HOST`, default localhost), if set.
+
+    Returns:
+        Optional[ThreadingHTTPServer]: The running server, or None.
+    """
+    if "METRICS_PORT" not in st.secrets:
+        return None
+    return metrics.start_server(
+        int(st.secrets["METRICS_PORT"]), st.secrets.get("METRICS_HOST", "127.0.0.1")
+    )
+
+
+@st.cache_resource(show_spinner="Connecting to Google Sheets...")
+def get_sheets_client() -> "SheetsClient":
+    """
+    Returns the process-wide Google Sheets connection.
+
+    Returns:
+        SheetsClient: The shared client; it authorizes on first use.
+    """
+    from pset.sheets import SheetsClient
+
+    return SheetsClient(dict(st.secrets["GSHEETS_CREDS"]))
+
+
+@st.cache_resource
+def get_sheet_writer() -> "SheetWriter":
+    """
+    Returns the process-wide write-behind queue for the "Board Review"
+    spreadsheet, journaled to `SHEETS_JOURNAL`.
+
+    Returns:
+        SheetWriter: The started writer.
+    """
+    from pset.sheets import SheetWriter
+
+    journal = st.secrets.get("SHEETS_JOURNAL", "sheets-journal.jsonl")
+    return SheetWriter(get_sheets_client().worksheet, journal).start()
+
+
+@st.cache_resource
+def get_analytics_store() -> "AnalyticsStore":
+    """
+    Returns the local analytics store at `ANALYTICS_DIR`.
+
+    Returns:
+        AnalyticsStore: The shared store; sync it with the "PS Data" sheet.
+    """
+    from pset.analytics import AnalyticsStore
+
+    return AnalyticsStore(st.secrets.get("ANALYTICS_DIR", "analytics"))
+
+
+@st.cache_resource
+def get_attempt_log() -> "AttemptLog":
+    """
+    Returns the per-question attempt log at `ATTEMPTS_DB`.
+
+    Returns:
+        AttemptLog: The shared attempt log.
+    """
+    from pset.attempts import AttemptLog
+
+    return AttemptLog(st.secrets.get("ATTEMPTS_DB", "attempts.db"))
+
+
+@st.cache_resource
+def get_session_store() -> "SessionStore":
+    """
+    Returns the store of in-progress quiz sessions at `SESSIONS_DB`, which
+    evicts sessions idle for `SESSIONS_TTL_DAYS` days.
+
+    Returns:
+        SessionStore: The shared session store.
+    """
+    from pset.sessions import SESSION_TTL, SessionStore
+
+    ttl_days = st.secrets.get("SESSIONS_TTL_DAYS", SESSION_TTL / 86400)
+    return SessionStore(st.secrets.get("SESSIONS_DB", "sessions.db"), ttl_days * 86400)
+
+
+@st.cache_resource
+def get_scheduler() -> "Scheduler":
+    """
+    Returns the spaced-repetition scheduler, stored alongside the attempt
+    log in `ATTEMPTS_DB`.
+
+    Returns:
+        Scheduler: The shared scheduler.
+    """
+    from pset.srs import Scheduler
+
+    return Scheduler(st.secrets.get("ATTEMPTS_DB", "attempts.db"))
+
+
+@st.cache_resource(show_spinner="Indexing questions...")
+def get_dedup_index() -> "DedupIndex":
+    """
+    Returns the near-duplicate index over the question bank. Call its
+    `sync` with the current bank table to index questions added since.
+
+    Returns:
+        DedupIndex: The shared index.
+    """
+    from pset.dedup import DedupIndex
+
+    index = DedupIndex()
+    index.sync(get_bank().snapshot.table)
+    return index
+
+
+@st.cache_resource
+def get_search_index() -> "SearchIndex":
+    """
+    Returns the full-text index of the question bank at `SEARCH_DB`. Call
+    its `sync` with the current bank snapshot to pick up edits.
+
+    Returns:
+        SearchIndex: The shared search index.
+    """
+    from pset.search import SearchIndex
+
+    return SearchIndex(st.secrets.get("SEARCH_DB", "search.db"))
+
+
+@st.cache_resource
+def get_render_cache() -> "RenderCache":
+    """
+    Returns the cache of pre-rendered question text at `RENDER_CACHE_DIR`.
+
+    Returns:
+        RenderCache: The shared render cache.
+    """
+    from pset.render import RenderCache
+
+    return RenderCache(st.secrets.get("RENDER_CACHE_DIR", "render-cache"))
+
+
+@st.cache_resource(ttl=300, max_entries=2)
+def get_adaptive_weights(bank_version: int, _bank: "BankSnapshot") -> "np.ndarray":
+    """
+    Returns the adaptive sampling weight of every row of the bank, from the
+    saved runs and the attempt log. Recomputed at most every five minutes
+    per bank version.
+
+    Returns:
+        np.ndarray: The weight of each bank row.
+    """
+    from pset.sampling import history_weights
+
+    return history_weights(_bank, get_analytics_store(), get_attempt_log())
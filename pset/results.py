@@ -0,0 +1,93 @@
+from typing import List, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from pset.problemset import ProblemSet
+
+
+class Results(NamedTuple):
+    """
+    Everything the Results page shows about a finished problem set.
+
+    Attributes:
+        score (int): The number of correct answers.
+        total (int): The number of questions.
+        accuracy (float): `score / total`, in percent.
+        max_streak (int): The longest run of consecutive correct answers.
+        runchart (pd.DataFrame): One row per question with `ID`, `QNum`
+            (question number), `Correct` (`"Correct"` / `"Incorrect"`) and
+            `Streak` (current run of correct answers, 0 if incorrect).
+        incorrect (np.ndarray): Positions of the incorrectly answered questions.
+        incorrect_ids (List[str]): Their bank IDs, sorted.
+        incorrect_tags (List[str]): The distinct tags of those questions.
+        run_tags (List[str]): The distinct tags of the whole set.
+    """
+
+    score: int
+    total: int
+    accuracy: float
+    max_streak: int
+    runchart: pd.DataFrame
+    incorrect: np.ndarray
+    incorrect_ids: List[str]
+    incorrect_tags: List[str]
+    run_tags: List[str]
+
+
+def correct_streaks(correct: np.ndarray) -> np.ndarray:
+    """
+    Returns, for each answer, the length of the run of correct answers it
+    ends (0 for incorrect answers).
+
+    Args:
+        correct (np.ndarray): Boolean correctness of each answer, in order.
+
+    Returns:
+        np.ndarray: The streak at each answer.
+    """
+    correct = np.asarray(correct, dtype=bool)
+    pos = np.arange(len(correct))
+    # Position of the most recent incorrect answer at or before each answer.
+    last_miss = np.maximum.accumulate(np.where(correct, -1, pos))
+    return np.where(correct, pos - last_miss, 0)
+
+
+def summarize(pset: ProblemSet) -> Results:
+    """
+    Computes the results of a problem set in one vectorized pass over its
+    answer arrays.
+
+    Args:
+        pset (ProblemSet): A problem set with every question answered.
+
+    Returns:
+        Results: The score, streaks, run chart data and incorrect questions.
+    """
+    correct = pset.correct
+    streaks = correct_streaks(correct)
+    score = int(correct.sum())
+    total = len(pset)
+    incorrect = np.flatnonzero(~correct)
+
+    runchart = pd.DataFrame(
+        {
+            "ID": pset.ids,
+            "QNum": np.arange(1, total + 1),
+            "Correct": np.where(correct, "Correct", "Incorrect"),
+            "Streak": streaks,
+        }
+    )
+    incorrect_tags = {tag for pos in incorrect for tag in pset.tags[pos]}
+    run_tags = {tag for tags in pset.tags for tag in tags}
+    return Results(
+        score=score,
+        total=total,
+        accuracy=round(score / total * 100, 2) if total else 0.0,
+        max_streak=int(streaks.max()) if total else 0,
+        runchart=runchart,
+        incorrect=incorrect,
+        incorrect_ids=sorted(str(qid) for qid in pset.ids[incorrect]),
+        incorrect_tags=list(incorrect_tags),
+        run_tags=list(run_tags),
+    )
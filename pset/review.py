@@ -0,0 +1,76 @@
+"""Review cards for the incorrectly answered questions on the Results page.
+
+A card is split into its heading, which depends on where the question sits
+in the problem set, and its body, which only depends on the question itself.
+Bodies can therefore be rendered once per question version and reused across
+every session's results.
+"""
+from typing import Iterable, List, Optional
+
+CARD_HEAD = """
+<details><summary style='font-size: 1.2em;'>{title}</summary>
+<br>
+"""
+
+CARD_BODY = """
+{reference}{question}
+
+|            |                               |
+| :--------- | :---------------------------- |
+| **Answer** | {answer}               |
+| **Tags**   | {tags} |
+<hr>
+</details>
+"""
+
+
+def card_body(
+    qid: int, question: str, answer: str, tags: List[str], link: Optional[str] = None
+) -> str:
+    """
+    Renders the body of a question's review card.
+
+    Args:
+        qid (int): The bank ID of the question.
+        question (str): The question text (Markdown).
+        answer (str): The correct answer.
+        tags (List[str]): The question's tags.
+        link (Optional[str]): URL of the question's source row; shown as a
+            `[#ID]` link before the question when given.
+
+    Returns:
+        str: The card body as Markdown/HTML.
+    """
+    reference = f"[#{qid}]({link}) " if link else ""
+    return CARD_BODY.format(
+        reference=reference, question=question, answer=answer, tags=",&ensp;".join(tags)
+    )
+
+
+def card(qnum: str, body: str) -> str:
+    """
+    Returns the full review card for question number `qnum` (e.g. `"Q-3"`).
+    """
+    return CARD_HEAD.format(title=qnum.replace("Q-", "Question #")) + body
+
+
+def page_count(num_items: int, page_size: int) -> int:
+    """
+    Returns the number of pages needed for `num_items` (at least one).
+    """
+    return max(1, -(-num_items // page_size))
+
+
+def paginate(items: List, page: int, page_size: int) -> List:
+    """
+    Returns the items on 1-based `page`.
+    """
+    return items[(page - 1) * page_size : page * page_size]
+
+
+def join_cards(cards: Iterable[str]) -> str:
+    """
+    Joins cards into one Markdown document, so a page of cards is sent to the
+    browser as a single element.
+    """
+    return "\n".join(cards)
@@ -0,0 +1,150 @@
+"""Adaptive question sampling that favours weak tags and missed questions.
+
+Each row of the bank gets a weight from its history: how often it was
+missed, how recently, and how often its tags are missed. Problem sets are
+then drawn without replacement in proportion to those weights.
+"""
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from pset.tags import TagIndex
+
+MISS_WEIGHT = 4.0
+RECENCY_WEIGHT = 2.0
+TAG_WEIGHT = 2.0
+RECENCY_HALF_LIFE_DAYS = 7.0
+
+
+def weighted_sample(
+    positions: np.ndarray, weights: np.ndarray, size: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Draws `size` positions without replacement, each with probability
+    proportional to its weight (Efraimidis-Spirakis).
+
+    Every candidate gets the key ``Exp(1) / weight`` and the `size` smallest
+    keys win, which is one vectorized pass plus a partial sort.
+
+    Args:
+        positions (np.ndarray): The candidate row positions.
+        weights (np.ndarray): The positive weight of each candidate.
+        size (int): The number of positions to draw.
+        rng (np.random.Generator): The random generator to draw from.
+
+    Returns:
+        np.ndarray: The drawn positions, in draw order.
+    """
+    positions = np.asarray(positions)
+    if size >= len(positions):
+        size = len(positions)
+    keys = rng.standard_exponential(len(positions)) / weights
+    if size < len(positions):
+        winners = np.argpartition(keys, size - 1)[:size]
+    else:
+        winners = np.arange(len(positions))
+    return positions[winners[np.argsort(keys[winners])]]
+
+
+def adaptive_weights(
+    ids: np.ndarray,
+    tags: TagIndex,
+    misses: pd.Series,
+    last_missed: pd.Series,
+    tag_miss_rate: pd.Series,
+    attempts: Optional[pd.Series] = None,
+    now: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Computes a sampling weight for every row of the bank.
+
+    The weight is ``1 + MISS_WEIGHT * miss rate + RECENCY_WEIGHT * recency
+    + TAG_WEIGHT * tag miss rate``, so questions without any history keep a
+    weight of 1 plus their tags' share and are never excluded:
+
+    - miss rate: Laplace-smoothed ``(misses + 1) / (attempts + 2)`` when
+      attempts are known, else ``misses / (misses + 1)``;
+    - recency: ``0.5 ** (days since last miss / RECENCY_HALF_LIFE_DAYS)``;
+    - tag miss rate: the mean miss rate of the row's tags.
+
+    Args:
+        ids (np.ndarray): The question ID of every bank row.
+        tags (TagIndex): The tag index of the bank.
+        misses (pd.Series): Misses per question ID.
+        last_missed (pd.Series): Unix time of the last miss per question ID.
+        tag_miss_rate (pd.Series): Miss rate (0-1) per tag.
+        attempts (Optional[pd.Series]): Attempts per question ID, if known.
+        now (Optional[float]): Unix time to measure recency from.
+
+    Returns:
+        np.ndarray: The ``float64`` weight of every bank row.
+    """
+    now = time.time() if now is None else now
+    index = pd.Index(ids)
+    miss = misses.reindex(index).fillna(0).to_numpy(dtype=np.float64)
+    if attempts is not None:
+        tries = attempts.reindex(index).fillna(0).to_numpy(dtype=np.float64)
+        miss_rate = np.where(
+            tries > 0, (miss + 1) / (np.maximum(tries, miss) + 2), miss / (miss + 1)
+        )
+    else:
+        miss_rate = miss / (miss + 1)
+
+    last = last_missed.reindex(index).to_numpy(dtype=np.float64)
+    days = (now - last) / 86400
+    recency = np.where(np.isnan(days), 0.0, 0.5 ** (np.maximum(days, 0) / RECENCY_HALF_LIFE_DAYS))
+
+    tag_sum = np.zeros(len(ids))
+    tag_count = np.zeros(len(ids))
+    for tag in tags.tags():
+        rows = tags.positions(tag)
+        tag_count[rows] += 1
+        tag_sum[rows] += tag_miss_rate.get(tag, 0.0)
+    tag_rate = np.divide(tag_sum, tag_count, out=np.zeros(len(ids)), where=tag_count > 0)
+
+    return 1 + MISS_WEIGHT * miss_rate + RECENCY_WEIGHT * recency + TAG_WEIGHT * tag_rate
+
+
+def history_weights(snapshot, analytics=None, attempts=None) -> np.ndarray:
+    """
+    Computes `adaptive_weights` for every row of a bank snapshot from the
+    saved runs and, where available, the per-answer attempt log.
+
+    Questions with entries in the attempt log use its exact attempt and miss
+    counts; the others fall back to the incorrect IDs of the saved runs. Tag
+    miss rates come from the saved runs' tag columns.
+
+    Args:
+        snapshot (BankSnapshot): The bank to weight.
+        analytics (Optional[AnalyticsStore]): The ingested "PS Data" runs.
+        attempts (Optional[AttemptLog]): The per-answer attempt log.
+
+    Returns:
+        np.ndarray: The weight of every row of `snapshot.table`.
+    """
+    empty = pd.Series(dtype=np.float64)
+    misses, last_missed, tag_rate, tries = empty, empty, empty, None
+
+    if analytics is not None and analytics.questions is not None:
+        misses = analytics.questions["Misses"].astype(np.float64)
+        last_missed = (
+            pd.to_datetime(analytics.questions["LastMissed"]).astype("int64") / 1e9
+        )
+    if analytics is not None and analytics.tags is not None and not analytics.tags.empty:
+        per_tag = analytics.tags.groupby(level="Tag")[["Runs", "Missed"]].sum()
+        tag_rate = per_tag["Missed"] / per_tag["Runs"]
+
+    if attempts is not None:
+        stats = attempts.question_stats()
+        if not stats.empty:
+            misses = stats["Misses"].astype(np.float64).combine_first(misses)
+            log_last = stats["LastMissed"].astype(np.float64)
+            last_missed = np.fmax(log_last, last_missed.reindex(stats.index)).combine_first(
+                last_missed
+            )
+            tries = stats["Attempts"]
+
+    ids = snapshot.table.column("ID").to_numpy()
+    return adaptive_weights(ids, snapshot.tags, misses, last_missed, tag_rate, tries)
@@ -0,0 +1,228 @@
+"""Full-text search over the question bank.
+
+Questions, choices and answers are indexed in an SQLite FTS5 table (Porter
+stemming over Unicode words) keyed by question ID, and matches are ranked
+by BM25 with the question text weighted above the choices and answer. The
+index is kept on disk next to the other databases and follows the bank
+incrementally: each `sync` only inserts, replaces or deletes the questions
+whose row hash changed since the last one.
+"""
+import re
+import sqlite3
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pyarrow as pa
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS questions USING fts5(
+    question, choices, answer,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS indexed (
+    id INTEGER PRIMARY KEY,
+    hash INTEGER NOT NULL
+);
+"""
+
+# BM25 weights of the question, choices and answer columns.
+WEIGHTS = (4.0, 1.0, 1.0)
+SNIPPET_TOKENS = 16
+_TERM = re.compile(r'"([^"]*)"?|(\S+)')
+_WORD = re.compile(r"\w+")
+# Snippet highlight markers; overlapping matches nest them.
+_OPEN, _CLOSE = "\x02", "\x03"
+_MARKER = re.compile("[\x02\x03]")
+
+
+def fts_query(text: str) -> str:
+    """
+    Turns a search box query into an FTS5 query: every word or quoted
+    phrase must match, words joined by punctuation (``McCabe-Thiele``) match
+    as a phrase, and the last word also matches as a prefix while typing.
+    FTS5 operators in the input are treated as plain words.
+    """
+    terms = []
+    for phrase, word in _TERM.findall(text):
+        tokens = _WORD.findall(phrase or word)
+        if tokens:
+            terms.append('"' + " ".join(tokens) + '"')
+    if terms and not text.rstrip().endswith('"'):
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _bold(snippet: str) -> str:
+    """
+    Turns the highlight markers of a snippet into Markdown bold, merging
+    nested and adjacent highlights.
+    """
+    depth = 0
+
+    def replace(match):
+        nonlocal depth
+        if match.group() == _OPEN:
+            depth += 1
+            return "**" if depth == 1 else ""
+        depth -= 1
+        return "**" if depth == 0 else ""
+
+    return _MARKER.sub(replace, snippet).replace("****", "")
+
+
+class SearchHit(NamedTuple):
+    """
+    A question matching a search.
+
+    Attributes:
+        question_id (int): The bank ID of the question.
+        score (float): The BM25 relevance; higher is better.
+        snippet (str): The best matching excerpt, matches in bold Markdown.
+    """
+
+    question_id: int
+    score: float
+    snippet: str
+
+
+class SearchIndex:
+    """
+    The full-text index database.
+
+    Args:
+        path (str): The SQLite database file; created if missing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._synced_digest: Optional[str] = None
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM indexed").fetchone()[0]
+
+    def sync(self, snapshot) -> int:
+        """
+        Brings the index up to date with a bank snapshot.
+
+        Args:
+            snapshot (BankSnapshot): The current bank.
+
+        Returns:
+            int: The number of questions added, replaced or removed.
+        """
+        if snapshot.digest == self._synced_digest:
+            return 0
+        positions = snapshot.positions()
+        live = snapshot.table.select(["ID", "Hash"]).take(pa.array(positions, pa.int64()))
+        ids = live.column("ID").to_numpy()
+        # SQLite integers are signed 64-bit.
+        hashes = live.column("Hash").to_numpy().view(np.int64)
+        with self._lock, self._conn:
+            # Other processes may sync the same file: diff and write under
+            # one write lock.
+            self._conn.execute("BEGIN IMMEDIATE")
+            indexed: Dict[int, int] = dict(self._conn.execute("SELECT id, hash FROM indexed"))
+            changed = [
+                i
+                for i, (qid, row_hash) in enumerate(zip(ids.tolist(), hashes.tolist()))
+                if indexed.get(qid) != row_hash
+            ]
+            removed = indexed.keys() - set(ids.tolist())
+            stale = [(qid,) for qid in removed] + [(int(ids[i]),) for i in changed]
+            rows = snapshot.table.select(["ID", "Question", "Choices", "Answer"]).take(
+                pa.array(positions[changed], pa.int64())
+            )
+            self._conn.executemany("DELETE FROM questions WHERE rowid = ?", stale)
+            self._conn.executemany("DELETE FROM indexed WHERE id = ?", stale)
+            self._conn.executemany(
+                "INSERT INTO questions (rowid, question, choices, answer) VALUES (?, ?, ?, ?)",
+                (
+                    (qid, question, "; ".join(choices or []), answer)
+                    for qid, question, choices, answer in zip(
+                        rows.column("ID").to_pylist(),
+                        rows.column("Question").to_pylist(),
+                        rows.column("Choices").to_pylist(),
+                        rows.column("Answer").to_pylist(),
+                    )
+                ),
+            )
+            self._conn.executemany(
+                "INSERT INTO indexed (id, hash) VALUES (?, ?)",
+                ((int(ids[i]), int(hashes[i])) for i in changed),
+            )
+        self._synced_digest = snapshot.digest
+        return len(changed) + len(removed)
+
+    def search(self, query: str, limit: int = 50) -> List[SearchHit]:
+        """
+        Returns the questions matching a search box query, best first.
+
+        Args:
+            query (str): The words and quoted phrases to search for.
+            limit (int): The most hits returned.
+
+        Returns:
+            List[SearchHit]: The ranked hits.
+        """
+        match = fts_query(query)
+        if not match:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT rowid, bm25(questions, {', '.join(map(str, WEIGHTS))}) AS score,
+                       snippet(questions, -1, '{_OPEN}', '{_CLOSE}', '…', {SNIPPET_TOKENS})
+                FROM questions WHERE questions MATCH ?
+                ORDER BY score LIMIT ?
+                """,
+                (match, limit),
+            ).fetchall()
+        return [
+            SearchHit(qid, round(-score, 3), _bold(snippet)) for qid, score, snippet in rows
+        ]
+
+    def ids(self, query: str, limit: Optional[int] = None) -> List[int]:
+        """
+        Returns the IDs of all questions matching a query (or the best
+        `limit`), best first.
+        """
+        match = fts_query(query)
+        if not match:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT rowid FROM questions WHERE questions MATCH ?
+                ORDER BY bm25(questions, {', '.join(map(str, WEIGHTS))}) LIMIT ?
+                """,
+                (match, -1 if limit is None else limit),
+            ).fetchall()
+        return [qid for (qid,) in rows]
+
+
+def search_positions(
+    ids: List[int], id_pos: Dict[int, int], candidates: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Maps ranked question IDs to bank positions, keeping only live questions
+    (among `candidates`, e.g. a tag query, if given) and the ranking.
+
+    Args:
+        ids (List[int]): Question IDs, best match first.
+        id_pos (Dict[int, int]): The live row position of each question ID.
+        candidates (Optional[np.ndarray]): The positions to choose from.
+
+    Returns:
+        np.ndarray: The matching positions, best match first.
+    """
+    positions = np.fromiter((id_pos[qid] for qid in ids if qid in id_pos), dtype=np.int64)
+    if candidates is None:
+        return positions
+    return positions[np.isin(positions, candidates)]
@@ -0,0 +1,126 @@
+"""Durable quiz sessions that survive page refreshes and app restarts.
+
+A session is stored as its explicit problem set code (see `pset.setcode`),
+holding the question IDs, choice permutation ranks and the Done/Correct
+bitmaps, plus the current question, so it does not depend on the rest of
+the bank. Question text is
+resolved from the shared bank when a session is restored. Sessions not
+touched for `ttl` seconds are evicted.
+"""
+import re
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    code TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated);
+"""
+
+SESSION_TTL = 14 * 86400.0
+EVICT_INTERVAL = 3600.0
+
+_SESSION_ID = re.compile(r"[0-9a-f]{32}")
+
+
+def is_session_id(value: Optional[str]) -> bool:
+    return bool(value) and _SESSION_ID.fullmatch(value) is not None
+
+
+class SavedSession(NamedTuple):
+    """
+    A stored session.
+
+    Attributes:
+        code (str): The problem set code, with progress.
+        position (int): The position of the question being shown.
+        updated (float): Unix time of the last save.
+    """
+
+    code: str
+    position: int
+    updated: float
+
+
+class SessionStore:
+    """
+    The session database.
+
+    Args:
+        path (str): The SQLite database file; created if missing.
+        ttl (float): Seconds after its last save that a session is evicted.
+    """
+
+    def __init__(self, path: str, ttl: float = SESSION_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def save(self, session_id: str, code: str, position: int = 0):
+        """
+        Saves (or replaces) a session, evicting expired sessions at most once
+        every `EVICT_INTERVAL` seconds.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, code, position, updated)"
+                " VALUES (?, ?, ?, ?)",
+                (session_id, code, int(position), now),
+            )
+        if time.monotonic() - self._last_evict >= EVICT_INTERVAL:
+            self.evict(now)
+
+    def save_position(self, session_id: str, position: int):
+        """
+        Updates the current question of a saved session.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE sessions SET position = ?, updated = ? WHERE id = ?",
+                (int(position), time.time(), session_id),
+            )
+
+    def load(self, session_id: str) -> Optional[SavedSession]:
+        """
+        Returns a session, or None if it is unknown or expired.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT code, position, updated FROM sessions WHERE id = ? AND updated >= ?",
+                (session_id, time.time() - self.ttl),
+            ).fetchone()
+        return SavedSession(*row) if row else None
+
+    def delete(self, session_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """
+        Deletes the sessions not saved within the last `ttl` seconds.
+
+        Returns:
+            int: The number of sessions deleted.
+        """
+        now = time.time() if now is None else now
+        self._last_evict = time.monotonic()
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM sessions WHERE updated < ?", (now - self.ttl,)
+            ).rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
@@ -0,0 +1,347 @@
+"""Reproducible problem sets and their compact, URL-safe encoding.
+
+A set generated from a `SetSpec` (tag query, size, seed, and the questions
+it was drawn from) can be rebuilt exactly, so its code only carries the
+spec and the answer progress as two bit-packed vectors. The spec pins only
+its candidate questions: those matching the query up to the highest
+question ID at generation, by their IDs and row hashes. Questions added to
+the bank later do not change the set; editing or deleting a candidate does.
+Other sets (adaptive or due-for-review sets, and seeded sets whose
+candidates changed) are encoded explicitly: delta-coded question IDs plus
+one permutation rank per question for its shuffled choices.
+
+Layout of a code, before base64url:
+
+    version (1 byte) | flags (1 byte) | body, zlib-compressed if FLAG_ZLIB
+
+    body: questions (varint)
+          | seeded: candidates fingerprint (8 bytes), max ID, seed, size
+            (varints), any_of, all_of, none_of (string lists)
+          | explicit: zigzag ID deltas, choice permutation ranks (varints)
+          | done bits | correct bits
+"""
+import base64
+import hashlib
+import secrets
+import zlib
+from typing import List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from pset.builder import build_problem_set
+from pset.problemset import ProblemSet
+
+FORMAT_VERSION = 2
+FLAG_SEEDED = 1
+FLAG_ZLIB = 2
+DIGEST_BYTES = 8
+CHOICES_PER_QUESTION = 4
+
+
+class SetSpec(NamedTuple):
+    """
+    Everything needed to regenerate a problem set.
+
+    Attributes:
+        pool (str): The hex fingerprint of the candidate questions (see
+            `candidates`).
+        max_id (int): The highest question ID in the bank when the set was
+            generated; questions added since are not candidates.
+        any_of (Tuple[str, ...]): Tags of which questions carry at least one.
+        all_of (Tuple[str, ...]): Tags that questions carry all of.
+        none_of (Tuple[str, ...]): Tags that questions carry none of.
+        size (int): The number of questions.
+        seed (int): The seed for question selection and choice shuffles.
+    """
+
+    pool: str
+    max_id: int
+    any_of: Tuple[str, ...]
+    all_of: Tuple[str, ...]
+    none_of: Tuple[str, ...]
+    size: int
+    seed: int
+
+
+def new_seed() -> int:
+    return secrets.randbits(32)
+
+
+def candidates(
+    snapshot,
+    any_of: Sequence[str],
+    all_of: Sequence[str],
+    none_of: Sequence[str],
+    max_id: int,
+) -> Tuple[np.ndarray, str]:
+    """
+    Returns the candidate questions of a seeded set: the live questions
+    matching the tag query with IDs up to `max_id`, in ID order, so they do
+    not depend on how the bank's rows happen to be laid out in this process.
+
+    Returns:
+        Tuple[np.ndarray, str]: Their bank row positions, and the hex
+            fingerprint of their IDs and row hashes.
+    """
+    positions = snapshot.tags.query(any_of, all_of, none_of)
+    ids = snapshot.table.column("ID").to_numpy()[positions]
+    keep = ids <= max_id
+    order = np.argsort(ids[keep], kind="stable")
+    positions, ids = positions[keep][order], ids[keep][order]
+    hashes = snapshot.table.column("Hash").to_numpy()[positions]
+    digest = hashlib.blake2b(digest_size=DIGEST_BYTES)
+    digest.update(ids.astype("<i8").tobytes())
+    digest.update(hashes.astype("<u8").tobytes())
+    return positions, digest.hexdigest()
+
+
+def new_spec(
+    snapshot,
+    any_of: Sequence[str],
+    all_of: Sequence[str],
+    none_of: Sequence[str],
+    size: int,
+    seed: int,
+) -> SetSpec:
+    """
+    Returns the spec of a seeded set drawn from the current bank.
+    """
+    max_id = max(snapshot.id_pos, default=0)
+    _, pool = candidates(snapshot, any_of, all_of, none_of, max_id)
+    return SetSpec(pool, max_id, tuple(any_of), tuple(all_of), tuple(none_of), size, seed)
+
+
+def generate_set(snapshot, spec: SetSpec) -> ProblemSet:
+    """
+    Builds the problem set described by `spec`.
+
+    Args:
+        snapshot (BankSnapshot): The bank; its candidates for the spec must
+            be those it was made with (see `new_spec`).
+        spec (SetSpec): The set to build.
+
+    Returns:
+        ProblemSet: The problem set, with `spec` attached.
+
+    Raises:
+        ValueError: If a candidate question was edited or deleted since.
+    """
+    positions, pool = candidates(snapshot, spec.any_of, spec.all_of, spec.none_of, spec.max_id)
+    if pool != spec.pool:
+        raise ValueError("Questions of this set have changed since it was generated.")
+    pset = build_problem_set(snapshot.table, positions, size=spec.size, seed=spec.seed)
+    pset.spec = spec
+    return pset
+
+
+# Varints ======================================================================
+def _put_varint(out: bytearray, value: int):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _get_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _put_strings(out: bytearray, items: Sequence[str]):
+    _put_varint(out, len(items))
+    for item in items:
+        raw = item.encode()
+        _put_varint(out, len(raw))
+        out += raw
+
+
+def _get_strings(data: bytes, pos: int) -> Tuple[Tuple[str, ...], int]:
+    count, pos = _get_varint(data, pos)
+    items = []
+    for _ in range(count):
+        length, pos = _get_varint(data, pos)
+        items.append(data[pos : pos + length].decode())
+        pos += length
+    return tuple(items), pos
+
+
+# Choice permutations ==========================================================
+def perm_rank(perm: Sequence[int], n: int) -> int:
+    """
+    Returns the rank of the first ``min(k, n)`` entries of a choice
+    permutation among all ordered picks from `n` choices (a Lehmer code).
+    """
+    unused = list(range(n))
+    rank = 0
+    for i, index in enumerate(perm[: min(len(perm), n)]):
+        rank = rank * (n - i) + unused.index(index)
+        unused.remove(index)
+    return rank
+
+
+def perm_unrank(rank: int, n: int, k: int = CHOICES_PER_QUESTION) -> List[int]:
+    """
+    Inverse of `perm_rank`: the choice indices of the rank-th ordered pick
+    of ``min(k, n)`` out of `n` choices.
+    """
+    m = min(k, n)
+    digits = []
+    for i in reversed(range(m)):
+        rank, digit = divmod(rank, n - i)
+        digits.append(digit)
+    unused = list(range(n))
+    return [unused.pop(digit) for digit in reversed(digits)]
+
+
+# Codes ========================================================================
+def _encode_set(pset: ProblemSet, snapshot, explicit: bool) -> Tuple[int, bytes]:
+    # The flags and the body up to the progress bits, which only depend on
+    # the set's questions and permutations.
+    body = bytearray()
+    _put_varint(body, len(pset))
+    flags = 0
+    spec = None if explicit else pset.spec
+    if spec is not None and (
+        candidates(snapshot, spec.any_of, spec.all_of, spec.none_of, spec.max_id)[1]
+        == spec.pool
+    ):
+        flags |= FLAG_SEEDED
+        body += bytes.fromhex(spec.pool)
+        _put_varint(body, spec.max_id)
+        _put_varint(body, spec.seed)
+        _put_varint(body, spec.size)
+        for tags in (spec.any_of, spec.all_of, spec.none_of):
+            _put_strings(body, tags)
+    else:
+        missing = [qid for qid in pset.ids.tolist() if qid not in snapshot.id_pos]
+        if missing:
+            raise ValueError(f"Questions no longer in the bank: {missing[:5]}")
+        previous = 0
+        for qid in pset.ids.tolist():
+            delta = qid - previous
+            _put_varint(body, (delta << 1) ^ (delta >> 63))
+            previous = qid
+        rows = pa.array(pset.rows, pa.int64())
+        lengths = pc.list_value_length(pset.table.column("Choices").take(rows))
+        for perm, n in zip(pset.perms.tolist(), lengths.to_pylist()):
+            _put_varint(body, perm_rank(perm, n))
+    return flags, bytes(body)
+
+
+def encode(pset: ProblemSet, snapshot, explicit: bool = False) -> str:
+    """
+    Encodes a problem set and its progress as a short URL-safe string.
+
+    Sets with a `spec` whose candidates are unchanged in the bank are
+    encoded by their spec; others by their question IDs and choice
+    permutations. That part is cached on the set per bank version, so
+    re-encoding after an answer only packs the progress bits.
+
+    Args:
+        pset (ProblemSet): The problem set.
+        snapshot (BankSnapshot): The bank it was drawn from.
+        explicit (bool): Encode the question IDs and permutations even if
+            the set has a spec, so the code does not depend on the other
+            questions of the bank.
+
+    Returns:
+        str: The base64url code.
+
+    Raises:
+        ValueError: If a question of an explicitly encoded set is no longer
+            in the bank.
+    """
+    cached = pset.encoded.get(explicit)
+    if cached is None or cached[0] != snapshot.digest:
+        cached = pset.encoded[explicit] = (snapshot.digest,) + _encode_set(
+            pset, snapshot, explicit
+        )
+    _, flags, head = cached
+    body = head + np.packbits(pset.done).tobytes() + np.packbits(pset.correct).tobytes()
+
+    packed = zlib.compress(body, 9)
+    if len(packed) < len(body):
+        flags |= FLAG_ZLIB
+        body = packed
+    code = bytes([FORMAT_VERSION, flags]) + body
+    return base64.urlsafe_b64encode(code).rstrip(b"=").decode()
+
+
+def decode(code: str, snapshot) -> ProblemSet:
+    """
+    Rebuilds a problem set and its progress from `encode`'s code.
+
+    Args:
+        code (str): The code.
+        snapshot (BankSnapshot): The bank to resolve questions from.
+
+    Returns:
+        ProblemSet: The problem set, with its recorded answers restored.
+
+    Raises:
+        ValueError: If the code is malformed, or refers to a bank or
+            questions that are not available.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(code + "=" * (-len(code) % 4))
+        version, flags, body = raw[0], raw[1], raw[2:]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported problem set code version {version}.")
+        if flags & FLAG_ZLIB:
+            body = zlib.decompress(body)
+        n, pos = _get_varint(body, 0)
+        if flags & FLAG_SEEDED:
+            pool = body[pos : pos + DIGEST_BYTES].hex()
+            max_id, pos = _get_varint(body, pos + DIGEST_BYTES)
+            seed, pos = _get_varint(body, pos)
+            size, pos = _get_varint(body, pos)
+            any_of, pos = _get_strings(body, pos)
+            all_of, pos = _get_strings(body, pos)
+            none_of, pos = _get_strings(body, pos)
+            spec = SetSpec(pool, max_id, any_of, all_of, none_of, size, seed)
+            pset = generate_set(snapshot, spec)
+        else:
+            ids, previous = [], 0
+            for _ in range(n):
+                zigzag, pos = _get_varint(body, pos)
+                previous += (zigzag >> 1) ^ -(zigzag & 1)
+                ids.append(previous)
+            ranks = []
+            for _ in range(n):
+                rank, pos = _get_varint(body, pos)
+                ranks.append(rank)
+            pset = _explicit_set(snapshot, ids, ranks)
+        nbytes = (n + 7) // 8
+        done = np.unpackbits(np.frombuffer(body, np.uint8, nbytes, pos), count=n)
+        correct = np.unpackbits(np.frombuffer(body, np.uint8, nbytes, pos + nbytes), count=n)
+    except (IndexError, zlib.error, UnicodeDecodeError, base64.binascii.Error) as e:
+        raise ValueError("Malformed problem set code.") from e
+    if len(pset) != n:
+        raise ValueError("The problem set code does not match the question bank.")
+    pset.restore(done, correct)
+    return pset
+
+
+def _explicit_set(snapshot, ids: List[int], ranks: List[int]) -> ProblemSet:
+    missing = [qid for qid in ids if qid not in snapshot.id_pos]
+    if missing:
+        raise ValueError(f"Questions no longer in the bank: {missing[:5]}")
+    rows = pa.array([snapshot.id_pos[qid] for qid in ids], pa.int64())
+    lengths = pc.list_value_length(snapshot.table.column("Choices").take(rows))
+    perms = np.zeros((len(ids), CHOICES_PER_QUESTION), dtype=np.int64)
+    for i, (rank, n) in enumerate(zip(ranks, lengths.to_pylist())):
+        perm = perm_unrank(rank, n)
+        perms[i, : len(perm)] = perm
+    return ProblemSet(snapshot.table, rows.to_numpy(), perms)
@@ -0,0 +1,467 @@
+"""Google Sheets access: one pooled client per process, and writes batched
+and retried off the Streamlit script thread.
+
+Rows are appended to a local journal and queued; a background worker then
+coalesces the queued rows of every session into one ``append_rows`` call per
+worksheet, taking turns between worksheets and retrying each with exponential
+backoff when Sheets rate-limits us or fails. Every process owns its journal
+file, locked for its lifetime; rows left in the journal of a process that
+stopped are re-sent by the next one to start.
+"""
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List
+
+from pset import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: journals are not locked.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+SPREADSHEET = "Board Review"
+
+
+def _jsonable(value):
+    # NumPy scalars (e.g. sums of a boolean column) -> plain Python values.
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def _try_lock(f) -> bool:
+    """
+    Takes an exclusive lock on an open file for as long as it stays open,
+    without waiting. Returns whether the lock was taken.
+    """
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def _read_pending(f) -> List[Dict[str, Any]]:
+    """
+    Returns the journaled rows of an open journal file not acknowledged yet,
+    in order.
+    """
+    entries, acked = {}, set()
+    f.seek(0)
+    for line in f:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue  # Torn final line from a crash mid-write.
+        if "ack" in record:
+            acked.update(record["ack"])
+        else:
+            entries[record["seq"]] = record
+    return [entries[seq] for seq in sorted(entries) if seq not in acked]
+
+
+def is_retryable(exc: Exception) -> bool:
+    """
+    Returns whether a failed Sheets call is worth retrying: rate limits,
+    server errors and network errors are, anything else is not.
+    """
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is not None:
+        return status in RETRY_STATUS
+    return isinstance(exc, (OSError, TimeoutError))
+
+
+class CallStats:
+    """
+    Latency and quota counters for the HTTP calls of a `SheetsClient`.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.status: Dict[int, int] = {}
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, status: int):
+        now = time.monotonic()
+        with self._lock:
+            self.calls += 1
+            self.errors += status >= 400
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self.status[status] = self.status.get(status, 0) + 1
+            self._recent.append(now)
+
+    def calls_last_minute(self) -> int:
+        """
+        Returns the calls made in the last 60 seconds, the window Sheets
+        API quotas are enforced over.
+        """
+        cutoff = time.monotonic() - 60
+        with self._lock:
+            while self._recent and self._recent[0] < cutoff:
+                self._recent.popleft()
+            return len(self._recent)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "calls_last_minute": self.calls_last_minute(),
+            "mean_seconds": self.total_seconds / self.calls if self.calls else 0.0,
+            "max_seconds": self.max_seconds,
+            "status": dict(self.status),
+        }
+
+
+class SheetsClient:
+    """
+    The process-wide Google Sheets connection.
+
+    Authorizes once and reuses a single HTTP session, whose connection pool
+    keeps connections to the Sheets API alive and whose credentials refresh
+    their access token as needed. Spreadsheet and worksheet handles are
+    opened once and cached, and every HTTP call is timed into `stats`.
+
+    Args:
+        creds (Dict[str, Any]): The service account info.
+        pool_size (int): Connections kept alive to the Sheets API.
+    """
+
+    def __init__(self, creds: Dict[str, Any], pool_size: int = 10):
+        self.creds = creds
+        self.pool_size = pool_size
+        self.stats = CallStats()
+        self._client = None
+        self._spreadsheets: Dict[str, Any] = {}
+        self._worksheets: Dict[tuple, Any] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def client(self):
+        """
+        Returns the authorized gspread client, creating it on first use.
+        """
+        with self._lock:
+            if self._client is None:
+                import gspread
+                from requests.adapters import HTTPAdapter
+
+                client = gspread.service_account_from_dict(self.creds)
+                # gspread 5 keeps the session on the client, 6 on its http_client.
+                session = getattr(client, "http_client", client).session
+                adapter = HTTPAdapter(
+                    pool_connections=self.pool_size, pool_maxsize=self.pool_size
+                )
+                session.mount("https://", adapter)
+                session.request = self._timed(session.request)
+                self._client = client
+            return self._client
+
+    def _timed(self, request):
+        def timed_request(*args, **kwargs):
+            start = time.perf_counter()
+            status = 599
+            try:
+                response = request(*args, **kwargs)
+                status = response.status_code
+                return response
+            finally:
+                seconds = time.perf_counter() - start
+                self.stats.record(seconds, status)
+                metrics.REGISTRY.observe(
+                    "pset_sheets_request_seconds", seconds, status=str(status)
+                )
+
+        return timed_request
+
+    def spreadsheet(self, title: str = SPREADSHEET):
+        """
+        Returns the (cached) handle of the spreadsheet named `title`.
+        """
+        with self._lock:
+            if title not in self._spreadsheets:
+                self._spreadsheets[title] = self.client.open(title)
+            return self._spreadsheets[title]
+
+    def worksheet(self, name: str, spreadsheet: str = SPREADSHEET):
+        """
+        Returns the (cached) handle of worksheet `name` in `spreadsheet`.
+        """
+        with self._lock:
+            key = (spreadsheet, name)
+            if key not in self._worksheets:
+                self._worksheets[key] = self.spreadsheet(spreadsheet).worksheet(name)
+            return self._worksheets[key]
+
+
+class SheetWriter:
+    """
+    A write-behind queue of rows to append to worksheets.
+
+    Queued rows are journaled to `journal_path`, or to ``journal_path.1``,
+    ``journal_path.2``, ... when other processes hold the earlier files; the
+    actual file is `self.journal_path`. Rows left in journals no process
+    holds are taken over and re-sent.
+
+    A worksheet whose appends keep failing is retried with backoff while the
+    other worksheets take their turns, and its batch is set aside in a
+    ``.failed`` file after `max_attempts` attempts.
+
+    Args:
+        open_worksheet (Callable[[str], Any]): Opens a worksheet by name. Only
+            called from the worker thread; handles are reused.
+        journal_path (str): File that queued rows are journaled to.
+        batch_size (int): Maximum rows per `append_rows` call.
+        flush_interval (float): Seconds to wait for more rows before a batch
+            is sent.
+        max_backoff (float): Upper bound of the retry delay, in seconds.
+        max_attempts (int): Attempts at sending a batch before giving up on it.
+        value_input_option (str): Passed through to `append_rows`.
+    """
+
+    def __init__(
+        self,
+        open_worksheet: Callable[[str], Any],
+        journal_path: str,
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+        max_backoff: float = 64.0,
+        max_attempts: int = 10,
+        value_input_option: str = "USER_ENTERED",
+    ):
+        self.open_worksheet = open_worksheet
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.value_input_option = value_input_option
+        self._worksheets: Dict[str, Any] = {}
+        self._pending: List[Dict[str, Any]] = []
+        self._seq = 0
+        self._attempts: Dict[str, int] = {}
+        self._retry_at: Dict[str, float] = {}
+        self._last_sent = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.journal_path, self._journal = self._claim_journal(journal_path)
+        self._replay_journal()
+        self._adopt_journals(journal_path)
+
+    @staticmethod
+    def _journal_slots(base: str):
+        return (base if i == 0 else f"{base}.{i}" for i in itertools.count())
+
+    def _claim_journal(self, base: str):
+        # The first journal file no other writer holds. Truncating or
+        # reopening it would drop the lock, so it stays open for good.
+        for path in self._journal_slots(base):
+            f = open(path, "a+", encoding="utf-8")
+            if _try_lock(f):
+                return path, f
+            f.close()
+
+    def _replay_journal(self):
+        self._pending = _read_pending(self._journal)
+        size = os.fstat(self._journal.fileno()).st_size
+        if size and os.pread(self._journal.fileno(), 1, size - 1) != b"\n":
+            # End a torn final line, so the next record is not appended to it.
+            self._journal.write("\n")
+            self._journal.flush()
+        self._seq = max((record["seq"] for record in self._pending), default=0)
+        if self._pending:
+            logger.info("Replaying %d journaled sheet rows", len(self._pending))
+
+    def _adopt_journals(self, base: str):
+        # Take over the unsent rows of journals left by stopped processes.
+        if fcntl is None:
+            return
+        for path in self._journal_slots(base):
+            if path == self.journal_path:
+                continue
+            if not os.path.exists(path):
+                break
+            with open(path, "a+", encoding="utf-8") as f:
+                if not _try_lock(f):
+                    continue
+                orphans = _read_pending(f)
+                if orphans:
+                    logger.info("Taking over %d sheet rows from %s", len(orphans), path)
+                    for record in orphans:
+                        self.extend(record["ws"], [record["row"]])
+                f.truncate(0)
+
+    def _write_journal(self, record: Dict[str, Any]):
+        self._journal.write(json.dumps(record, default=_jsonable) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def append(self, worksheet: str, row: List[Any]):
+        """
+        Queues a row to be appended to `worksheet`. Returns once the row is
+        journaled, without waiting for Sheets.
+        """
+        with self._lock:
+            self._seq += 1
+            record = json.loads(
+                json.dumps({"seq": self._seq, "ws": worksheet, "row": row}, default=_jsonable)
+            )
+            self._write_journal(record)
+            self._pending.append(record)
+        self._wake.set()
+
+    def extend(self, worksheet: str, rows: List[List[Any]]):
+        """
+        Queues many rows to be appended to `worksheet`, journaled with a
+        single sync. Returns once the rows are journaled.
+        """
+        with self._lock:
+            records = []
+            for row in rows:
+                self._seq += 1
+                records.append(
+                    json.loads(
+                        json.dumps(
+                            {"seq": self._seq, "ws": worksheet, "row": row}, default=_jsonable
+                        )
+                    )
+                )
+            self._journal.write("".join(json.dumps(record) + "\n" for record in records))
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._pending.extend(records)
+        self._wake.set()
+
+    def pending(self) -> int:
+        """
+        Returns the number of rows not yet written to Sheets.
+        """
+        return len(self._pending)
+
+    def start(self) -> "SheetWriter":
+        """
+        Starts the background worker (once).
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="sheet-writer", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 10.0):
+        """
+        Flushes what can be flushed within `timeout` and stops the worker.
+        """
+        self.flush(timeout)
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """
+        Waits until every queued row is written, or `timeout` seconds pass.
+
+        Returns:
+            bool: Whether the queue was fully drained.
+        """
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            if self._thread is None:
+                self._drain()
+                if self._pending:
+                    time.sleep(0.05)  # Backing off.
+            else:
+                self._wake.set()
+                time.sleep(0.05)
+        return not self._pending
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            # Give concurrent sessions a moment to add to the same batch.
+            self._stop.wait(min(0.2, self.flush_interval))
+            try:
+                self._drain()
+            except Exception:
+                logger.exception("Sheet writer failed")
+
+    def _next_batch(self):
+        now = time.monotonic()
+        with self._lock:
+            names = list(dict.fromkeys(record["ws"] for record in self._pending))
+            ready = [name for name in names if self._retry_at.get(name, 0.0) <= now]
+            if not ready:
+                return None, []
+            # Take turns: the first ready worksheet after the last one sent to.
+            if self._last_sent in names:
+                turn = names.index(self._last_sent) + 1
+                ready.sort(key=lambda name: (names.index(name) - turn) % len(names))
+            name = self._last_sent = ready[0]
+            batch = [r for r in self._pending if r["ws"] == name][: self.batch_size]
+            return name, batch
+
+    def _drain(self):
+        while not self._stop.is_set():
+            name, batch = self._next_batch()
+            if not batch:
+                break
+            try:
+                self._send(name, [record["row"] for record in batch])
+            except Exception as exc:
+                attempts = self._attempts.get(name, 0) + 1
+                if is_retryable(exc) and attempts < self.max_attempts:
+                    delay = min(self.max_backoff, 2.0 ** (attempts - 1))
+                    delay *= random.uniform(0.5, 1.0)
+                    logger.warning(
+                        "Sheets append to %r failed (%s); retrying in %.1fs", name, exc, delay
+                    )
+                    self._attempts[name] = attempts
+                    self._retry_at[name] = time.monotonic() + delay
+                    continue
+                logger.exception(
+                    "Dropping %d rows for %r after %d attempts; they are kept in %s.failed",
+                    len(batch),
+                    name,
+                    attempts,
+                    self.journal_path,
+                )
+                with open(self.journal_path + ".failed", "a", encoding="utf-8") as f:
+                    for record in batch:
+                        f.write(json.dumps(record) + "\n")
+            self._attempts.pop(name, None)
+            self._retry_at.pop(name, None)
+            self._ack(batch)
+
+    def _send(self, name: str, rows: List[List[Any]]):
+        if name not in self._worksheets:
+            self._worksheets[name] = self.open_worksheet(name)
+        self._worksheets[name].append_rows(rows, value_input_option=self.value_input_option)
+
+    def _ack(self, batch: List[Dict[str, Any]]):
+        seqs = {record["seq"] for record in batch}
+        with self._lock:
+            self._pending = [r for r in self._pending if r["seq"] not in seqs]
+            if self._pending:
+                self._write_journal({"ack": sorted(seqs)})
+            else:
+                # Everything is written: start a fresh journal.
+                self._journal.truncate(0)
+
@@ -0,0 +1,308 @@
+"""Spaced-repetition scheduling (SM-2) of the questions in the bank.
+
+Every question a quiz session answers becomes a card of that session with
+an interval, an ease factor and a due time, stored in SQLite with an index
+on the session and due time, so the queue of due cards is an index range
+scan rather than an evaluation of every card. A session restored from a
+link starts with a copy of the linked session's cards (see `fork`), so
+schedules carry over without one student's answers rescheduling another's.
+"""
+import datetime as dt
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400.0
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+FAST_ANSWER_MS = 20_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    session TEXT NOT NULL,
+    question_id INTEGER NOT NULL,
+    reps INTEGER NOT NULL,
+    interval REAL NOT NULL,
+    ease REAL NOT NULL,
+    lapses INTEGER NOT NULL,
+    last_review REAL NOT NULL,
+    due REAL NOT NULL,
+    PRIMARY KEY (session, question_id)
+);
+CREATE INDEX IF NOT EXISTS cards_session_due ON cards (session, due);
+CREATE TABLE IF NOT EXISTS forks (
+    session TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    ts REAL NOT NULL
+);
+"""
+
+CARD_COLUMNS = ["question_id", "reps", "interval", "ease", "lapses", "last_review", "due"]
+
+
+class Card(NamedTuple):
+    """
+    The review state of one question.
+
+    Attributes:
+        question_id (int): The bank ID of the question.
+        reps (int): Consecutive successful reviews.
+        interval (float): Days until the next review.
+        ease (float): The SM-2 ease factor.
+        lapses (int): Times the question was forgotten after being learned.
+        last_review (float): Unix time of the last review.
+        due (float): Unix time the question is due again.
+    """
+
+    question_id: int
+    reps: int = 0
+    interval: float = 0.0
+    ease: float = DEFAULT_EASE
+    lapses: int = 0
+    last_review: float = 0.0
+    due: float = 0.0
+
+
+def grade(correct: bool, latency_ms: Optional[int] = None) -> int:
+    """
+    Maps an answer to an SM-2 quality grade (0-5): 5 for a quick correct
+    answer, 4 for a slow one and 1 for an incorrect one.
+    """
+    if not correct:
+        return 1
+    if latency_ms is not None and latency_ms <= FAST_ANSWER_MS:
+        return 5
+    return 4
+
+
+def sm2(card: Card, quality: int, ts: float) -> Card:
+    """
+    Returns the card after a review of the given quality at Unix time `ts`.
+
+    As in SM-2, a failed review (quality below 3) restarts the repetitions
+    at a one-day interval but leaves the ease factor unchanged.
+    """
+    if quality >= 3:
+        if card.reps == 0:
+            interval = 1.0
+        elif card.reps == 1:
+            interval = 6.0
+        else:
+            interval = round(card.interval * card.ease)
+        reps, lapses = card.reps + 1, card.lapses
+        ease = card.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    else:
+        interval = 1.0
+        reps, lapses = 0, card.lapses + (card.reps > 0)
+        ease = card.ease
+    return Card(
+        card.question_id,
+        reps,
+        interval,
+        max(MIN_EASE, ease),
+        lapses,
+        ts,
+        ts + interval * DAY,
+    )
+
+
+def end_of_day(ts: Optional[float] = None) -> float:
+    """
+    Returns the Unix time of the end of the (local) day containing `ts`.
+    """
+    day = dt.date.fromtimestamp(time.time() if ts is None else ts)
+    return dt.datetime.combine(day + dt.timedelta(days=1), dt.time()).timestamp()
+
+
+def due_positions(
+    due_ids: List[int], id_pos: Dict[int, int], candidates: np.ndarray
+) -> np.ndarray:
+    """
+    Maps due question IDs to bank positions, keeping only live questions
+    among `candidates` (e.g. a tag query) and the due order.
+
+    Args:
+        due_ids (List[int]): Question IDs, most overdue first.
+        id_pos (Dict[int, int]): The live row position of each question ID.
+        candidates (np.ndarray): The positions to choose from.
+
+    Returns:
+        np.ndarray: The due positions, most overdue first.
+    """
+    positions = np.fromiter(
+        (id_pos[qid] for qid in due_ids if qid in id_pos), dtype=np.int64
+    )
+    return positions[np.isin(positions, candidates)]
+
+
+class Scheduler:
+    """
+    The card store and due queues, one per quiz session.
+
+    Args:
+        path (str): The SQLite database file; created if missing. May be the
+            attempt log's database.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(cards)")]
+        if columns and "session" not in columns:
+            logger.warning(
+                "Dropping review cards shared by all sessions; run `python -m pset "
+                "reschedule %s` to rebuild them per session",
+                path,
+            )
+            self._conn.execute("DROP TABLE cards")
+        self._conn.executescript(SCHEMA)
+
+    def card(self, session: str, question_id: int) -> Optional[Card]:
+        """
+        Returns a session's card of a question, or None if the session never
+        reviewed it.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(CARD_COLUMNS)} FROM cards"
+                " WHERE session = ? AND question_id = ?",
+                (session, int(question_id)),
+            ).fetchone()
+        return Card(*row) if row else None
+
+    def review(
+        self,
+        session: str,
+        question_id: int,
+        correct: bool,
+        latency_ms: Optional[int] = None,
+        ts: Optional[float] = None,
+    ) -> Card:
+        """
+        Records a session's answer to a question and reschedules its card.
+
+        Returns:
+            Card: The updated card.
+        """
+        ts = time.time() if ts is None else ts
+        card = self.card(session, question_id) or Card(int(question_id))
+        card = sm2(card, grade(correct, latency_ms), ts)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO cards (session, {', '.join(CARD_COLUMNS)})"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (session,) + card,
+            )
+        return card
+
+    def fork(self, parent: str, session: str, ts: Optional[float] = None) -> int:
+        """
+        Starts a session's schedule as a copy of another session's cards.
+        Later reviews in either session do not change the other.
+
+        Returns:
+            int: The number of cards copied.
+        """
+        ts = time.time() if ts is None else ts
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO forks (session, parent, ts) VALUES (?, ?, ?)",
+                (session, parent, ts),
+            )
+            return self._conn.execute(
+                f"INSERT OR REPLACE INTO cards (session, {', '.join(CARD_COLUMNS)})"
+                f" SELECT ?, {', '.join(CARD_COLUMNS)} FROM cards WHERE session = ?",
+                (session, parent),
+            ).rowcount
+
+    def due(
+        self, session: str, until: Optional[float] = None, limit: Optional[int] = None
+    ) -> List[int]:
+        """
+        Returns the IDs of a session's questions due by Unix time `until`
+        (the end of today by default), most overdue first.
+        """
+        until = end_of_day() if until is None else until
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question_id FROM cards WHERE session = ? AND due <= ?"
+                " ORDER BY due LIMIT ?",
+                (session, until, -1 if limit is None else limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def reviewed(self, session: str) -> List[int]:
+        """
+        Returns the IDs of every question a session has a card for.
+        """
+        with self._lock:
+            return [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT question_id FROM cards WHERE session = ?", (session,)
+                )
+            ]
+
+    def reschedule(self, attempts: pd.DataFrame) -> int:
+        """
+        Rebuilds every card by replaying the full attempt history (and the
+        recorded forks), replacing the current cards in one transaction.
+
+        Args:
+            attempts (pd.DataFrame): Attempts with `ts`, `session`,
+                `question_id`, `correct` and `latency_ms` columns (see
+                `AttemptLog.history`).
+
+        Returns:
+            int: The number of cards written.
+        """
+        with self._lock:
+            forks = self._conn.execute("SELECT ts, session, parent FROM forks").fetchall()
+        # Forks and answers in time order; a fork sorts before an answer
+        # given at the same time.
+        events = [(ts, 0, session, parent) for ts, session, parent in forks]
+        events += [
+            (ts, 1, session, (qid, correct, latency_ms))
+            for ts, session, qid, correct, latency_ms in zip(
+                attempts["ts"].tolist(),
+                attempts["session"].tolist(),
+                attempts["question_id"].tolist(),
+                attempts["correct"].tolist(),
+                attempts["latency_ms"].tolist(),
+            )
+        ]
+        events.sort(key=lambda event: event[:2])
+
+        cards: Dict[str, Dict[int, Card]] = {}
+        for ts, kind, session, detail in events:
+            if kind == 0:
+                cards.setdefault(session, {}).update(cards.get(detail, {}))
+                continue
+            qid, correct, latency_ms = detail
+            latency_ms = None if pd.isna(latency_ms) else latency_ms
+            session_cards = cards.setdefault(session, {})
+            card = session_cards.get(qid) or Card(int(qid))
+            session_cards[qid] = sm2(card, grade(bool(correct), latency_ms), ts)
+        rows = [
+            (session,) + card
+            for session, session_cards in cards.items()
+            for card in session_cards.values()
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cards")
+            self._conn.executemany(
+                f"INSERT INTO cards (session, {', '.join(CARD_COLUMNS)})"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
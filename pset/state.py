@@ -0,0 +1,148 @@
+"""Per-session state shared by the pages.
+
+The problem set of a session lives in `st.session_state`, which a refresh or
+restart wipes. Every change is therefore also saved to the session store,
+and the URL carries the session ID and the set's code, so the set and
+progress can be restored on the next load.
+
+The session store keeps the explicit code (question IDs and choice
+permutations), which stays valid as questions are added to the bank; only
+the URL uses the compact seeded form. Since the URL is bookmarked and
+shared, a session restored from it is copied to a new session ID rather
+than continued, so the browser it was shared from keeps its own progress.
+"""
+import uuid
+from typing import Dict, List, Optional
+
+import numpy as np
+import streamlit as st
+
+from pset import metrics
+from pset.problemset import ProblemSet
+from pset.resources import get_bank, get_scheduler, get_session_store
+from pset.sessions import is_session_id
+from pset.setcode import decode, encode
+
+
+def _query_params() -> Dict[str, List[str]]:
+    if hasattr(st, "query_params"):
+        # Streamlit 1.30+ replaced the experimental query parameter API.
+        return {key: st.query_params.get_all(key) for key in st.query_params}
+    return st.experimental_get_query_params()
+
+
+def _set_query_params(**params: str):
+    if hasattr(st, "query_params"):
+        st.query_params.from_dict(params)
+    else:
+        st.experimental_set_query_params(**params)
+
+
+def rerun():
+    """
+    Reruns the page script from the top.
+    """
+    if hasattr(st, "rerun"):
+        st.rerun()
+    else:
+        st.experimental_rerun()
+
+
+def session_id() -> str:
+    """
+    Returns the ID this browser session saves its quiz under. Each browser
+    session gets a new one, even when opened from a URL carrying a session
+    ID (see `restore_problem_set`); the review schedule of that session is
+    copied to the new one.
+    """
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = uuid.uuid4().hex
+        linked = _query_params().get("session", [None])[0]
+        if is_session_id(linked):
+            get_scheduler().fork(linked, st.session_state["session_id"])
+    return st.session_state["session_id"]
+
+
+def _same_set(a: ProblemSet, b: ProblemSet) -> bool:
+    return len(a) == len(b) and np.array_equal(a.ids, b.ids) and np.array_equal(a.perms, b.perms)
+
+
+@metrics.timed("restore_session")
+def restore_problem_set() -> Optional[ProblemSet]:
+    """
+    Returns the session's problem set, restoring it if the session state
+    lost it: from the `set` code in the URL, or from the session store when
+    the URL's `session` was saved with the same set (it also holds the
+    current question) or the `set` code no longer decodes.
+
+    The restored set is saved under this browser session's own ID from then
+    on, so opening a shared link never changes the sender's session.
+
+    Returns:
+        Optional[ProblemSet]: The problem set, or None if there is none.
+    """
+    if "problem_set" in st.session_state:
+        return st.session_state["problem_set"]
+
+    params = _query_params()
+    url_code = params.get("set", [None])[0]
+    url_session = params.get("session", [None])[0]
+    saved = get_session_store().load(url_session) if is_session_id(url_session) else None
+    if not url_code and saved is None:
+        return None
+
+    snapshot = get_bank().snapshot
+    linked = stored = error = None
+    if url_code:
+        try:
+            linked = decode(url_code, snapshot)
+        except ValueError as e:
+            error = e
+    if saved is not None:
+        try:
+            stored = decode(saved.code, snapshot)
+        except ValueError as e:
+            error = error or e
+
+    if stored is not None and (linked is None or _same_set(linked, stored)):
+        # The stored session also knows the current question.
+        pset, position = stored, saved.position
+        if linked is not None:
+            pset.spec = linked.spec
+    elif linked is not None:
+        pset, position = linked, 0
+    else:
+        st.warning(f"**Could not restore the problem set:** {error}", icon="⚠️")
+        return None
+    st.session_state["problem_set"] = pset
+    st.session_state["index"] = position
+    return pset
+
+
+@metrics.timed("save_session")
+def save_problem_set(pset: ProblemSet, position: int = 0):
+    """
+    Saves the problem set and current question to the session store and
+    the URL. The set is only re-encoded when an answer was recorded (or the
+    bank changed) since the last save; moving to another question only
+    updates the stored position.
+    """
+    snapshot = get_bank().snapshot
+    version = (pset.revision, snapshot.digest)
+    saved = st.session_state.get("saved_session")
+    if saved is not None and saved[0] is pset and saved[1] == version:
+        _, _, saved_position, stored = saved
+        if stored and saved_position != position:
+            get_session_store().save_position(session_id(), position)
+            st.session_state["saved_session"] = (pset, version, position, stored)
+        return
+    try:
+        stored = encode(pset, snapshot, explicit=True)
+    except ValueError:
+        stored = None
+    params = {"session": session_id()}
+    if stored:
+        get_session_store().save(session_id(), stored, position)
+        params["set"] = encode(pset, snapshot) if pset.spec is not None else stored
+    _set_query_params(**params)
+    st.session_state["saved_session"] = (pset, version, position, bool(stored))
@@ -0,0 +1,59 @@
+"""The subject tags of the question bank.
+
+Kept free of imports, so the Question Form and the importer can load it
+without NumPy or pandas.
+"""
+
+# The tags a new question can be given.
+SUBJECT_TAGS = [
+    "PCP",
+    "CHE",
+    "GEN",
+    "MIX",
+    "ChE Calculations",
+    "Unit Operations",
+    "Leaching",
+    "Liquid-liquid Extraction",
+    "Distillation",
+    "Screening",
+    "Size Reduction",
+    "Sedimentation",
+    "Centrifugation",
+    "Filtration",
+    "Fluidization",
+    "Diffusion/Gas Absorption",
+    "Evaporation",
+    "Crystallization",
+    "Humidification",
+    "Drying",
+    "Momentum Transfer",
+    "Heat Transfer",
+    "Mass Transfer",
+    "Chemical Reaction Engineering",
+    "Pre-Calculus",
+    "Plane and Solid Geometry",
+    "Analytic Geometry",
+    "Differential Calculus",
+    "Integral Calculus",
+    "Differential Equations",
+    "Engineering Data Analysis",
+    "Engineering Economics",
+    "Physics",
+    "Engineering Mechanics",
+    "General Chemistry",
+    "Analytical Chemistry",
+    "Organic Chemistry",
+    "Physical Chemistry",
+    "ChE Thermodynamics",
+    "Industrial Waste Management and Control",
+    "Environmental Engineering",
+    "Materials Science and Engineering",
+    "Solution Thermodynamics",
+    "Biochemical Engineering",
+    "Chemical Process Industries",
+    "Instrumentation and Process Control",
+    "Plant Design",
+    "ChE Laws, Ethics, Contracts",
+    "Engineering Management",
+    "Process Safety",
+]
@@ -0,0 +1,184 @@
+from functools import reduce
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+class TagIndex:
+    """
+    Inverted index from tag to the sorted row positions carrying that tag.
+
+    Row positions are positional (``df.iloc``) offsets into the question bank,
+    so query results can be used to slice the bank directly.
+
+    Args:
+        postings (Dict[str, np.ndarray]): Sorted ``int64`` row positions per tag.
+        size (int): Number of rows in the indexed bank.
+    """
+
+    def __init__(self, postings: Dict[str, np.ndarray], size: int):
+        self._postings = postings
+        self.size = size
+
+    @classmethod
+    def from_lists(cls, tag_lists: Iterable[List[str]]) -> "TagIndex":
+        """
+        Builds the index from an iterable of per-row tag lists.
+
+        Args:
+            tag_lists (Iterable[List[str]]): The tags of each row, in row order.
+
+        Returns:
+            TagIndex: The index over the given rows.
+        """
+        buckets: Dict[str, List[int]] = {}
+        size = 0
+        for pos, row_tags in enumerate(tag_lists):
+            for tag in set(row_tags):
+                buckets.setdefault(tag, []).append(pos)
+            size = pos + 1
+        postings = {tag: np.array(rows, dtype=np.int64) for tag, rows in buckets.items()}
+        return cls(postings, size)
+
+    @classmethod
+    def from_pairs(cls, tags: np.ndarray, rows: np.ndarray, size: int) -> "TagIndex":
+        """
+        Builds the index from flat, parallel arrays of (tag, row) pairs.
+
+        Args:
+            tags (np.ndarray): The tag of each pair.
+            rows (np.ndarray): The row position of each pair.
+            size (int): Number of rows in the indexed bank.
+
+        Returns:
+            TagIndex: The index over the given rows.
+        """
+        codes, uniques = pd.factorize(tags)
+        # Sort by (tag, row) and drop repeated tags within a row.
+        order = np.lexsort((rows, codes))
+        codes, rows = codes[order], np.asarray(rows, dtype=np.int64)[order]
+        keep = np.ones(len(codes), dtype=bool)
+        keep[1:] = (codes[1:] != codes[:-1]) | (rows[1:] != rows[:-1])
+        codes, rows = codes[keep], rows[keep]
+        bounds = np.searchsorted(codes, np.arange(len(uniques) + 1))
+        postings = {
+            tag: rows[bounds[i] : bounds[i + 1]] for i, tag in enumerate(uniques)
+        }
+        return cls(postings, size)
+
+    def patch(
+        self,
+        added: Iterable[Tuple[int, List[str]]] = (),
+        removed: Iterable[Tuple[int, List[str]]] = (),
+        size: Optional[int] = None,
+    ) -> "TagIndex":
+        """
+        Returns a copy of the index with some rows added and removed.
+
+        Only the postings of the touched tags are rebuilt; the others are
+        shared with this index, which is left unchanged for its readers.
+
+        Args:
+            added (Iterable[Tuple[int, List[str]]]): (row, tags) pairs to add.
+            removed (Iterable[Tuple[int, List[str]]]): (row, tags) pairs to
+                remove, with the tags the rows were indexed under.
+            size (Optional[int]): The new number of rows; unchanged if None.
+
+        Returns:
+            TagIndex: The patched index.
+        """
+        additions: Dict[str, List[int]] = {}
+        removals: Dict[str, List[int]] = {}
+        for pos, row_tags in added:
+            for tag in set(row_tags):
+                additions.setdefault(tag, []).append(pos)
+        for pos, row_tags in removed:
+            for tag in set(row_tags):
+                removals.setdefault(tag, []).append(pos)
+
+        postings = dict(self._postings)
+        for tag in set(additions) | set(removals):
+            rows = postings.get(tag, _EMPTY)
+            if tag in removals:
+                rows = np.setdiff1d(rows, removals[tag], assume_unique=True)
+            if tag in additions:
+                rows = np.union1d(rows, additions[tag]).astype(np.int64)
+            if len(rows):
+                postings[tag] = rows
+            else:
+                postings.pop(tag, None)
+        return TagIndex(postings, self.size if size is None else size)
+
+    def tags(self) -> List[str]:
+        """
+        Returns the indexed tags, most frequent first.
+        """
+        return sorted(self._postings, key=lambda tag: (-len(self._postings[tag]), tag))
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Returns the number of rows carrying each tag.
+        """
+        return {tag: len(rows) for tag, rows in self._postings.items()}
+
+    def positions(self, tag: str) -> np.ndarray:
+        """
+        Returns the sorted row positions for a single tag (empty if unknown).
+        """
+        return self._postings.get(tag, _EMPTY)
+
+    def any_of(self, tags: Iterable[str]) -> np.ndarray:
+        """
+        Returns the rows carrying at least one of the given tags (OR).
+        """
+        postings = [self.positions(tag) for tag in tags]
+        if not postings:
+            return _EMPTY
+        return reduce(np.union1d, postings)
+
+    def all_of(self, tags: Iterable[str]) -> np.ndarray:
+        """
+        Returns the rows carrying every one of the given tags (AND).
+        """
+        # Intersect the rarest postings first so the running result stays small.
+        postings = sorted((self.positions(tag) for tag in tags), key=len)
+        if not postings:
+            return _EMPTY
+        return reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), postings)
+
+    def query(
+        self,
+        any_of: Iterable[str] = (),
+        all_of: Iterable[str] = (),
+        none_of: Iterable[str] = (),
+    ) -> np.ndarray:
+        """
+        Resolves an OR/AND/NOT tag query to sorted row positions.
+
+        A query without any ``any_of`` or ``all_of`` tags matches nothing, the
+        same as selecting no tags in the generator.
+
+        Args:
+            any_of (Iterable[str]): Rows must carry at least one of these tags.
+            all_of (Iterable[str]): Rows must carry all of these tags.
+            none_of (Iterable[str]): Rows must carry none of these tags.
+
+        Returns:
+            np.ndarray: The sorted ``int64`` row positions matching the query.
+        """
+        any_of, all_of, none_of = list(any_of), list(all_of), list(none_of)
+        if any_of and all_of:
+            rows = np.intersect1d(
+                self.any_of(any_of), self.all_of(all_of), assume_unique=True
+            )
+        elif any_of:
+            rows = self.any_of(any_of)
+        elif all_of:
+            rows = self.all_of(all_of)
+        else:
+            return _EMPTY
+        if none_of:
+            rows = np.setdiff1d(rows, self.any_of(none_of), assume_unique=True)
+        return rows
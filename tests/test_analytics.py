@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from pset.analytics import AnalyticsStore
+
+RUNS = [
+    ["2024-03-01", "8", "10", "600", "", "", "5", "CHE; PCP", "3; 7", "CHE"],
+    ["2024-03-01", "9", "10", "540", "", "", "9", "CHE", "12", "CHE"],
+    ["2024-03-02", "5", "5", "300", "", "", "5", "GEN", "", ""],
+]
+
+
+def totals(store):
+    return store.daily["Questions"].sum(), store.questions["Misses"].sum(), len(store.runs())
+
+
+def test_ingest_is_incremental(tmp_path):
+    store = AnalyticsStore(str(tmp_path))
+    assert store.ingest(RUNS[:2]) == 2
+    assert store.ingest(RUNS[2:]) == 1
+    assert store.state == {"next_row": 5, "segments": 2, "rollups": 2}
+
+    reopened = AnalyticsStore(str(tmp_path))
+    assert totals(reopened) == (25, 3, 3)
+    assert reopened.daily.loc[:, "Runs"].tolist() == [2, 1]
+    assert sorted(os.listdir(tmp_path / "runs")) == ["part-00000.parquet", "part-00001.parquet"]
+
+
+def test_crash_before_commit_does_not_count_twice(tmp_path, monkeypatch):
+    store = AnalyticsStore(str(tmp_path))
+    store.ingest(RUNS[:2])
+
+    def crash(state):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(store, "_save_state", crash)
+    with pytest.raises(KeyboardInterrupt):
+        store.ingest(RUNS[2:])
+    # The process dies here; the next one ingests the same rows again.
+    reopened = AnalyticsStore(str(tmp_path))
+    assert reopened.state["next_row"] == 4
+    assert reopened.ingest(RUNS[2:]) == 1
+    assert totals(reopened) == (25, 3, 3)
+    assert totals(AnalyticsStore(str(tmp_path))) == (25, 3, 3)
+
+
+def test_crash_after_commit_keeps_the_segment(tmp_path, monkeypatch):
+    store = AnalyticsStore(str(tmp_path))
+    store.ingest(RUNS[:2])
+    # Committed, but the staged segment was never renamed.
+    monkeypatch.setattr(store, "_recover", lambda: None)
+    store.ingest(RUNS[2:])
+    assert "_part-00001.parquet" in os.listdir(tmp_path / "runs")
+
+    reopened = AnalyticsStore(str(tmp_path))
+    assert totals(reopened) == (25, 3, 3)
+    assert sorted(os.listdir(tmp_path)) == [
+        "daily-00002.parquet",
+        "questions-00002.parquet",
+        "runs",
+        "state.json",
+        "tags-00002.parquet",
+    ]
@@ -0,0 +1,138 @@
+import functools
+import http.server
+import os
+import threading
+
+import pytest
+
+from pset.bank import LiveBank, compile_bank
+
+HEADER = "ID,Question,Choices,Answer,Tags\n"
+ROWS = [
+    '1,Which is a state function?,Heat; Work; Enthalpy; Path,Enthalpy,PCP; THERMO\n',
+    '2,What is 2 + 2?,3; 4; 5; 6,4,GEN\n',
+    '3,What does a reboiler do?,Heats; Cools; Mixes; Separates,Heats,CHE\n',
+]
+
+
+def write(path, rows, mtime_ns=None):
+    path.write_text(HEADER + "".join(rows))
+    if mtime_ns is not None:
+        # Same-size rewrites must still look modified.
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def live(snapshot):
+    table = snapshot.table
+    return {
+        qid: table.column("Question")[pos].as_py() for qid, pos in snapshot.id_pos.items()
+    }
+
+
+@pytest.fixture
+def csv(tmp_path):
+    path = tmp_path / "bank.csv"
+    write(path, ROWS)
+    return path
+
+
+def test_appended_rows_parse_only_the_tail(csv, monkeypatch):
+    bank = LiveBank.from_source(str(csv))
+    with csv.open("a") as f:
+        f.write('4,Which unit is energy?,J; W; N; Pa,J,GEN\n')
+    # The appended bytes must not trigger a full re-read.
+    monkeypatch.setattr("pset.bank.read_source", pytest.fail)
+    assert bank.refresh() == 1
+
+    snapshot = bank.snapshot
+    assert snapshot.version == 1
+    assert snapshot.id_pos == {1: 0, 2: 1, 3: 2, 4: 3}
+    assert snapshot.table.column("Choices")[3].as_py() == ["J", "W", "N", "Pa"]
+    assert snapshot.tags.any_of(["GEN"]).tolist() == [1, 3]
+    assert bank.refresh() == 0
+
+
+def test_edited_row_is_replaced_by_hash(csv):
+    bank = LiveBank.from_source(str(csv))
+    before = bank.snapshot
+    mtime = os.stat(csv).st_mtime_ns
+    write(csv, [ROWS[0], ROWS[1].replace("GEN", "MATH"), ROWS[2]], mtime + 10**9)
+    assert bank.refresh() == 1
+
+    snapshot = bank.snapshot
+    assert snapshot.table.num_rows == 4
+    assert snapshot.id_pos == {1: 0, 2: 3, 3: 2}
+    assert snapshot.tags.any_of(["GEN"]).tolist() == []
+    assert snapshot.tags.any_of(["MATH"]).tolist() == [3]
+    # Earlier snapshots are untouched.
+    assert before.id_pos == {1: 0, 2: 1, 3: 2}
+    assert before.tags.any_of(["GEN"]).tolist() == [1]
+
+
+def test_deleted_row_is_dropped(csv):
+    bank = LiveBank.from_source(str(csv))
+    mtime = os.stat(csv).st_mtime_ns
+    write(csv, [ROWS[0], ROWS[2]], mtime + 10**9)
+    assert bank.refresh() == 1
+
+    snapshot = bank.snapshot
+    assert snapshot.id_pos == {1: 0, 3: 2}
+    assert snapshot.positions().tolist() == [0, 2]
+    assert snapshot.tags.any_of(["GEN"]).tolist() == []
+
+
+def test_csv_rewritten_behind_compiled_bank(csv, tmp_path):
+    path = str(tmp_path / "bank.arrow")
+    assert compile_bank(str(csv), path) == 3
+    bank = LiveBank.open(path, str(csv))
+    assert bank.refresh() == 0
+
+    # The file grew, but the bytes already compiled changed too: the tail
+    # cannot be trusted and the whole source is diffed.
+    mtime = os.stat(csv).st_mtime_ns
+    write(
+        csv,
+        [ROWS[0].replace("Heat;", "Q;"), ROWS[1], ROWS[2], '4,New?,A; B,A,GEN\n'],
+        mtime + 10**9,
+    )
+    assert bank.refresh() == 2
+    assert live(bank.snapshot)[4] == "New?"
+    assert bank.snapshot.table.column("Choices")[bank.snapshot.id_pos[1]].as_py()[0] == "Q"
+
+
+def test_csv_truncated_behind_compiled_bank(csv, tmp_path):
+    path = str(tmp_path / "bank.arrow")
+    compile_bank(str(csv), path)
+    bank = LiveBank.open(path, str(csv))
+    csv.write_text(HEADER + ROWS[0])
+    assert bank.refresh() == 2
+    assert list(bank.snapshot.id_pos) == [1]
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path):
+    handler = functools.partial(QuietHandler, directory=str(tmp_path))
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_url_source_is_diffed_by_digest(csv, server):
+    bank = LiveBank.from_source(f"{server}/bank.csv")
+    assert list(bank.snapshot.id_pos) == [1, 2, 3]
+    assert bank.refresh() == 0
+    assert bank.snapshot.version == 0
+
+    write(csv, [ROWS[0], ROWS[2].replace("CHE", "UNIT OPS"), '4,New?,A; B,A,GEN\n'])
+    assert bank.refresh() == 3
+    snapshot = bank.snapshot
+    assert sorted(snapshot.id_pos) == [1, 3, 4]
+    assert snapshot.tags.any_of(["UNIT OPS"]).tolist() == [snapshot.id_pos[3]]
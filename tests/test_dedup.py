@@ -0,0 +1,22 @@
+import numpy as np
+
+from pset.dedup import DedupIndex, features
+
+QUESTION = "What is the critical temperature of water in kelvin?"
+CHOICES = ["647 K", "373 K", "273 K", "100 K"]
+
+
+def test_rows_past_the_live_mask_are_not_live():
+    index = DedupIndex()
+    index.add([features(QUESTION, CHOICES)] * 3)
+    # A snapshot of two rows, the second deleted, while the shared index
+    # has already indexed a third.
+    live = np.array([True, False])
+    assert [match.position for match in index.query(QUESTION, CHOICES)] == [0, 1, 2]
+    assert [match.position for match in index.query(QUESTION, CHOICES, live=live)] == [0]
+    assert index.pairs(live=live) == []
+    assert [pair[:2] for pair in index.pairs(live=np.ones(5, dtype=bool))] == [
+        (0, 1),
+        (0, 2),
+        (1, 2),
+    ]
@@ -0,0 +1,53 @@
+import json
+
+from pset.importer import Validator, import_file
+
+VALID = {
+    "Question": "Which is a state function?",
+    "Choices": ["Heat", "Work", "Enthalpy", "Path"],
+    "Answer": "Enthalpy",
+    "Tags": ["PCP"],
+}
+
+
+def test_malformed_and_non_object_lines_are_rejected(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    path.write_text(
+        "\n".join(
+            [
+                json.dumps(VALID),
+                '{"Question": "broken',
+                "[1, 2]",
+                '"just text"',
+                json.dumps(dict(VALID, Question="Which is a path function?")),
+            ]
+        )
+        + "\n"
+    )
+    written = []
+    progress, rejects = import_file(str(path), Validator(), write=written.extend)
+    assert (progress.records, progress.imported, progress.rejected) == (5, 2, 3)
+    assert len(written) == 2
+    assert [reject.number for reject in rejects] == [2, 3, 4]
+    assert rejects[0].errors[0].startswith("invalid JSON")
+    assert rejects[1].errors == ["expected an object, got list"]
+    assert rejects[2].question == ""
+
+
+def test_import_stops_after_max_chunks_and_resumes(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    records = [dict(VALID, Question=f"Question {i}?") for i in range(25)]
+    records[7] = records[3]
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+    written = []
+    runs = 0
+    progress = None
+    while progress is None or not progress.finished:
+        progress, _ = import_file(
+            str(path), Validator(), write=written.extend, chunk_size=4, max_chunks=2
+        )
+        runs += 1
+    assert runs == 3
+    assert (progress.records, progress.imported, progress.rejected) == (25, 24, 1)
+    assert [row[1] for row in written] == [r["Question"] for i, r in enumerate(records) if i != 7]
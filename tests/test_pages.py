@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+pytest.importorskip("streamlit.testing.v1")
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from pset.bank import LiveBank  # noqa: E402
+from pset.builder import build_problem_set  # noqa: E402
+from pset.sessions import SessionStore  # noqa: E402
+from pset.setcode import encode  # noqa: E402
+from pset.srs import Scheduler  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SENDER = "a" * 32
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    csv = tmp_path / "qna.csv"
+    csv.write_text(
+        "ID,Question,Choices,Answer,Tags\n"
+        + "".join(f"{i},Question {i}?,A{i}; B{i}; C{i}; D{i},A{i},CHE\n" for i in range(1, 11))
+    )
+    secrets = {
+        "QNA_CSV": str(csv),
+        "QNA_REFRESH_SECS": 3600,
+        "GSHEETS_URL": "https://example.invalid/",
+        "ATTEMPTS_DB": str(tmp_path / "attempts.db"),
+        "SESSIONS_DB": str(tmp_path / "sessions.db"),
+        "SEARCH_DB": str(tmp_path / "search.db"),
+        "RENDER_CACHE_DIR": str(tmp_path / "render-cache"),
+    }
+    # Resources are per process; every test gets its own bank and stores.
+    st.cache_resource.clear()
+    yield secrets, LiveBank.from_source(str(csv)).snapshot
+    st.cache_resource.clear()
+
+
+def page(script, secrets, **params):
+    at = AppTest.from_file(os.path.join(ROOT, script), default_timeout=30)
+    for key, value in secrets.items():
+        at.secrets[key] = value
+    for key, value in params.items():
+        at.query_params[key] = value
+    return at
+
+
+def test_results_opens_on_fresh_session(workspace):
+    secrets, snapshot = workspace
+    pset = build_problem_set(snapshot.table, snapshot.positions()[:4], seed=1)
+    for pos in range(len(pset)):
+        pset.record(pos, pset.answers[pos] if pos else pset.choices[pos][-1])
+    pset.record(0, next(c for c in pset.choices[0] if c != pset.answers[0]))
+
+    at = page("pages/3_Results.py", secrets, set=encode(pset, snapshot))
+    at.run()
+    assert not at.exception
+    assert at.metric[0].value == "3 / 4"
+    assert "auth" not in at.session_state
+
+
+def test_shared_link_copies_the_session(workspace):
+    secrets, snapshot = workspace
+    pset = build_problem_set(snapshot.table, snapshot.positions(), seed=2)
+    pset.record(0, pset.answers[0])
+    code = encode(pset, snapshot, explicit=True)
+    store = SessionStore(secrets["SESSIONS_DB"])
+    store.save(SENDER, code, 3)
+    scheduler = Scheduler(secrets["ATTEMPTS_DB"])
+    scheduler.review(SENDER, 1, correct=True)
+
+    at = page("pages/2_Quiz.py", secrets, session=SENDER, set=code)
+    at.run()
+    assert not at.exception
+    assert at.session_state["index"] == 3
+    assert at.session_state["problem_set"].num_done == 1
+
+    copy = at.session_state["session_id"]
+    assert copy != SENDER
+    assert store.load(copy).code == code
+    at.selectbox[0].set_value("Q-5").run()
+    assert store.load(copy).position == 4
+    assert store.load(SENDER)[:2] == (code, 3)
+    # The review schedule is copied too.
+    assert scheduler.reviewed(copy) == [1]
+
+
+def test_url_set_wins_over_a_different_stored_set(workspace):
+    secrets, snapshot = workspace
+    stored = build_problem_set(snapshot.table, snapshot.positions()[:5], seed=3)
+    linked = build_problem_set(snapshot.table, snapshot.positions()[5:], seed=4)
+    store = SessionStore(secrets["SESSIONS_DB"])
+    store.save(SENDER, encode(stored, snapshot, explicit=True), 2)
+
+    at = page("pages/2_Quiz.py", secrets, session=SENDER, set=encode(linked, snapshot))
+    at.run()
+    assert not at.exception
+    assert at.session_state["problem_set"].ids.tolist() == linked.ids.tolist()
+    assert at.session_state["index"] == 0
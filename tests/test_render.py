@@ -0,0 +1,53 @@
+import pytest
+
+from pset.render import render_fragment, render_html, sanitize_mathml
+
+pytest.importorskip("latex2mathml")
+pytest.importorskip("markdown_it")
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        r"$\text{</math><img/src=x/onerror=alert(1)>}$",
+        r"$\href{javascript:alert(1)}{x}$",
+        r"$$\text{</math><script>alert(1)</script>}$$",
+        r"Before $\mathrm{x}$ and $\text{<b onmouseover=alert(1)>}$",
+    ],
+)
+def test_injected_markup_falls_back_to_markdown(text):
+    assert render_html(text) is None
+    assert render_fragment(text) == (text, False)
+
+
+def test_math_renders_to_mathml():
+    html = render_html(r"At $T = 300\ \text{K}$, find $\frac{Q}{m c_p}$.")
+    assert html.count("<math") == 2
+    assert "<mtext>K</mtext>" in html
+    assert "<mfrac>" in html
+
+
+def test_sanitize_mathml_escapes_text_and_keeps_presentation_attributes():
+    mathml = (
+        '<math xmlns="http://www.w3.org/1998/Math/MathML" display="inline">'
+        '<mi mathvariant="normal">&#x0003C;</mi><mo /></math>'
+    )
+    assert sanitize_mathml(mathml) == (
+        '<math xmlns="http://www.w3.org/1998/Math/MathML" display="inline">'
+        '<mi mathvariant="normal">&lt;</mi><mo /></math>'
+    )
+
+
+@pytest.mark.parametrize(
+    "mathml",
+    [
+        '<math><mtext href="javascript:alert(1)">x</mtext></math>',
+        '<math><mi onclick="alert(1)">x</mi></math>',
+        '<math><mi style="color:red">x</mi></math>',
+        '<math xmlns="http://www.w3.org/1999/xhtml"><mi>x</mi></math>',
+        "<math><mtext></math><img src=x></mtext></math>",
+        "<math><mi>x</mi>",
+    ],
+)
+def test_sanitize_mathml_rejects_anything_else(mathml):
+    assert sanitize_mathml(mathml) is None
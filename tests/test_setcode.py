@@ -0,0 +1,174 @@
+import base64
+import itertools
+
+import numpy as np
+import pytest
+
+from pset.bank import LiveBank
+from pset.builder import build_problem_set
+from pset.sessions import SessionStore
+from pset.setcode import (
+    FORMAT_VERSION,
+    decode,
+    encode,
+    generate_set,
+    new_spec,
+    perm_rank,
+    perm_unrank,
+)
+
+TAGS = ["CHE", "PCP", "GEN"]
+
+
+def row(qid, choices=4):
+    options = "; ".join(f"Choice {qid}.{i}" for i in range(choices))
+    return f"{qid},Question {qid}?,{options},Choice {qid}.0,{TAGS[qid % 3]}\n"
+
+
+@pytest.fixture
+def csv(tmp_path):
+    path = tmp_path / "qna.csv"
+    # A few questions with fewer or more than four choices.
+    path.write_text(
+        "ID,Question,Choices,Answer,Tags\n"
+        + "".join(row(qid, 2 + qid % 5) for qid in range(1, 61))
+    )
+    return path
+
+
+@pytest.fixture
+def bank(csv):
+    return LiveBank.from_source(str(csv))
+
+
+def answer_some(pset):
+    for pos in range(0, len(pset), 3):
+        pset.record(pos, pset.answers[pos])
+    for pos in range(1, len(pset), 4):
+        pset.record(pos, pset.choices[pos][-1])
+
+
+def same_set(a, b):
+    assert a.ids.tolist() == b.ids.tolist()
+    assert a.perms.tolist() == b.perms.tolist()
+    assert a.done.tolist() == b.done.tolist()
+    assert a.correct.tolist() == b.correct.tolist()
+    assert (a.num_done, a.num_correct) == (b.num_done, b.num_correct)
+
+
+@pytest.mark.parametrize("n", range(1, 7))
+def test_perm_rank_round_trips_every_pick(n):
+    picks = list(itertools.permutations(range(n), min(n, 4)))
+    ranks = [perm_rank(list(pick), n) for pick in picks]
+    assert sorted(ranks) == list(range(len(picks)))
+    for pick, rank in zip(picks, ranks):
+        assert perm_unrank(rank, n) == list(pick)
+
+
+@pytest.mark.parametrize("explicit", [False, True])
+def test_round_trip_keeps_questions_and_progress(bank, explicit, tmp_path):
+    snapshot = bank.snapshot
+    spec = new_spec(snapshot, ["CHE", "GEN"], [], ["PCP"], 25, seed=7)
+    pset = generate_set(snapshot, spec)
+    answer_some(pset)
+
+    code = encode(pset, snapshot, explicit=explicit)
+    restored = decode(code, snapshot)
+    same_set(restored, pset)
+    assert (restored.spec is None) == explicit
+
+    store = SessionStore(str(tmp_path / "sessions.db"))
+    store.save("s" * 32, code, 11)
+    saved = store.load("s" * 32)
+    assert saved.position == 11
+    same_set(decode(saved.code, snapshot), pset)
+
+
+def test_seeded_code_is_shorter_than_explicit(bank):
+    snapshot = bank.snapshot
+    pset = generate_set(snapshot, new_spec(snapshot, TAGS, [], [], 40, seed=1))
+    assert len(encode(pset, snapshot)) < len(encode(pset, snapshot, explicit=True)) / 2
+
+
+def test_seeded_spec_regenerates_the_same_set(bank):
+    snapshot = bank.snapshot
+    spec = new_spec(snapshot, ["PCP"], [], [], 10, seed=1234)
+    first, second = generate_set(snapshot, spec), generate_set(snapshot, spec)
+    same_set(first, second)
+    other = generate_set(snapshot, spec._replace(seed=1235))
+    assert other.ids.tolist() != first.ids.tolist() or other.perms.tolist() != first.perms.tolist()
+
+
+def test_codes_decode_after_rows_are_appended(bank, csv):
+    snapshot = bank.snapshot
+    seeded = generate_set(snapshot, new_spec(snapshot, ["CHE"], [], [], 10, seed=5))
+    explicit = build_problem_set(snapshot.table, snapshot.positions(), size=12, seed=6)
+    answer_some(seeded)
+    answer_some(explicit)
+    seeded_code = encode(seeded, snapshot)
+    explicit_code = encode(explicit, snapshot, explicit=True)
+
+    with csv.open("a") as f:
+        f.write("".join(row(qid) for qid in range(61, 91)))
+    assert bank.refresh() == 30
+    appended = bank.snapshot
+    same_set(decode(seeded_code, appended), seeded)
+    same_set(decode(explicit_code, appended), explicit)
+    # The cached encoding is redone for the new bank and still seeded.
+    assert encode(seeded, appended) == seeded_code
+
+
+def test_seeded_code_fails_after_a_candidate_is_edited(bank, csv):
+    snapshot = bank.snapshot
+    pset = generate_set(snapshot, new_spec(snapshot, ["CHE"], [], [], 5, seed=5))
+    code = encode(pset, snapshot)
+    csv.write_text(csv.read_text().replace("Question 3?", "Question three?"))
+    bank.refresh()
+    with pytest.raises(ValueError, match="changed"):
+        decode(code, bank.snapshot)
+    # Encoding against the edited bank falls back to the explicit form.
+    same_set(decode(encode(pset, bank.snapshot), bank.snapshot), pset)
+
+
+def raw(code):
+    return bytearray(base64.urlsafe_b64decode(code + "=" * (-len(code) % 4)))
+
+
+def pack(data):
+    return base64.urlsafe_b64encode(bytes(data)).rstrip(b"=").decode()
+
+
+@pytest.mark.parametrize("explicit", [False, True])
+def test_truncated_codes_raise_value_error(bank, explicit):
+    snapshot = bank.snapshot
+    pset = generate_set(snapshot, new_spec(snapshot, TAGS, [], [], 30, seed=9))
+    data = raw(encode(pset, snapshot, explicit=explicit))
+    for end in range(len(data)):
+        with pytest.raises(ValueError):
+            decode(pack(data[:end]), snapshot)
+
+
+@pytest.mark.parametrize("explicit", [False, True])
+def test_corrupted_codes_raise_value_error_or_decode(bank, explicit):
+    snapshot = bank.snapshot
+    pset = generate_set(snapshot, new_spec(snapshot, TAGS, [], [], 30, seed=9))
+    data = raw(encode(pset, snapshot, explicit=explicit))
+    rng = np.random.default_rng(0)
+    for pos in range(1, len(data)):
+        corrupted = data.copy()
+        corrupted[pos] ^= int(rng.integers(1, 256))
+        try:
+            decode(pack(corrupted), snapshot)
+        except ValueError:
+            pass
+    with pytest.raises(ValueError):
+        decode("not a code!", snapshot)
+
+
+def test_other_versions_are_rejected(bank):
+    snapshot = bank.snapshot
+    data = raw(encode(build_problem_set(snapshot.table, snapshot.positions(), seed=1), snapshot))
+    for version in (0, 1, FORMAT_VERSION + 1):
+        data[0] = version
+        with pytest.raises(ValueError, match="version"):
+            decode(pack(data), snapshot)
@@ -0,0 +1,158 @@
+import json
+import os
+from types import SimpleNamespace
+from typing import Any, List
+
+import pytest
+
+from pset import sheets
+from pset.sheets import SheetWriter
+
+
+class FakeWorksheet:
+    """
+    An in-memory stand-in for `gspread.Worksheet` that records appended rows.
+
+    Args:
+        title (str): The worksheet name.
+        failures (List[int]): HTTP status codes to fail the next appends with,
+            in order, before appends start succeeding.
+    """
+
+    def __init__(self, title: str = "Fake", failures: List[int] = ()):
+        self.title = title
+        self.rows: List[List[Any]] = []
+        self.calls = 0
+        self.failures = list(failures)
+
+    def append_rows(self, values, value_input_option="RAW"):
+        self.calls += 1
+        if self.failures:
+            status = self.failures.pop(0)
+            exc = RuntimeError(f"Fake API error {status}")
+            exc.response = SimpleNamespace(status_code=status)
+            raise exc
+        self.rows.extend(values)
+
+
+def writer_for(worksheets, journal, **kwargs):
+    # Not started: `flush` drains on the calling thread.
+    kwargs.setdefault("max_backoff", 0.01)
+    return SheetWriter(worksheets.__getitem__, str(journal), **kwargs)
+
+
+def crash(writer):
+    # What the process dying does: the journal is closed and unlocked as is.
+    writer._journal.close()
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return tmp_path / "journal.jsonl"
+
+
+def test_rows_are_coalesced_into_batches_per_worksheet(journal):
+    worksheets = {"A": FakeWorksheet("A"), "B": FakeWorksheet("B")}
+    writer = writer_for(worksheets, journal, batch_size=4)
+    for i in range(5):
+        writer.append("A", [i])
+        if i < 3:
+            writer.append("B", [f"b{i}"])
+    writer.extend("A", [[5], [6]])
+    assert writer.pending() == 10
+
+    assert writer.flush(5)
+    assert worksheets["A"].rows == [[i] for i in range(7)]
+    assert worksheets["B"].rows == [["b0"], ["b1"], ["b2"]]
+    assert (worksheets["A"].calls, worksheets["B"].calls) == (2, 1)
+    # A drained queue leaves an empty journal.
+    assert journal.read_text() == ""
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_rate_limits_and_server_errors_are_retried(journal, status):
+    worksheets = {"A": FakeWorksheet("A", failures=[status, status])}
+    writer = writer_for(worksheets, journal)
+    writer.append("A", ["row"])
+    assert writer.flush(5)
+    assert worksheets["A"].rows == [["row"]]
+    assert worksheets["A"].calls == 3
+
+
+def test_failing_worksheet_does_not_block_the_others(journal):
+    worksheets = {"A": FakeWorksheet("A", failures=[503] * 100), "B": FakeWorksheet("B")}
+    writer = writer_for(worksheets, journal, max_backoff=60)
+    writer.append("A", ["a"])
+    writer.append("B", ["b"])
+    assert not writer.flush(0.5)
+    assert worksheets["B"].rows == [["b"]]
+    assert writer.pending() == 1
+
+
+def test_batches_are_set_aside_after_max_attempts(journal):
+    worksheets = {"A": FakeWorksheet("A", failures=[503] * 5), "B": FakeWorksheet("B", [400])}
+    writer = writer_for(worksheets, journal, max_attempts=3)
+    writer.extend("A", [[1], [2]])
+    writer.append("B", ["bad request"])
+    assert writer.flush(5)
+
+    assert worksheets["A"].calls == 3
+    # Not retryable: given up on at once.
+    assert worksheets["B"].calls == 1
+    failed = [json.loads(line) for line in open(f"{journal}.failed")]
+    assert sorted((record["ws"], record["row"]) for record in failed) == [
+        ("A", [1]),
+        ("A", [2]),
+        ("B", ["bad request"]),
+    ]
+    assert worksheets["A"].rows == []
+
+
+def test_journal_is_replayed_after_a_crash(journal):
+    worksheets = {"A": FakeWorksheet("A")}
+    writer = writer_for(worksheets, journal, batch_size=2)
+    writer.extend("A", [[1], [2], [3]])
+    # Send one batch, then die before the rest.
+    name, batch = writer._next_batch()
+    writer._send(name, [record["row"] for record in batch])
+    writer._ack(batch)
+    crash(writer)
+    with open(journal, "a") as f:
+        f.write('{"seq": 4, "ws": "A", "ro')  # Torn write.
+
+    restarted = writer_for(worksheets, journal)
+    assert restarted.journal_path == str(journal)
+    assert restarted.pending() == 1
+    restarted.append("A", [4])
+    crash(restarted)
+
+    again = writer_for(worksheets, journal)
+    assert again.pending() == 2
+    assert again.flush(5)
+    assert worksheets["A"].rows == [[1], [2], [3], [4]]
+
+
+@pytest.mark.skipif(sheets.fcntl is None, reason="journals are only locked with fcntl")
+def test_journal_of_a_stopped_process_is_taken_over(journal):
+    worksheets = {"A": FakeWorksheet("A")}
+    first = writer_for(worksheets, journal)
+    idle = writer_for(worksheets, journal)
+    stopped = writer_for(worksheets, journal)
+    assert [first.journal_path, idle.journal_path, stopped.journal_path] == [
+        str(journal),
+        f"{journal}.1",
+        f"{journal}.2",
+    ]
+    stopped.extend("A", [["left"], ["behind"]])
+    crash(stopped)
+    crash(idle)
+
+    # The first process still holds its journal; the next free slot is
+    # taken and the stopped one's rows adopted.
+    taken = writer_for(worksheets, journal)
+    assert taken.journal_path == f"{journal}.1"
+    assert taken.pending() == 2
+    assert os.path.getsize(f"{journal}.2") == 0
+    assert taken.flush(5)
+    assert worksheets["A"].rows == [["left"], ["behind"]]
+    assert first.pending() == 0
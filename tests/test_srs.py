@@ -0,0 +1,96 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from pset.srs import DAY, DEFAULT_EASE, Card, Scheduler, sm2
+
+T0 = 1_700_000_000.0
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    return Scheduler(str(tmp_path / "attempts.db"))
+
+
+def test_sm2_intervals_and_ease():
+    card = sm2(Card(1), 5, T0)
+    assert (card.reps, card.interval, card.ease) == (1, 1.0, DEFAULT_EASE + 0.1)
+    card = sm2(card, 4, T0 + DAY)
+    assert (card.reps, card.interval, card.ease) == (2, 6.0, DEFAULT_EASE + 0.1)
+    card = sm2(card, 4, T0 + 7 * DAY)
+    assert card.interval == round(6 * card.ease)
+    assert card.due == T0 + 7 * DAY + card.interval * DAY
+
+
+def test_sm2_failure_resets_repetitions_but_keeps_ease():
+    learned = Card(1, reps=3, interval=15.0, ease=2.2)
+    failed = sm2(learned, 1, T0)
+    assert (failed.reps, failed.interval, failed.lapses) == (0, 1.0, 1)
+    assert failed.ease == 2.2
+    assert sm2(failed, 1, T0 + DAY).lapses == 1
+
+
+def test_cards_are_kept_per_session(scheduler):
+    scheduler.review("alice", 7, correct=False, ts=T0)
+    scheduler.review("bob", 7, correct=True, latency_ms=5_000, ts=T0)
+    scheduler.review("bob", 8, correct=True, ts=T0)
+
+    assert scheduler.card("alice", 7).reps == 0
+    assert scheduler.card("bob", 7).reps == 1
+    assert scheduler.card("alice", 8) is None
+    assert scheduler.reviewed("alice") == [7]
+    assert scheduler.due("alice", until=T0 + DAY) == [7]
+    assert scheduler.due("bob", until=T0 + DAY) == [7, 8]
+    assert scheduler.due("carol", until=T0 + DAY) == []
+
+
+def test_fork_copies_cards_without_sharing_them(scheduler):
+    scheduler.review("sender", 1, correct=True, ts=T0)
+    scheduler.review("sender", 2, correct=False, ts=T0)
+    assert scheduler.fork("sender", "copy", ts=T0 + 10) == 2
+
+    scheduler.review("copy", 2, correct=True, ts=T0 + 20)
+    scheduler.review("copy", 3, correct=True, ts=T0 + 20)
+    assert scheduler.card("sender", 2).reps == 0
+    assert scheduler.card("sender", 3) is None
+    assert scheduler.card("copy", 1) == scheduler.card("sender", 1)
+    assert scheduler.card("copy", 2).reps == 1
+
+
+def test_reschedule_replays_answers_and_forks(scheduler):
+    answers = [
+        (T0, "sender", 1, True, 5_000),
+        (T0, "sender", 2, False, None),
+        (T0 + 20, "copy", 2, True, 30_000),
+        (T0 + DAY, "sender", 1, True, 5_000),
+    ]
+    for ts, session, qid, correct, latency_ms in answers:
+        if ts == T0 + 20:
+            scheduler.fork("sender", "copy", ts=T0 + 10)
+        scheduler.review(session, qid, correct, latency_ms, ts=ts)
+    live = {
+        (session, qid): scheduler.card(session, qid)
+        for session in ("sender", "copy")
+        for qid in (1, 2)
+    }
+
+    attempts = pd.DataFrame(
+        answers, columns=["ts", "session", "question_id", "correct", "latency_ms"]
+    )
+    assert scheduler.reschedule(attempts) == 4
+    assert {key: scheduler.card(*key) for key in live} == live
+
+
+def test_cards_shared_by_all_sessions_are_dropped(tmp_path):
+    path = str(tmp_path / "attempts.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE cards (question_id INTEGER PRIMARY KEY, reps INTEGER,"
+            " interval REAL, ease REAL, lapses INTEGER, last_review REAL, due REAL)"
+        )
+        conn.execute("INSERT INTO cards VALUES (1, 1, 1.0, 2.5, 0, 0, 0)")
+    scheduler = Scheduler(path)
+    assert scheduler.due("anyone", until=T0) == []
+    scheduler.review("anyone", 1, correct=True, ts=T0)
+    assert scheduler.reviewed("anyone") == [1]